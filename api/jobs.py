@@ -0,0 +1,348 @@
+"""
+Background job queue for PR FAQ generation.
+
+Jobs, their progress events and per-node state checkpoints live in SQLite, so every worker
+process on the host shares one queue: any worker can pick up a submitted job, and clients
+can poll a job or re-attach to its event stream by ID after a disconnect.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Optional
+
+from utils.cache import cache_path
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+# A running job whose worker has not reported for this long is handed to another worker
+JOB_HEARTBEAT_TIMEOUT = float(os.getenv("JOB_HEARTBEAT_TIMEOUT", 300))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", 7 * 24 * 3600))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+# Failed runs are retried from their last graph checkpoint up to this many attempts in total
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+class JobStore:
+    """
+    SQLite-backed job queue with an append-only event log per job.
+    Each operation opens its own connection, so one file can be shared by threads and processes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("PRFAQ_JOB_DB") or cache_path("prfaq_jobs.sqlite3")
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, inputs TEXT NOT NULL, result TEXT, error TEXT, "
+                "current_node TEXT, state TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, thread_id TEXT, deadline REAL)"
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("thread_id", "TEXT"), ("deadline", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (job_id, seq))"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, inputs: dict, thread_id: str = None, deadline: float = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, inputs, thread_id, deadline, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, _dumps(inputs), thread_id, deadline, now, now),
+            )
+        self.add_event(job_id, "status", {"status": "queued"})
+        return job_id
+
+    def get(self, job_id: str, with_state: bool = False) -> Optional[dict]:
+        columns = "id, status, inputs, thread_id, deadline, result, error, current_node, worker, attempts, created_at, updated_at"
+        if with_state:
+            columns += ", state"
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("inputs", "result", "state"):
+            if job.get(key) is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Atomically move the oldest queued job to running for `worker`."""
+        with closing(self._connect()) as conn, conn:
+            candidates = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 5"
+            ).fetchall()
+            for row in candidates:
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (worker, time.time(), row["id"]),
+                ).rowcount
+                if claimed:
+                    conn.commit()
+                    break
+            else:
+                return None
+        self.add_event(row["id"], "status", {"status": "running", "worker": worker})
+        return self.get(row["id"], with_state=True)
+
+    def add_event(self, job_id: str, event: str, data: dict) -> int:
+        """Append an event to the job's log (also refreshing its heartbeat) and return its sequence number."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            seq = conn.execute(
+                "INSERT INTO job_events (job_id, seq, event, data, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM job_events WHERE job_id = ? RETURNING seq",
+                (job_id, event, _dumps(data), now, job_id),
+            ).fetchone()[0]
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+        return seq
+
+    def events(self, job_id: str, after: int = 0) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [{"seq": row["seq"], "event": row["event"], "data": json.loads(row["data"])} for row in rows]
+
+    def checkpoint(self, job_id: str, node: str, state: dict):
+        """Record the state after a completed node."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET current_node = ?, state = ?, updated_at = ? WHERE id = ?",
+                (node, _dumps(state), time.time(), job_id),
+            )
+        self.add_event(job_id, "node", {"node": node})
+
+    def heartbeat(self, job_ids):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE jobs SET updated_at = ? WHERE id = ?", [(time.time(), job_id) for job_id in job_ids])
+
+    def finish(self, job_id: str, result: dict):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, state = NULL, updated_at = ? WHERE id = ?",
+                (_dumps(result), time.time(), job_id),
+            )
+        self.add_event(job_id, "status", {"status": "succeeded"})
+
+    def fail(self, job_id: str, error: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?", (error, time.time(), job_id)
+            )
+        self.add_event(job_id, "status", {"status": "failed", "error": error})
+
+    def requeue(self, job_ids):
+        """Return jobs to the queue, e.g. when their worker shuts down before finishing them."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), job_id) for job_id in job_ids],
+            )
+
+    def requeue_stale(self, timeout: float = JOB_HEARTBEAT_TIMEOUT, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """
+        Return running jobs whose worker stopped reporting (e.g. it crashed) to the queue.
+        Jobs that have already used `max_attempts` are failed instead, so a job that kills
+        its worker every time is not retried forever.
+        """
+        cutoff = time.time() - timeout
+        error = f"Worker stopped responding after {max_attempts} attempts"
+        with closing(self._connect()) as conn, conn:
+            exhausted = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ? AND attempts >= ? RETURNING id",
+                (error, time.time(), cutoff, max_attempts),
+            ).fetchall()
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND updated_at < ?",
+                (cutoff,),
+            ).rowcount
+        for row in exhausted:
+            logger.error(f"Job {row['id']} failed: {error}")
+            self.add_event(row["id"], "status", {"status": "failed", "error": error})
+        return requeued
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        """Delete finished jobs and their events older than `older_than` seconds."""
+        cutoff = time.time() - older_than
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?)",
+                (cutoff,),
+            )
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+            ).rowcount
+
+
+class JobRunner:
+    """
+    Worker threads that claim queued jobs and run the graph, recording thinking steps as
+    events and checkpointing the state after every node. One runner runs per server process.
+    Graph runs are checkpointed on the job's thread (its x-thread-id, or the job ID), so a failed
+    or requeued job picks up after the last node that completed.
+    """
+
+    def __init__(self, store: JobStore, threads: int):
+        self.store = store
+        self.threads = threads
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.info(f"Requeued {requeued} stale jobs")
+        self.store.purge()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"job-runner-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def notify(self):
+        """Wake an idle thread, e.g. right after a job is submitted in this process."""
+        self._wake.set()
+
+    def stop(self, timeout: float = None):
+        """Stop claiming jobs, wait up to `timeout` for running ones and requeue whatever is left."""
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + (timeout or 0)
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._active_lock:
+            unfinished = list(self._active)
+        if unfinished:
+            logger.warning(f"Requeueing {len(unfinished)} unfinished jobs")
+            self.store.requeue(unfinished)
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self.worker_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(JOB_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            with self._active_lock:
+                self._active.add(job["id"])
+            try:
+                self.execute(job)
+            finally:
+                with self._active_lock:
+                    self._active.discard(job["id"])
+
+    def _heartbeat_loop(self):
+        # Long nodes emit no events, so keep running jobs from looking stale, and take back
+        # jobs whose worker died instead of waiting for some worker to restart
+        while not self._stopping.wait(JOB_HEARTBEAT_TIMEOUT / 5):
+            with self._active_lock:
+                active = list(self._active)
+            try:
+                if active:
+                    self.store.heartbeat(active)
+                requeued = self.store.requeue_stale()
+            except sqlite3.Error as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+                continue
+            if requeued:
+                logger.info(f"Requeued {requeued} stale jobs")
+                self.notify()
+
+    def execute(self, job: dict):
+        from graph import start_langgraph
+
+        job_id = job["id"]
+        logger.info(f"Running job {job_id} (attempt {job['attempts']})")
+        try:
+            result = start_langgraph(
+                job["inputs"],
+                streaming_callback=lambda data: self.store.add_event(job_id, "step", data),
+                on_node_complete=lambda node, state: self.store.checkpoint(job_id, node, state),
+                thread_id=job.get("thread_id") or job_id,
+                deadline=job.get("deadline"),
+            )
+            self.store.finish(job_id, result)
+        except Exception as e:
+            if job["attempts"] < JOB_MAX_ATTEMPTS and not self._stopping.is_set():
+                logger.warning(f"Job {job_id} attempt {job['attempts']} failed, retrying from its last checkpoint: {e}")
+                self.store.add_event(job_id, "retry", {"attempt": job["attempts"], "error": str(e)})
+                self.store.requeue([job_id])
+                self.notify()
+                return
+            logger.exception(f"Job {job_id} failed")
+            self.store.fail(job_id, str(e))
+
+
+_store = None
+_runner = None
+_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _store
+    with _lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
+
+
+def start_runner(threads: int = None) -> Optional[JobRunner]:
+    """Start this process's job runner (JOB_RUNNER_THREADS, 0 to only accept submissions)."""
+    global _runner
+    threads = int(os.getenv("JOB_RUNNER_THREADS", os.getenv("MAX_CONCURRENT_GENERATIONS", 10))) if threads is None else threads
+    if threads <= 0:
+        return None
+    from graph import require_shared_checkpointer
+
+    # Fail at startup rather than on the first job retried or requeued on another worker
+    require_shared_checkpointer()
+    _runner = JobRunner(get_job_store(), threads)
+    _runner.start()
+    return _runner
+
+
+def stop_runner(timeout: float = None):
+    if _runner is not None:
+        _runner.stop(timeout)
+
+
+def notify_runner():
+    if _runner is not None:
+        _runner.notify()
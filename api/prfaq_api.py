@@ -1,31 +1,33 @@
 from fastapi import HTTPException, Header, Depends, APIRouter
 from pydantic import BaseModel
 from typing import Optional, List
-from langchain_openai import ChatOpenAI  
-from concurrent.futures import ThreadPoolExecutor
-from postgrest import APIError
-from fastapi.responses import StreamingResponse
-from tools.web_search.web_search import WebTrustedSearchTool
-from tools.qdrant_tool import kb_qdrant_tool
+from fastapi.responses import Response, StreamingResponse
 import asyncio
+import logging
 import os
 import json
+import time
 from dotenv import load_dotenv
 load_dotenv()
 
 from api.authenticate import authenticate
 
-from graph import start_langgraph
+# Supabase access (cached, concurrent queries)
+from api.space_store import fetch_space_details, load_space, get_client
+# Generations run as background jobs (see api/jobs.py)
+from api.jobs import get_job_store, notify_runner, JOB_POLL_INTERVAL, TERMINAL_STATUSES
+from utils.schemas import PRFAQDocument
+from utils.render import iter_markdown, to_markdown, markdown_to_docx, markdown_to_pdf
 
-# Load environment variables (e.g., Supabase credentials)
-load_dotenv()
+# LangChain, LangGraph, the graph and the tools are imported inside the handlers (or by
+# warm_up in the background) so the server can start accepting requests immediately
 
-# Supabase client initialization
-from supabase import create_client
+logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Default time budget for a generation's KB and web lookups when the client sends no x-deadline (0 for none)
+PRFAQ_DEADLINE = float(os.getenv("PRFAQ_DEADLINE", 0))
+# How long /generate waits for its job before answering 504; the job keeps running and can be polled
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", 900))
 
 router = APIRouter()
 
@@ -42,102 +44,72 @@ class PRFAQResponse(BaseModel):
     markdown_output: str
     response_to_user: str
 
-def format_output(output):
-    """Function to format PR FAQ sections."""
-    pr_faq_str = ""
-    pr_faq_str += f"**Title:** {output.get('Title', '')}\n\n"
-    pr_faq_str += f"**Subtitle:** {output.get('Subtitle', '')}\n\n"
-    pr_faq_str += f"**Introduction Paragraph:** {output.get('IntroParagraph', '')}\n\n"
-    pr_faq_str += f"**Problem Statement:** {output.get('ProblemStatement', '')}\n\n"
-    pr_faq_str += f"**Solution:** {output.get('Solution', '')}\n\n"
-    pr_faq_str += "**Leader's Quote:** \n\n"
-    pr_faq_str += "**Customer's Quote:** \n\n"
-
-    pr_faq_str += f"\n**Competitors:**\n"
-    for competitor in output.get("Competitors", []):
-        name = competitor.get("name", "")
-        url = competitor.get("url", "")
-        pr_faq_str += f"\n- [{name}]({url})\n"
-
-    pr_faq_str += f"\n**Internal FAQs:**\n"
-    for faq in output.get("InternalFAQs", []):
-        question = faq.get('Question', faq.get('question', 'Unknown Question'))
-        answer = faq.get('Answer', faq.get('answer', 'No answer provided'))
-
-        pr_faq_str += f"\n**Q: {question}**\n"
-        pr_faq_str += f"\nA:\n{answer}\n"
-
-    pr_faq_str += f"\n**External FAQs:**\n"
-    for faq in output.get("ExternalFAQs", []):
-        question = faq.get('Question', faq.get('question', 'Unknown Question'))
-        answer = faq.get('Answer', faq.get('answer', 'No answer provided'))
-
-        pr_faq_str += f"\n**Q: {question}**\n"
-        pr_faq_str += f"\nA:\n{answer}\n"
-
-    return pr_faq_str
-
-def fetch_space_details(spaceid: str):
-    """
-    Fetch title, details (solution, problemStatement), and links from the `spaces` table for the given spaceid.
-    Raises:
-      RuntimeError if the Supabase API call fails (4xx/5xx).
-      LookupError  if no rows exist for that spaceid.
-    Returns:
-      dict — containing `title`, `solution`, `problemStatement`, and `links`.
-    """
-    try:
-        resp = (
-            supabase
-            .table("spaces")
-            .select("title", "details", "links")
-            .eq("spaceid", spaceid)
-            .execute()
-        )
-    except APIError as e:
-        raise RuntimeError(f"Supabase API error: {e}") from e
+class ExportRequest(BaseModel):
+    markdown: str
+    format: str = "docx"
 
-    if not resp.data:
-        raise LookupError(f"No space found with id {spaceid!r}")
+EXPORT_FORMATS = {
+    "docx": (markdown_to_docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "pdf": (markdown_to_pdf, "application/pdf"),
+}
 
-    # Extract the first row
-    return resp.data[0]
+def warm_up():
+    """Import the generation stack and create clients ahead of the first request."""
+    try:
+        import graph  # noqa: F401
+        from tools.web_search.web_search import get_domain_llm
+        from utils.utils import invoke_json  # noqa: F401
 
+        get_domain_llm()
+        get_client()
+        logger.info("Warm-up complete")
+    except Exception as e:
+        logger.warning(f"Warm-up failed, dependencies will load on first request: {e}")
+
+async def build_inputs(messages, x_space_id, x_thread_id, x_web_search) -> dict:
+    """Fetch the space and its documents and build the graph inputs."""
+    # Fetch space details and merged content from space_documents concurrently
+    space, reference_content = await load_space(x_space_id, x_thread_id)
+    return {
+        "space_id": x_space_id,
+        "topic": space["title"],
+        "problem": space["details"].get("problemStatement", ""),
+        "solution": space["details"].get("solution", ""),
+        "chat_history": messages or ["Generate PR/FAQ for me"],
+        "web_scraping_links": space.get("links", ""),
+        "reference_doc_content": reference_content,
+        "use_websearch": x_web_search.lower() == 'true'  # Convert string to boolean
+    }
+
+async def submit_job(inputs: dict, thread_id: Optional[str] = None, budget: Optional[float] = None) -> str:
+    """
+    Queue a generation; retries on the same thread resume from the graph's last checkpoint.
+    `budget` is the x-deadline header: seconds after which lookups stop and answers use the evidence gathered so far.
+    """
+    seconds = budget or PRFAQ_DEADLINE
+    deadline = time.time() + seconds if seconds > 0 else None
+    job_id = await asyncio.to_thread(get_job_store().create, inputs, thread_id, deadline)
+    notify_runner()
+    return job_id
 
-def fetch_space_documents(spaceid: str, chatid: Optional[str]):
+async def wait_for_job(job_id: str, timeout: float = JOB_WAIT_TIMEOUT) -> dict:
     """
-    Fetch all content rows for the given spaceid from the `space_documents` table.
+    Poll a job until it finishes.
     Raises:
-      RuntimeError if the Supabase API call fails (4xx/5xx).
-      LookupError  if no rows exist for that spaceid.
-    Returns:
-      str — merged content from all rows.
+      LookupError  if the job does not exist (or was purged).
+      TimeoutError if it is still running after `timeout` seconds.
     """
-    try:
-        resp1 = (
-            supabase
-            .table("space_documents")
-            .select("content")
-            .eq("spaceid", spaceid)
-            .execute()
-        )
-        resp2 = (
-            supabase
-            .table("general_documents")
-            .select("content")
-            .eq("chatid", chatid)
-            .execute()
-        )
-    except APIError as e:
-        raise RuntimeError(f"Supabase API error: {e}") from e
-
-    merged_content = ""
-    if resp1.data:
-        merged_content += "\n".join(row["content"] for row in resp1.data) + "\n"
-    if resp2.data:
-        merged_content += "\n".join(row["content"] for row in resp2.data)
-
-    return merged_content.strip()
+    store = get_job_store()
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await asyncio.to_thread(store.get, job_id)
+        if job is None:
+            raise LookupError(f"No job with id {job_id!r}")
+        if job["status"] in TERMINAL_STATUSES:
+            return job
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Job {job_id} is still {job['status']} after {timeout:.0f}s, poll /jobs/{job_id} for the result")
+        await asyncio.sleep(JOB_POLL_INTERVAL)
 
 @router.post("/generate", response_model=PRFAQResponse)
 async def generate_prfaq(
@@ -146,62 +118,68 @@ async def generate_prfaq(
     x_thread_id: Optional[str] = Header(None, alias="x-thread-id", description="Thread ID for tracking the request"),
     x_command: Optional[str] = Header(None, alias="x-command", description="Command in use"),
     x_web_search: Optional[str] = Header("False", alias="x-web-search", description="Boolean flag to use web search"),
+    x_deadline: Optional[float] = Header(None, alias="x-deadline", description="Seconds the generation may spend on KB and web lookups"),
     # user: str = Depends(authenticate)
 ):
     """
     Generate a PR FAQ for a given spaceid by fetching data from the Supabase database.
+    The generation runs as a background job; if this request is dropped the job still
+    completes and can be fetched from /jobs.
     """
     try:
-        # Parse body to extract messages
-        messages = request.messages
-        if not messages:
-            messages = ["Generate PR/FAQ for me"]
-        # Fetch space details
-        space = fetch_space_details(x_space_id)
-        title = space["title"]
-        solution = space["details"].get("solution", "")
-        problem_statement = space["details"].get("problemStatement", "")
-        links = space.get("links", "")
-
-        # Fetch and merge content from space_documents
-        reference_content = fetch_space_documents(x_space_id, x_thread_id)
-
-        # Prepare inputs for the Crew AI
-        inputs = {
-            "topic": title,
-            "problem": problem_statement,
-            "solution": solution,
-            "chat_history": messages, 
-            "web_scraping_links": links,
-            "reference_doc_content": reference_content,
-            "use_websearch": x_web_search.lower()=='true'  # Convert string to boolean
-        }
-        
-        # Instantiate and kickoff the PR FAQ generation
-        result = start_langgraph(inputs, None)
-
-        markdown = format_output(result)
-        user_response = result.get("UserResponse", "Here's the generated document for you:")
-
-        return {
-            "markdown_output": markdown,
-            "response_to_user": user_response
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+        inputs = await build_inputs(request.messages, x_space_id, x_thread_id, x_web_search)
+        job = await wait_for_job(await submit_job(inputs, x_thread_id, x_deadline))
     except LookupError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
-def sse_format(data, event=None):
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {job['error']}")
+    result = job["result"]
+    return {
+        "markdown_output": to_markdown(result),
+        "response_to_user": result.get("UserResponse", "Here's the generated document for you:")
+    }
+
+def sse_format(data, event=None, id=None):
     """Format a dict as an SSE event string."""
-    prefix = f"event: {event}\n" if event else ""
+    prefix = f"id: {id}\n" if id is not None else ""
+    prefix += f"event: {event}\n" if event else ""
     return f"{prefix}data: {json.dumps(data)}\n\n"
 
+async def job_event_stream(job_id: str, after: int = 0):
+    """
+    Replay a job's events after sequence number `after` and follow it until it finishes.
+    Thinking steps go out as "step" events, node completions as "node" events and retries after a
+    failed attempt as "retry" events; on success
+    the rendered markdown follows section by section and then a "result" event, on failure an "error" event.
+    Every event carries its sequence number as the SSE id, so clients can re-attach with Last-Event-ID.
+    """
+    store = get_job_store()
+    while True:
+        events = await asyncio.to_thread(store.events, job_id, after)
+        for event in events:
+            after = event["seq"]
+            if event["event"] in ("step", "node", "retry"):
+                yield sse_format(event["data"], event=event["event"], id=after)
+            elif event["data"].get("status") == "succeeded":
+                job = await asyncio.to_thread(store.get, job_id)
+                # Rendered markdown goes out section by section ahead of the raw result
+                for section in iter_markdown(job["result"]):
+                    yield sse_format({"markdown": section}, event="markdown", id=after)
+                yield sse_format({"result": job["result"]}, event="result", id=after)
+                return
+            elif event["data"].get("status") == "failed":
+                yield sse_format({"error": event["data"].get("error")}, event="error", id=after)
+                return
+        if not events:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
 @router.post("/logging")
 async def generate_prfaq_logs(
     request: Request,
@@ -209,64 +187,79 @@ async def generate_prfaq_logs(
     x_thread_id: Optional[str] = Header(None, alias="x-thread-id"),
     x_command: Optional[str] = Header(None, alias="x-command"),
     x_web_search: Optional[str] = Header("False", alias="x-web-search"),
+    x_deadline: Optional[float] = Header(None, alias="x-deadline"),
     # user: str = Depends(authenticate),
 ):
     """
     SSE Streaming endpoint for PRFAQ generation.
-    Yields "step" events for each thinking step, and a final "result" event for the output.
+    Yields a "job" event with the background job ID, "step" events for each thinking step, "markdown" events with the rendered document
+    section by section, and a final "result" event for the output (or an "error" event).
     """
-    # Fetch space and docs as in your current code...
     try:
-        # # Parse body to extract messages (adjust as needed)
-        messages = request.messages
-        if not messages:
-            messages = ["Generate PR/FAQ for me"]
-
-        space = fetch_space_details(x_space_id)
-        title = space["title"]
-        solution = space["details"].get("solution", "")
-        problem_statement = space["details"].get("problemStatement", "")
-        links = space.get("links", "")
-
-        reference_content = fetch_space_documents(x_space_id, x_thread_id)
-
-        inputs = {
-            "topic": title,
-            "problem": problem_statement,
-            "solution": solution,
-            "chat_history": messages,
-            "web_scraping_links": links,
-            "reference_doc_content": reference_content,
-            "use_websearch": x_web_search.lower() == 'true'
-        }
+        inputs = await build_inputs(request.messages, x_space_id, x_thread_id, x_web_search)
+        job_id = await submit_job(inputs, x_thread_id, x_deadline)
 
         async def event_generator():
-            loop = asyncio.get_running_loop()
-            queue = asyncio.Queue()
-
-            def streaming_callback(data):
-                asyncio.run_coroutine_threadsafe(queue.put(data), loop)
-
-            def run_workflow():
-                result = start_langgraph(inputs, streaming_callback=streaming_callback)
-                asyncio.run_coroutine_threadsafe(queue.put({"__final__": result}), loop)
-
-            executor = ThreadPoolExecutor(max_workers=10)
-            loop.run_in_executor(executor, run_workflow)
-
-            while True:
-                data = await queue.get()
-                if "__final__" in data:
-                    yield sse_format({"result": data["__final__"]}, event="result")
-                    break
-                else:
-                    yield sse_format(data, event="step")
+            # The job ID comes first so a dropped client can re-attach via /jobs/{job_id}/events
+            yield sse_format({"job_id": job_id}, event="job")
+            async for event in job_event_stream(job_id):
+                yield event
 
         return StreamingResponse(event_generator(), media_type="text/event-stream")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+@router.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    x_space_id: str = Header(..., alias="x-space-id", description="Space ID for which the PR FAQ needs to be generated"),
+    x_thread_id: Optional[str] = Header(None, alias="x-thread-id", description="Thread ID for tracking the request"),
+    x_web_search: Optional[str] = Header("False", alias="x-web-search", description="Boolean flag to use web search"),
+    x_deadline: Optional[float] = Header(None, alias="x-deadline", description="Seconds the generation may spend on KB and web lookups"),
+):
+    """Queue a PR FAQ generation and return its job ID immediately."""
+    try:
+        inputs = await build_inputs(request.messages, x_space_id, x_thread_id, x_web_search)
+        return {"job_id": await submit_job(inputs, x_thread_id, x_deadline), "status": "queued"}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status and the last completed node; the rendered PR FAQ once it has succeeded."""
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id!r}")
+    response = {
+        "job_id": job_id,
+        "status": job["status"],
+        "current_node": job["current_node"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == "succeeded":
+        response["markdown_output"] = to_markdown(job["result"])
+        response["response_to_user"] = job["result"].get("UserResponse", "Here's the generated document for you:")
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    after: int = 0,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """Re-attach to a job's SSE stream, replaying events after `after` (or the Last-Event-ID header)."""
+    if await asyncio.to_thread(get_job_store().get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id!r}")
+    start = last_event_id if last_event_id is not None else after
+    return StreamingResponse(job_event_stream(job_id, start), media_type="text/event-stream")
+
 @router.post("/modify", response_model=PRFAQResponse)
 async def modify_faq(
     request: ModifyRequest,
@@ -285,13 +278,15 @@ async def modify_faq(
         current_prfaq = request.currentPrFAQ
 
         # Fetch space details
-        space = fetch_space_details(x_space_id)  # Assuming this function is defined elsewhere
+        space = await fetch_space_details(x_space_id)
         title = space["title"]
         solution = space["details"].get("solution", "")
         problem_statement = space["details"].get("problemStatement", "")
 
-        # Initialise LLM
-        llm = ChatOpenAI(model="o4-mini", temperature=1, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        from tools.qdrant_tool import kb_qdrant_tool
+        from tools.web_search.web_search import WebTrustedSearchTool
+        from utils.utils import get_openai_llm, invoke_json
+
 
         # Refine the search query based on user feedback
         refine_prompt = f"""
@@ -311,7 +306,7 @@ async def modify_faq(
         """
 
         # Perform Web Search and Knowledge Base Search
-        refined_query_response = llm.invoke(refine_prompt)
+        refined_query_response = get_openai_llm("modify_query").invoke(refine_prompt)
         refined_query = refined_query_response.content.strip()
 
         kb_response = kb_qdrant_tool.run(refined_query)
@@ -427,17 +422,11 @@ async def modify_faq(
                 - Ensure the tone is formal yet personable, clear, and consistent with brand values.
                 - Avoid technical jargon unless necessary, and explain all abbreviations/acronyms.
         """
-        response = llm.invoke(prompt)
-        response_text = str(response.content.strip())
-
-        try:
-            cleaned_json = response_text.replace("```json", "").replace("```", "").strip()
-            parsed_output = json.loads(cleaned_json)
-            markdown = format_output(parsed_output)
-            user_response = parsed_output.get("UserResponse", "Here's the modified document according to your request:")
-            return {"markdown_output": markdown, "response_to_user": user_response}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to parse the updated PR FAQ: {e}")
+        parsed_output = invoke_json(get_openai_llm("modify_prfaq"), prompt, PRFAQDocument)
+        if not parsed_output:
+            raise HTTPException(status_code=500, detail="Failed to parse the updated PR FAQ")
+        markdown = to_markdown(parsed_output)
+        return {"markdown_output": markdown, "response_to_user": parsed_output["UserResponse"]}
 
     except LookupError as e:
         raise HTTPException(status_code=404, detail=f"Resource not found: {e}")
@@ -446,6 +435,19 @@ async def modify_faq(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+@router.post("/export")
+async def export_prfaq(request: ExportRequest):
+    """Render PR FAQ markdown (as returned in `markdown_output`) to a DOCX or PDF download."""
+    if request.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format {request.format!r}, expected one of {sorted(EXPORT_FORMATS)}")
+    render, media_type = EXPORT_FORMATS[request.format]
+    content = await asyncio.to_thread(render, request.markdown)
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="prfaq.{request.format}"'},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8082))
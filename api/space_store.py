@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from utils.cache import TTLCache
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Supabase client, created on first use so importing this module stays cheap."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from supabase import create_client
+
+            _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _client
+
+SPACE_CACHE_TTL = float(os.getenv("SPACE_CACHE_TTL", 300))
+# Optional column (e.g. "updated_at") used to revalidate entries without re-reading content
+SPACE_VERSION_COLUMN = os.getenv("SPACE_VERSION_COLUMN")
+# Check every cache hit against a cheap version (the version column, else document row counts)
+SPACE_CACHE_REVALIDATE = os.getenv("SPACE_CACHE_REVALIDATE", "true").lower() == "true"
+
+_space_cache = TTLCache(max_entries=512, ttl=SPACE_CACHE_TTL)
+_document_cache = TTLCache(max_entries=512, ttl=SPACE_CACHE_TTL)
+
+
+def _select(table: str, columns: list, column: str, value):
+    """Run a single blocking PostgREST select, mapping API failures to RuntimeError."""
+    from postgrest import APIError
+
+    try:
+        return get_client().table(table).select(*columns).eq(column, value).execute().data or []
+    except APIError as e:
+        raise RuntimeError(f"Supabase API error: {e}") from e
+
+
+def _count(table: str, column: str, value) -> int:
+    """Number of matching rows, from a HEAD request that transfers no content."""
+    from postgrest import APIError
+    from postgrest.types import CountMethod
+
+    try:
+        return get_client().table(table).select("*", count=CountMethod.exact, head=True).eq(column, value).execute().count or 0
+    except APIError as e:
+        raise RuntimeError(f"Supabase API error: {e}") from e
+
+
+def _version(rows) -> tuple:
+    return tuple(sorted(str(row.get(SPACE_VERSION_COLUMN)) for row in rows))
+
+
+async def _cached(cache: TTLCache, key, fetch, fetch_version=None):
+    """
+    Return a cache entry whose version still matches the source, refetching otherwise.
+    Fresh entries are checked on every hit when SPACE_CACHE_REVALIDATE is on; expired
+    ones are kept only if a version column is configured and its values are unchanged
+    (row counts alone cannot tell an edited document apart).
+    """
+    entry = cache.get(key)
+    if entry is not None and (not SPACE_CACHE_REVALIDATE or fetch_version is None or await fetch_version() == entry["version"]):
+        return entry
+    stale = cache.get_stale(key) if entry is None else None
+    if stale is not None and SPACE_VERSION_COLUMN and await fetch_version() == stale["version"]:
+        cache.set(key, stale)
+        return stale
+    entry = await fetch()
+    cache.set(key, entry)
+    return entry
+
+
+async def fetch_space_details(spaceid: str) -> dict:
+    """
+    Fetch title, details (solution, problemStatement), and links from the `spaces` table for the given spaceid.
+    Raises:
+      RuntimeError if the Supabase API call fails (4xx/5xx).
+      LookupError  if no rows exist for that spaceid.
+    Returns:
+      dict — containing `title`, `solution`, `problemStatement`, and `links`.
+    """
+    columns = ["title", "details", "links"] + ([SPACE_VERSION_COLUMN] if SPACE_VERSION_COLUMN else [])
+
+    async def fetch():
+        rows = await asyncio.to_thread(_select, "spaces", columns, "spaceid", spaceid)
+        if not rows:
+            raise LookupError(f"No space found with id {spaceid!r}")
+        # Extract the first row
+        return {"row": rows[0], "version": _version(rows[:1]) if SPACE_VERSION_COLUMN else None}
+
+    async def fetch_version():
+        return _version(await asyncio.to_thread(_select, "spaces", [SPACE_VERSION_COLUMN], "spaceid", spaceid))
+
+    if SPACE_CACHE_REVALIDATE and not SPACE_VERSION_COLUMN:
+        # Re-reading the single row costs as much as a version check, so edits show up immediately
+        return (await fetch())["row"]
+    return (await _cached(_space_cache, spaceid, fetch, fetch_version if SPACE_VERSION_COLUMN else None))["row"]
+
+
+async def fetch_space_documents(spaceid: str, chatid: Optional[str]) -> str:
+    """
+    Fetch all content rows for the given spaceid from `space_documents` and for the chat
+    from `general_documents`, querying both tables concurrently.
+    Raises:
+      RuntimeError if the Supabase API call fails (4xx/5xx).
+    Returns:
+      str — merged content from all rows.
+    """
+    columns = ["content"] + ([SPACE_VERSION_COLUMN] if SPACE_VERSION_COLUMN else [])
+
+    async def fetch():
+        space_rows, chat_rows = await asyncio.gather(
+            asyncio.to_thread(_select, "space_documents", columns, "spaceid", spaceid),
+            asyncio.to_thread(_select, "general_documents", columns, "chatid", chatid),
+        )
+        merged_content = ""
+        if space_rows:
+            merged_content += "\n".join(row["content"] for row in space_rows) + "\n"
+        if chat_rows:
+            merged_content += "\n".join(row["content"] for row in chat_rows)
+        merged_content = merged_content.strip()
+        version = (_version(space_rows), _version(chat_rows)) if SPACE_VERSION_COLUMN else (len(space_rows), len(chat_rows))
+        return {"content": merged_content, "version": version}
+
+    async def fetch_version():
+        # Without a version column, added or removed documents still show up in the row counts;
+        # edits to an existing document need the version column
+        if not SPACE_VERSION_COLUMN:
+            return tuple(await asyncio.gather(
+                asyncio.to_thread(_count, "space_documents", "spaceid", spaceid),
+                asyncio.to_thread(_count, "general_documents", "chatid", chatid),
+            ))
+        space_rows, chat_rows = await asyncio.gather(
+            asyncio.to_thread(_select, "space_documents", [SPACE_VERSION_COLUMN], "spaceid", spaceid),
+            asyncio.to_thread(_select, "general_documents", [SPACE_VERSION_COLUMN], "chatid", chatid),
+        )
+        return (_version(space_rows), _version(chat_rows))
+
+    return (await _cached(_document_cache, (spaceid, chatid), fetch, fetch_version))["content"]
+
+
+async def load_space(spaceid: str, chatid: Optional[str]):
+    """Fetch the space row and its merged document content concurrently."""
+    return await asyncio.gather(fetch_space_details(spaceid), fetch_space_documents(spaceid, chatid))
+
@@ -0,0 +1,190 @@
+"""
+Agreement of the local domain index (tools/web_search/domain_index.py) with the LLM's
+domain choices, and the latency of both.
+
+The LLM's picks for each query are the labels. With --live (needs OPENAI_API_KEY) they are
+fetched with the domain-selection prompts and saved to --labels; without it the saved
+labels are reused, and if there are none only the index's picks and latency are reported.
+For each selector (whitelisted domains, top 3, and 1 Finance sites, top 2) the report
+gives how often the index's top domain is among the LLM's, the share of the LLM's domains
+the index also returned, exact matches, and how often the index found no match and the
+tool would fall back to the LLM.
+
+Usage:
+    python -m benchmarks.domain_index_eval [--live] [--queries queries.txt] [--labels ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.graph_benchmark import DEFAULT_RESULTS_DIR, current_commit  # noqa: E402
+
+DEFAULT_LABELS = os.path.join(os.path.dirname(__file__), "fixtures", "domain_labels.json")
+
+# The kind of queries the pipeline sends: KB questions, competitor searches and FAQ evidence lookups
+QUERIES = [
+    "latest RBI repo rate",
+    "current CPI inflation in India",
+    "GDP growth rate of India last quarter",
+    "forex reserves held by RBI",
+    "bank credit growth to NBFCs",
+    "list of NBFCs allowed to accept public deposits",
+    "monthly SIP contributions to mutual funds",
+    "category-wise mutual fund AUM",
+    "new fund offers this month",
+    "passive funds and index fund ETFs in India",
+    "portfolio management services performance comparison",
+    "number of active demat clients by broker",
+    "FII DII daily net buying",
+    "IPO performance of recent listings",
+    "upcoming IPO schedule and red herring prospectus",
+    "market capitalisation of listed companies",
+    "corporate bond trades and private placements",
+    "green bond issuances in India",
+    "REIT and InvIT fundraising",
+    "SEBI circular on alternative investment funds",
+    "income tax slabs and rules for salaried employees",
+    "income tax return filing statistics",
+    "GST collections this year",
+    "GST council press release",
+    "life insurance penetration in India",
+    "pension fund regulations for NPS",
+    "auto sales and passenger vehicle production",
+    "wholesale price index and core industries output",
+    "India export import trade data",
+    "household consumption expenditure survey",
+    "US consumer price index",
+    "global stock exchange volumes",
+    "sectoral economic report on fintech in India",
+    "crypto ranking and scoring of bitcoin",
+    "tax saving options under section 80C",
+    "peer to peer lending as an asset class",
+    "financial wellness programmes for employees",
+    "personal finance professionals community event",
+    "financial advisors with a client first approach",
+    "macro indicators dashboard for India",
+]
+
+
+def _pick(text, domains):
+    return [domain for domain in domains if domain.lower() in text.lower()]
+
+
+def label(queries):
+    """The LLM's domain choices (and latency) for each query, as the tool currently asks for them."""
+    from tools.web_search.web_search import DOMAIN_SELECTION, ONEF_DOMAIN_SELECTION, get_domain_llm
+    from tools.web_search.whitelisted_sites import onefinance_whitelisted_sites, whitelisted_domain_list
+
+    labels = {}
+    for query in queries:
+        entry = {}
+        for name, template, domains in (("whitelisted", DOMAIN_SELECTION, whitelisted_domain_list),
+                                        ("onefinance", ONEF_DOMAIN_SELECTION, onefinance_whitelisted_sites)):
+            start = time.perf_counter()
+            response = get_domain_llm().invoke(template.render(query=query))
+            entry[name] = {"domains": _pick(response.content, domains), "latency": time.perf_counter() - start}
+        labels[query] = entry
+        print(f"labelled: {query}")
+    return labels
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else None
+
+
+def evaluate(name, index, k, queries, labels, repeat):
+    latencies, top1, overlap, exact, fallback, llm_latencies = [], [], [], [], 0, []
+    picks = {}
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            selected = index.top_k(query, k)
+        latencies.append((time.perf_counter() - start) / repeat)
+        picks[query] = selected
+        fallback += not selected
+        expected = (labels.get(query) or {}).get(name)
+        if not expected or not selected:
+            continue
+        llm_latencies.append(expected["latency"])
+        wanted = set(expected["domains"])
+        top1.append(selected[0] in wanted)
+        overlap.append(len(wanted & set(selected)) / len(wanted) if wanted else 0.0)
+        exact.append(wanted == set(selected))
+    return {
+        "queries": len(queries),
+        "labelled": len(top1),
+        "top1_agreement": statistics.mean(top1) if top1 else None,
+        "llm_domain_recall": statistics.mean(overlap) if overlap else None,
+        "exact_match": statistics.mean(exact) if exact else None,
+        "fallback_rate": fallback / len(queries),
+        "index_latency_us": {"p50": percentile(latencies, 50) * 1e6, "p99": percentile(latencies, 99) * 1e6},
+        "llm_latency_s": {"p50": percentile(llm_latencies, 50), "p99": percentile(llm_latencies, 99)} if llm_latencies else None,
+        "picks": picks,
+    }
+
+
+def main():
+    from tools.web_search.domain_index import onefinance_index, whitelisted_index
+
+    parser = argparse.ArgumentParser(description="Agreement and latency of the domain index against LLM domain selection")
+    parser.add_argument("--queries", help="File with one query per line (default: built-in set)")
+    parser.add_argument("--labels", default=DEFAULT_LABELS, help="LLM choices per query, written by --live")
+    parser.add_argument("--live", action="store_true", help="Ask the LLM for its choices first (needs OPENAI_API_KEY)")
+    parser.add_argument("--repeat", type=int, default=100, help="Index lookups per query when timing")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/domain-index-<commit>.json)")
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    labels = {}
+    if args.live:
+        labels = label(queries)
+        with open(args.labels, "w") as f:
+            json.dump(labels, f, indent=2)
+    elif os.path.exists(args.labels):
+        with open(args.labels) as f:
+            labels = json.load(f)
+    if not labels:
+        print("No LLM labels (run with --live to create them): reporting index picks and latency only\n")
+
+    results = {
+        "whitelisted": evaluate("whitelisted", whitelisted_index(), 3, queries, labels, args.repeat),
+        "onefinance": evaluate("onefinance", onefinance_index(), 2, queries, labels, args.repeat),
+    }
+
+    def fmt(value, pattern):
+        return "n/a" if value is None else pattern.format(value)
+
+    for name, result in results.items():
+        print(f"{name}: {result['queries']} queries, {result['labelled']} labelled")
+        print(f"    top-1 in LLM choice   {fmt(result['top1_agreement'], '{:.0%}')}")
+        print(f"    LLM domains recalled  {fmt(result['llm_domain_recall'], '{:.0%}')}")
+        print(f"    exact match           {fmt(result['exact_match'], '{:.0%}')}")
+        print(f"    no match (LLM asked)  {result['fallback_rate']:.0%}")
+        print(f"    index latency         p50 {result['index_latency_us']['p50']:.0f}us  p99 {result['index_latency_us']['p99']:.0f}us")
+        if result["llm_latency_s"]:
+            print(f"    LLM latency           p50 {result['llm_latency_s']['p50']:.2f}s  p99 {result['llm_latency_s']['p99']:.2f}s")
+        if not labels:
+            for query, picks in result["picks"].items():
+                print(f"        {query:<55} {', '.join(picks) or '-'}")
+
+    commit = current_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"domain-index-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": commit, "timestamp": time.time(), "results": results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
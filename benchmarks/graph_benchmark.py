@@ -0,0 +1,348 @@
+"""
+Offline benchmark for the PRFAQ LangGraph pipeline.
+
+Replays recorded LLM, KB, web search, scrape and Supabase responses through local
+stand-ins with configurable injected latency, runs `start_langgraph` end-to-end for
+every graph topology and reports wall time, per-node breakdown, call counts and
+prompt token totals. Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python -m benchmarks.graph_benchmark [--repeat 3] [--latency-scale 1.0] [--compare old.json]
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "recorded_run.json")
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Graph node functions and the names start_langgraph registers them under
+NODES = {
+    "kb_retrieval_node": "kb_retrieval",
+    "web_scrape_node": "web_scrape",
+    "extract_info_node": "extract_info",
+    "generate_content_node": "generate_content",
+    "generate_questions_node": "generate_questions",
+    "answer_faq_node": "answer_faqs",
+}
+
+TOPOLOGIES = {
+    "kb_only": {"links": False, "reference_docs": False},
+    "with_scrape": {"links": True, "reference_docs": False},
+    "with_reference_doc": {"links": False, "reference_docs": True},
+    "full": {"links": True, "reference_docs": True},
+}
+
+
+def count_tokens(text):
+    """Deterministic offline token estimate (~4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+class Recorder:
+    """Collects call counts, time spent and prompt tokens, attributed to the running node."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current_node = None
+        self.nodes = []
+        self.calls = defaultdict(int)
+        self.prompt_tokens = 0
+        self.node_stats = defaultdict(lambda: {"calls": defaultdict(int), "call_time": defaultdict(float), "prompt_tokens": 0})
+
+    def record(self, kind, seconds, prompt_tokens=0):
+        with self.lock:
+            self.calls[kind] += 1
+            self.prompt_tokens += prompt_tokens
+            stats = self.node_stats[self.current_node]
+            stats["calls"][kind] += 1
+            stats["call_time"][kind] += seconds
+            stats["prompt_tokens"] += prompt_tokens
+
+    def node_finished(self, name, seconds):
+        stats = self.node_stats[name]
+        self.nodes.append({
+            "node": name,
+            "wall_time": seconds,
+            "calls": dict(stats["calls"]),
+            "call_time": dict(stats["call_time"]),
+            "prompt_tokens": stats["prompt_tokens"],
+        })
+
+
+class Replay:
+    """Base class for stand-ins: sleeps for the injected latency and records the call."""
+
+    kind = None
+
+    def __init__(self, fixtures, recorder, latency):
+        self.fixtures = fixtures
+        self.recorder = recorder
+        self.latency = latency
+
+    def _call(self, prompt_tokens=0):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.recorder.record(self.kind, time.perf_counter() - start, prompt_tokens)
+
+
+class ReplayMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class ReplayResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class ReplayLLM(Replay):
+    kind = "llm"
+
+    def invoke(self, prompt, *args, **kwargs):
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        self._call(count_tokens(text))
+        for entry in self.fixtures["llm"]:
+            if entry["match"] in text:
+                return ReplayMessage(entry["response"])
+        return ReplayMessage(self.fixtures.get("llm_default", ""))
+
+    def with_structured_output(self, schema, *args, **kwargs):
+        return ReplayStructuredLLM(self)
+
+
+class ReplayStructuredLLM:
+    """Structured-output view of ReplayLLM: parses the recorded JSON the way the model's JSON mode would."""
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def invoke(self, prompt, *args, **kwargs):
+        from utils.json_repair import parse_json
+
+        return parse_json(self.llm.invoke(prompt).content)
+
+    def stream(self, prompt, *args, **kwargs):
+        yield self.invoke(prompt)
+
+
+class ReplayQdrantTool(Replay):
+    kind = "qdrant"
+    cache_ttl = 0
+
+    def fingerprint(self):
+        return ("replay",)
+
+    def run(self, question, top_k=5, *args, **kwargs):
+        self._call()
+        return self.fixtures["qdrant"]
+
+    def run_batch(self, questions, top_k=5, *args, **kwargs):
+        self._call()
+        return [self.fixtures["qdrant"] for _ in questions]
+
+
+class ReplayWebSearchTool(Replay):
+    kind = "web_search"
+
+    def run(self, query, *args, **kwargs):
+        self._call()
+        return self.fixtures["web_search"]
+
+    def choose_onef_domains(self, query):
+        return []
+
+
+class ReplayScrapeTool(Replay):
+    kind = "scrape"
+
+    def run(self, website_url):
+        self._call()
+        return self.fixtures["scrape"]
+
+
+class ReplaySupabase(Replay):
+    """Minimal stand-in for the PostgREST query builder used by api/prfaq_api.py."""
+
+    kind = "supabase"
+
+    class _Query:
+        def __init__(self, client, table):
+            self.client = client
+            self.table = table
+
+        def select(self, *columns):
+            return self
+
+        def eq(self, column, value):
+            return self
+
+        def execute(self):
+            self.client._call()
+            data = self.client.fixtures["supabase"][self.table]
+            return ReplayResponse(data if isinstance(data, list) else [data])
+
+    def table(self, name):
+        return self._Query(self, name)
+
+
+def build_inputs(supabase, topology):
+    """Fetch the space and documents the same way the /generate handler does, then apply the topology."""
+    space = supabase.table("spaces").select("title", "details", "links").eq("spaceid", "bench").execute().data[0]
+    documents = [
+        row["content"]
+        for table in ("space_documents", "general_documents")
+        for row in supabase.table(table).select("content").eq("spaceid", "bench").execute().data
+    ]
+    return {
+        "topic": space["title"],
+        "problem": space["details"].get("problemStatement", ""),
+        "solution": space["details"].get("solution", ""),
+        "chat_history": ["Generate PR/FAQ for me"],
+        "web_scraping_links": space.get("links", []) if topology["links"] else [],
+        "reference_doc_content": "\n".join(documents) if topology["reference_docs"] else "",
+        "use_websearch": True,
+    }
+
+
+@contextmanager
+def patched_graph(graph, fixtures, recorder, latency):
+    """Swap the graph module's LLM factory, tools and node functions for replaying, timed versions."""
+    llm = ReplayLLM(fixtures, recorder, latency["llm"])
+    replacements = {
+        "get_openai_llm": lambda *args, **kwargs: llm,
+        "kb_qdrant_tool": ReplayQdrantTool(fixtures, recorder, latency["qdrant"]),
+        "WebTrustedSearchTool": lambda *args, **kwargs: ReplayWebSearchTool(fixtures, recorder, latency["web_search"]),
+        "ScrapeWebsiteTool": lambda *args, **kwargs: ReplayScrapeTool(fixtures, recorder, latency["scrape"]),
+    }
+    for fn_name, node_name in NODES.items():
+        replacements[fn_name] = timed_node(node_name, getattr(graph, fn_name), recorder)
+
+    originals = {name: getattr(graph, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(graph, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(graph, name, value)
+
+
+def timed_node(name, fn, recorder):
+    @functools.wraps(fn)
+    def node(state, streaming_callback):
+        recorder.current_node = name
+        start = time.perf_counter()
+        try:
+            return fn(state, streaming_callback)
+        finally:
+            recorder.node_finished(name, time.perf_counter() - start)
+            recorder.current_node = None
+    return node
+
+
+def run_once(graph, fixtures, topology, latency):
+    recorder = Recorder()
+    supabase = ReplaySupabase(fixtures, recorder, latency["supabase"])
+    start = time.perf_counter()
+    inputs = build_inputs(supabase, topology)
+    with patched_graph(graph, fixtures, recorder, latency):
+        graph.start_langgraph(inputs, None)
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time": wall_time,
+        "critical_path": [
+            {**node, "share": node["wall_time"] / wall_time if wall_time else 0.0}
+            for node in recorder.nodes
+        ],
+        "calls": dict(recorder.calls),
+        "prompt_tokens": recorder.prompt_tokens,
+    }
+
+
+def run_benchmark(fixtures, repeat, latency_scale):
+    # ChatOpenAI clients built at import time need a key even though nothing reaches OpenAI
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-offline")
+    # Measure the cold pipeline unless warm persistent caches are explicitly requested
+    os.environ.setdefault("PRFAQ_STAGE_CACHE", "false")
+    os.environ.setdefault("COMPETITOR_CACHE_TTL", "0")
+    os.environ.setdefault("COMPETITOR_QUERY_CACHE_TTL", "0")
+    import graph
+
+    latency = {kind: seconds * latency_scale for kind, seconds in fixtures["latency"].items()}
+    results = {}
+    for name, topology in TOPOLOGIES.items():
+        runs = [run_once(graph, fixtures, topology, latency) for _ in range(repeat)]
+        median_run = sorted(runs, key=lambda r: r["wall_time"])[len(runs) // 2]
+        results[name] = {
+            **median_run,
+            "wall_time_median": statistics.median(r["wall_time"] for r in runs),
+            "wall_time_runs": [r["wall_time"] for r in runs],
+        }
+        print(f"{name:<20} {results[name]['wall_time_median']:.3f}s  calls={results[name]['calls']}  prompt_tokens={results[name]['prompt_tokens']}")
+        for node in median_run["critical_path"]:
+            print(f"    {node['node']:<20} {node['wall_time']:.3f}s ({node['share']:.0%})  calls={node['calls']}")
+    return {"latency": latency, "repeat": repeat, "topologies": results}
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline.get('commit', baseline_path)}:")
+    for name, result in current["topologies"].items():
+        old = baseline.get("topologies", {}).get(name)
+        if not old:
+            continue
+        delta = result["wall_time_median"] - old["wall_time_median"]
+        print(
+            f"{name:<20} {old['wall_time_median']:.3f}s -> {result['wall_time_median']:.3f}s ({delta:+.3f}s), "
+            f"prompt_tokens {old['prompt_tokens']} -> {result['prompt_tokens']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline PRFAQ graph benchmark")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for the fixture latencies")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+
+    commit = current_commit()
+    result = {"commit": commit, "timestamp": time.time(), **run_benchmark(fixtures, args.repeat, args.latency_scale)}
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
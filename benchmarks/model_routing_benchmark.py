@@ -0,0 +1,174 @@
+"""
+Latency and cost per model tier for every LLM call site in the pipeline.
+
+Captures the prompt each call site sends during an offline graph run (the recorded fixtures
+of graph_benchmark), then prices every prompt on every tier of utils/model_routing.py. By
+default the costs are estimated from token counts; with --live (needs OPENAI_API_KEY) each
+prompt is sent to each tier and the measured latency and token usage, including reasoning
+tokens, are reported. Totals compare the routed configuration against running every call
+site on a single tier.
+
+Usage:
+    python -m benchmarks.model_routing_benchmark [--live] [--samples 2] [--tiers fast,reasoning]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.graph_benchmark import (  # noqa: E402
+    DEFAULT_FIXTURES, DEFAULT_RESULTS_DIR, Recorder, ReplayLLM, ReplaySupabase, TOPOLOGIES,
+    build_inputs, count_tokens, current_commit, patched_graph,
+)
+
+# USD per million tokens (input, output); reasoning tokens are billed as output
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+}
+# Offline guess of hidden reasoning tokens per visible output token, replaced by measurements with --live
+REASONING_OVERHEAD = {None: 0.0, "low": 1.0, "medium": 3.0, "high": 6.0}
+
+
+class CapturingLLM(ReplayLLM):
+    """Replays the recorded responses and keeps every prompt with the call site that sent it."""
+
+    def __init__(self, fixtures, recorder, call_site, captured):
+        super().__init__(fixtures, recorder, 0)
+        self.call_site = call_site
+        self.captured = captured
+
+    def invoke(self, prompt, *args, **kwargs):
+        message = super().invoke(prompt, *args, **kwargs)
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        self.captured.append({"call_site": self.call_site, "prompt": text, "response": message.content})
+        return message
+
+
+def capture_prompts(fixtures, topology="full"):
+    import graph
+
+    captured = []
+    recorder = Recorder()
+    inputs = build_inputs(ReplaySupabase(fixtures, recorder, 0), TOPOLOGIES[topology])
+    latency = {kind: 0 for kind in ("llm", "qdrant", "web_search", "scrape", "supabase")}
+    with patched_graph(graph, fixtures, recorder, latency):
+        original = graph.get_openai_llm
+        graph.get_openai_llm = lambda call_site=None, **kwargs: CapturingLLM(fixtures, recorder, call_site, captured)
+        try:
+            graph.start_langgraph(inputs, None)
+        finally:
+            graph.get_openai_llm = original
+    return captured
+
+
+def cost(model, input_tokens, output_tokens):
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+def estimate(call, settings):
+    input_tokens = count_tokens(call["prompt"])
+    visible = count_tokens(call["response"])
+    output_tokens = visible + int(visible * REASONING_OVERHEAD.get(settings.get("reasoning_effort"), 0.0))
+    return {"latency": None, "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "cost": cost(settings["model"], input_tokens, output_tokens)}
+
+
+def measure(call, tier, settings):
+    from utils.utils import get_openai_llm
+
+    start = time.perf_counter()
+    response = get_openai_llm(tier=tier).invoke(call["prompt"])
+    latency = time.perf_counter() - start
+    usage = response.usage_metadata or {}
+    input_tokens = usage.get("input_tokens", count_tokens(call["prompt"]))
+    output_tokens = usage.get("output_tokens", count_tokens(response.content))
+    return {"latency": latency, "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "cost": cost(settings["model"], input_tokens, output_tokens)}
+
+
+def summarise(samples):
+    latencies = [s["latency"] for s in samples if s["latency"] is not None]
+    return {
+        "calls": len(samples),
+        "latency_median": statistics.median(latencies) if latencies else None,
+        "input_tokens": sum(s["input_tokens"] for s in samples),
+        "output_tokens": sum(s["output_tokens"] for s in samples),
+        "cost": sum(s["cost"] for s in samples),
+    }
+
+
+def main():
+    from utils.model_routing import tier_for, tiers
+
+    parser = argparse.ArgumentParser(description="Latency and cost per model tier for each LLM call site")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--live", action="store_true", help="Send the prompts to the models (needs OPENAI_API_KEY)")
+    parser.add_argument("--samples", type=int, default=2, help="Prompts per call site in --live mode")
+    parser.add_argument("--tiers", help="Comma-separated tiers to compare (default: all)")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/model-routing-<commit>.json)")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+    all_tiers = tiers()
+    selected = args.tiers.split(",") if args.tiers else list(all_tiers)
+
+    captured = capture_prompts(fixtures)
+    by_site = defaultdict(list)
+    for call in captured:
+        by_site[call["call_site"]].append(call)
+
+    # Per call site and tier: one pipeline run's worth of calls, scaled from the measured samples
+    results = defaultdict(dict)
+    for site, calls in sorted(by_site.items()):
+        for tier in selected:
+            settings = all_tiers[tier]
+            if args.live:
+                samples = [measure(call, tier, settings) for call in calls[:args.samples]]
+            else:
+                samples = [estimate(call, settings) for call in calls]
+            summary = summarise(samples)
+            scale = len(calls) / len(samples)
+            summary.update(cost=summary["cost"] * scale, calls=len(calls))
+            results[site][tier] = summary
+
+    mode = "measured" if args.live else "estimated"
+    print(f"{len(captured)} LLM calls in one pipeline run, costs {mode}\n")
+    header = f"{'call site':<26} {'routed':<10}" + "".join(f"{tier:>22}" for tier in selected)
+    print(header)
+    for site, per_tier in results.items():
+        cells = []
+        for tier in selected:
+            summary = per_tier[tier]
+            latency = f"{summary['latency_median']:.1f}s " if summary["latency_median"] is not None else ""
+            cells.append(f"{latency}${summary['cost']:.5f}".rjust(22))
+        print(f"{site:<26} {tier_for(site):<10}" + "".join(cells))
+
+    totals = {"routed": sum(per_tier.get(tier_for(site), {}).get("cost", 0.0) for site, per_tier in results.items())}
+    for tier in selected:
+        totals[f"all_{tier}"] = sum(per_tier[tier]["cost"] for per_tier in results.values())
+    print("\nCost per pipeline run:")
+    for name, total in totals.items():
+        print(f"    {name:<20} ${total:.5f}")
+
+    commit = current_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"model-routing-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": commit, "timestamp": time.time(), "mode": mode, "tiers": {t: all_tiers[t] for t in selected},
+                   "routes": {site: tier_for(site) for site in results}, "call_sites": results, "totals": totals}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
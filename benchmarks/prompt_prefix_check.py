@@ -0,0 +1,123 @@
+"""
+Prefix stability of the prompt templates and the share of each call site's prompt the
+provider can serve from its prompt cache.
+
+Every PromptTemplate is rendered with two different sets of sentinel inputs; the renders
+must share the whole static prefix and no input may leak into it, otherwise the prefix
+changes per request and is never a cache hit. The prompts captured from an offline graph
+run (the recorded fixtures of graph_benchmark) are then checked to start with their
+template's prefix, and the expected cached-token ratio per call site is reported. OpenAI
+caches prefixes of at least 1024 tokens, in 128-token increments. Exits 1 if a check fails.
+
+Measured ratios from real calls are in the "prompt_cache" section of /metrics.
+
+Usage:
+    python -m benchmarks.prompt_prefix_check [--fixtures ...] [--output ...]
+"""
+import argparse
+import json
+import os
+import string
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.graph_benchmark import DEFAULT_FIXTURES, DEFAULT_RESULTS_DIR, count_tokens, current_commit  # noqa: E402
+from benchmarks.model_routing_benchmark import capture_prompts  # noqa: E402
+
+MIN_CACHED_PREFIX = 1024
+CACHE_INCREMENT = 128
+
+
+def templates():
+    from prompts import prfaq
+    from tools.web_search import web_search
+
+    return [prfaq.CONTENT_GENERATION, prfaq.QUESTION_GENERATION, prfaq.ANSWER_GENERATION,
+            web_search.DOMAIN_SELECTION, web_search.ONEF_DOMAIN_SELECTION]
+
+
+def cacheable_tokens(prefix_tokens):
+    if prefix_tokens < MIN_CACHED_PREFIX:
+        return 0
+    return prefix_tokens - (prefix_tokens - MIN_CACHED_PREFIX) % CACHE_INCREMENT
+
+
+def check_template(template):
+    """Problems with the template's prefix, if any."""
+    fields = {name for _, name, _, _ in string.Formatter().parse(template.suffix) if name}
+    renders = [template.render(**{name: f"<<{run}:{name}>>" for name in fields}) for run in ("a", "b")]
+    problems = []
+    shared = os.path.commonprefix(renders)
+    if len(shared) < len(template.prefix):
+        problems.append(f"renders diverge {len(template.prefix) - len(shared)} characters before the end of the prefix")
+    if "<<" in template.prefix and ">>" in template.prefix:
+        problems.append("an input is substituted into the prefix")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check prompt prefix stability and report cacheable tokens per call site")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/prompt-prefix-<commit>.json)")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+
+    failures = []
+    by_name = {template.name: template for template in templates()}
+    report = {}
+    for name, template in by_name.items():
+        problems = check_template(template)
+        failures += [f"{name}: {problem}" for problem in problems]
+        prefix_tokens = count_tokens(template.prefix)
+        report[name] = {"fingerprint": template.fingerprint, "prefix_tokens": prefix_tokens,
+                        "cacheable_prefix_tokens": cacheable_tokens(prefix_tokens), "stable": not problems}
+
+    # Expected cache hits on repeat calls, from the prompts one pipeline run actually sends
+    sent = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+    for call in capture_prompts(fixtures):
+        totals = sent[call["call_site"]]
+        totals["calls"] += 1
+        totals["prompt_tokens"] += count_tokens(call["prompt"])
+        template = by_name.get(call["call_site"])
+        if template is None:
+            continue
+        if not call["prompt"].startswith(template.prefix):
+            failures.append(f"{call['call_site']}: the prompt sent does not start with the template prefix")
+            continue
+        totals["cached_tokens"] += report[template.name]["cacheable_prefix_tokens"]
+
+    print(f"{'template':<24} {'fingerprint':<14} {'prefix tokens':>14} {'cacheable':>10}  stable")
+    for name, entry in report.items():
+        print(f"{name:<24} {entry['fingerprint']:<14} {entry['prefix_tokens']:>14} "
+              f"{entry['cacheable_prefix_tokens']:>10}  {'yes' if entry['stable'] else 'NO'}")
+
+    print(f"\n{'call site':<26} {'calls':>6} {'prompt tokens':>14} {'cached ratio':>13}")
+    for site, totals in sorted(sent.items()):
+        totals["cached_ratio"] = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        print(f"{site:<26} {totals['calls']:>6} {totals['prompt_tokens']:>14} {totals['cached_ratio']:>13.0%}")
+    prompt_tokens = sum(t["prompt_tokens"] for t in sent.values())
+    cached_tokens = sum(t["cached_tokens"] for t in sent.values())
+    overall = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+    print(f"{'all':<26} {'':>6} {prompt_tokens:>14} {overall:>13.0%}")
+
+    commit = current_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"prompt-prefix-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": commit, "timestamp": time.time(), "templates": report, "call_sites": sent,
+                   "cached_ratio": overall, "failures": failures}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if failures:
+        print("\nPrefix check failed:\n    " + "\n    ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Cold-start benchmark for the API server.
+
+Profiles `import mainapp` in a fresh interpreter with `-X importtime`, reports the total
+import time, the slowest modules and any heavy dependency that is loaded eagerly, and
+(with --serve) measures how long uvicorn takes until it answers HTTP requests.
+Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python -m benchmarks.startup_benchmark [--repeat 5] [--serve] [--budget 1.0]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Modules that must only load on first use (or in the background warm-up), never at import
+LAZY_MODULES = ["langchain_openai", "langgraph", "graph", "supabase", "fitz", "qdrant_client", "openai"]
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Offline placeholders, the server must start without reaching any backing service
+ENV = {
+    "OPENAI_API_KEY": "sk-benchmark-offline",
+    "SUPABASE_URL": "https://benchmark.supabase.co",
+    "SUPABASE_KEY": "benchmark",
+    "PRFAQ_WARMUP": "false",
+    "PYTHONPATH": ROOT,
+}
+
+
+def profile_imports():
+    """Import mainapp in a fresh interpreter and parse the -X importtime report."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import mainapp"],
+        cwd=os.path.join(ROOT, "servers"),
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import mainapp failed:\n{proc.stderr[-2000:]}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000, "depth": len(indent) // 2})
+    total_ms = next((m["cumulative_ms"] for m in modules if m["module"] == "mainapp"), None)
+    return {"wall_time": wall_time, "import_ms": total_ms, "modules": modules}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(timeout=30):
+    """Seconds from launching uvicorn until the server answers GET /openapi.json."""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mainapp:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.join(ROOT, "servers"),
+        env={**os.environ, **ENV},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"Server not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API server cold-start benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to print")
+    parser.add_argument("--serve", action="store_true", help="Also measure time until uvicorn answers requests")
+    parser.add_argument("--budget", type=float, help="Fail (exit 1) if the median import time exceeds this many seconds")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/startup-<commit>.json)")
+    args = parser.parse_args()
+
+    runs = [profile_imports() for _ in range(args.repeat)]
+    median_run = sorted(runs, key=lambda r: r["import_ms"])[len(runs) // 2]
+    import_s = median_run["import_ms"] / 1000
+    loaded = {m["module"] for m in median_run["modules"]}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+
+    print(f"import mainapp       {import_s:.3f}s median over {args.repeat} runs (interpreter wall {statistics.median(r['wall_time'] for r in runs):.3f}s)")
+    print(f"modules imported     {len(median_run['modules'])}")
+    print(f"eager heavy modules  {', '.join(eager) or 'none'}")
+    print("\nSlowest top-level imports (cumulative):")
+    for module in sorted((m for m in median_run["modules"] if m["depth"] <= 1), key=lambda m: -m["cumulative_ms"])[:args.top]:
+        print(f"    {module['module']:<40} {module['cumulative_ms']:8.1f} ms")
+
+    result = {
+        "commit": current_commit(),
+        "timestamp": time.time(),
+        "import_s_median": import_s,
+        "import_s_runs": [r["import_ms"] / 1000 for r in runs],
+        "eager_heavy_modules": eager,
+        "modules": median_run["modules"],
+    }
+    if args.serve:
+        ready = [time_to_ready() for _ in range(args.repeat)]
+        result["ready_s_median"] = statistics.median(ready)
+        result["ready_s_runs"] = ready
+        print(f"\ntime to ready        {result['ready_s_median']:.3f}s median")
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"startup-{result['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.budget is not None and import_s > args.budget:
+        print(f"Import time {import_s:.3f}s exceeds the {args.budget:.3f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Recall and latency of the KB collection's vector storage options (utils/vector_storage.py)
+against a local Qdrant.
+
+The points of the KB collection are copied into one scratch collection per configuration
+(quantization, on-disk vectors, HNSW preset, shortened dimensions). The held-out questions
+are then run against each. Recall@k is measured against exact full-precision search over
+the same points, computed here with NumPy. The report also gives p50/p95 latency and an
+estimate of the RAM the vectors and HNSW graph need.
+
+Held-out questions come from --questions (one per line, embedded with KB_EMBEDDING_MODEL,
+needs OPENAI_API_KEY). Without that file, --holdout points are removed from the indexed
+set and their vectors serve as the queries. A configuration with a dimension suffix
+(scalar@512) truncates and renormalises the vectors. This is only meaningful for
+text-embedding-3 models. --synthetic N generates clustered random vectors instead of
+reading a collection, to try the script without a KB.
+
+Usage:
+    python -m benchmarks.vector_storage_benchmark [--url http://localhost:6333] [--source 1F_KB_BASE_PF]
+        [--questions held_out.txt | --holdout 200] [--configs float,scalar,binary,scalar-disk] [--top-k 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.graph_benchmark import DEFAULT_RESULTS_DIR, current_commit  # noqa: E402
+
+# Quantization, on-disk original vectors and HNSW preset of each configuration
+CONFIGS = {
+    "float": {"kind": "none", "on_disk": False, "preset": "default"},
+    "float-fast": {"kind": "none", "on_disk": False, "preset": "fast"},
+    "float-accurate": {"kind": "none", "on_disk": False, "preset": "accurate"},
+    "scalar": {"kind": "scalar", "on_disk": False, "preset": "default"},
+    "scalar-disk": {"kind": "scalar", "on_disk": True, "preset": "default"},
+    "scalar-compact": {"kind": "scalar", "on_disk": True, "preset": "compact"},
+    "binary": {"kind": "binary", "on_disk": False, "preset": "default"},
+    "binary-disk": {"kind": "binary", "on_disk": True, "preset": "default"},
+}
+DEFAULT_CONFIGS = "float,float-fast,scalar,scalar-disk,binary,binary-disk"
+QDRANT_DEFAULT_M = 16
+
+
+def normalise(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def load_points(client, collection, limit):
+    vectors, offset = [], None
+    while len(vectors) < limit:
+        points, offset = client.scroll(collection_name=collection, limit=min(256, limit - len(vectors)), offset=offset, with_vectors=True)
+        for point in points:
+            vectors.append(point.vector.get("") if isinstance(point.vector, dict) else point.vector)
+        if offset is None:
+            break
+    return np.array(vectors, dtype=np.float32)
+
+
+def synthetic_points(count, dimensions, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, count // 50), dimensions))
+    return normalise(centres[rng.integers(len(centres), size=count)] + 0.5 * rng.normal(size=(count, dimensions))).astype(np.float32)
+
+
+def embed_questions(path):
+    from openai import OpenAI
+    from utils.vector_storage import embedding_kwargs
+
+    with open(path) as f:
+        questions = [line.strip() for line in f if line.strip()]
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    vectors = []
+    for i in range(0, len(questions), 256):
+        response = client.embeddings.create(input=questions[i:i + 256], **embedding_kwargs())
+        vectors += [item.embedding for item in response.data]
+    return np.array(vectors, dtype=np.float32)
+
+
+def estimated_ram_mb(count, dimensions, config):
+    from utils.vector_storage import HNSW_PRESETS
+
+    preset = HNSW_PRESETS[config["preset"]]
+    quantized = {"none": 0, "scalar": dimensions, "binary": dimensions / 8}[config["kind"]]
+    original = 0 if config["on_disk"] else dimensions * 4
+    # Layer 0 links 2*m neighbours per point (4-byte ids); the upper layers add little
+    graph = 0 if preset.get("on_disk") else 2 * preset.get("m", QDRANT_DEFAULT_M) * 4
+    return count * (quantized + original + graph) / 2 ** 20
+
+
+def wait_until_indexed(client, collection, timeout=600):
+    from qdrant_client import models
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.get_collection(collection).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"    {collection} still optimizing after {timeout}s, measuring anyway")
+
+
+def run_config(client, name, config, dimensions, indexed, queries, truth, top_k, indexing_threshold, keep):
+    from qdrant_client import models
+    from utils.vector_storage import HNSW_PRESETS, collection_params, search_params
+
+    preset = HNSW_PRESETS[config["preset"]]
+    collection = f"bench_vectors_{name.replace('@', '_')}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(
+        collection_name=collection,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+        **collection_params(dimensions, config["kind"], config["on_disk"], preset),
+    )
+    vectors = normalise(indexed[:, :dimensions])
+    for start in range(0, len(vectors), 256):
+        client.upsert(
+            collection_name=collection,
+            points=models.Batch(ids=list(range(start, min(start + 256, len(vectors)))), vectors=vectors[start:start + 256].tolist()),
+            wait=True,
+        )
+    wait_until_indexed(client, collection)
+
+    params = search_params(config["kind"], preset)
+    query_vectors = normalise(queries[:, :dimensions]).tolist()
+    for vector in query_vectors[:10]:
+        client.query_points(collection_name=collection, query=vector, limit=top_k, search_params=params)
+    latencies, recalls = [], []
+    for vector, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        response = client.query_points(collection_name=collection, query=vector, limit=top_k, search_params=params)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({point.id for point in response.points} & set(expected)) / top_k)
+    if not keep:
+        client.delete_collection(collection)
+    return {
+        **config,
+        "dimensions": dimensions,
+        "recall": float(np.mean(recalls)),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "ram_mb": estimated_ram_mb(len(vectors), dimensions, config),
+    }
+
+
+def main():
+    from qdrant_client import QdrantClient
+    from utils.vector_storage import embedding_model
+
+    parser = argparse.ArgumentParser(description="Recall vs latency of KB vector storage options on a local Qdrant")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"), help="Qdrant URL, or :memory: to check the script")
+    parser.add_argument("--source", default=os.getenv("QDRANT_COLLECTION_NAME") or "1F_KB_BASE_PF", help="Collection whose points are indexed")
+    parser.add_argument("--max-points", type=int, default=100000)
+    parser.add_argument("--synthetic", type=int, help="Index this many synthetic 1536-dim vectors instead of --source")
+    parser.add_argument("--questions", help="Held-out questions, one per line")
+    parser.add_argument("--holdout", type=int, default=200, help="Points used as queries when there is no --questions file")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help=f"Comma-separated, from {', '.join(CONFIGS)}; add @DIMS to shorten vectors")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--indexing-threshold", type=int, default=1000, help="KB of vectors before Qdrant builds the HNSW index")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/vector-storage-<commit>.json)")
+    args = parser.parse_args()
+
+    client = QdrantClient(location=args.url) if args.url == ":memory:" else QdrantClient(url=args.url, api_key=os.getenv("QDRANT_API_KEY"))
+    points = synthetic_points(args.synthetic, 1536, args.seed) if args.synthetic else load_points(client, args.source, args.max_points)
+    rng = np.random.default_rng(args.seed)
+    if args.questions:
+        indexed, queries = points, embed_questions(args.questions)
+    else:
+        order = rng.permutation(len(points))
+        queries, indexed = points[order[:args.holdout]], points[order[args.holdout:]]
+    print(f"{len(indexed)} points indexed, {len(queries)} held-out queries, recall@{args.top_k} against exact search\n")
+
+    # Exact full-precision neighbours of every query
+    truth = np.argsort(-(normalise(queries) @ normalise(indexed).T), axis=1)[:, :args.top_k].tolist()
+
+    results = {}
+    for name in args.configs.split(","):
+        base, _, dims = name.partition("@")
+        dimensions = int(dims) if dims else points.shape[1]
+        if dims and embedding_model() == "text-embedding-ada-002" and not args.synthetic:
+            print(f"    {name}: ada-002 vectors are not trained to be shortened, expect low recall")
+        results[name] = run_config(client, name, CONFIGS[base], dimensions, indexed, queries, truth,
+                                   args.top_k, args.indexing_threshold, args.keep)
+
+    print(f"{'config':<20} {'recall@' + str(args.top_k):>9} {'p50 ms':>8} {'p95 ms':>8} {'RAM MB':>8}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['recall']:>9.3f} {result['latency_p50_ms']:>8.2f} {result['latency_p95_ms']:>8.2f} {result['ram_mb']:>8.1f}")
+
+    commit = current_commit()
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"vector-storage-{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": commit, "timestamp": time.time(), "url": args.url, "source": None if args.synthetic else args.source,
+                   "points": len(indexed), "queries": len(queries), "top_k": args.top_k, "configs": results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,31 @@
 from langgraph.graph import StateGraph, END
 from typing import Dict, Any, Callable
-from utils.utils import remove_links, get_openai_llm, convert_to_json
+from utils.utils import remove_links, get_openai_llm, invoke_json
+from utils.question_dedup import cluster_questions
+from utils.rerank import rerank
+from utils.schemas import PRFAQIntro, FAQQuestions, FAQAnswers, DEFAULT_USER_RESPONSE
+from utils.llm_cache import log_llm_cache_report
 from tools.web_search.web_search import WebTrustedSearchTool
 from tools.qdrant_tool import kb_qdrant_tool
 from tools.scrape_website_tool import ScrapeWebsiteTool
+from tools.competitor_research import CompetitorResearch, format_competitors
+from utils.tracing import span, propagate, flush as flush_traces, log_prompt_cache_report
+from utils.cache import SQLiteCache, cache_path, env_ttl, hash_key
+from utils.deadline import deadline_scope, result_by_deadline
+import functools
+import importlib.util
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from prompts.prfaq import CONTENT_GENERATION_PROMPT, QUESTION_GENERATION_PROMPT, ANSWER_GENERATION_PROMPT
 
+logger = logging.getLogger(__name__)
+
+# Time the answer stage waits for KB and web evidence before answering with what has arrived (0: no limit
+# beyond the request's own deadline)
+EVIDENCE_TIMEOUT = float(os.getenv("EVIDENCE_TIMEOUT", 0))
+MISSING_EVIDENCE = "No result: the lookup did not finish in time."
+
 # --- LangGraph Shared State ---
 State = Dict[str, Any]
 
@@ -16,7 +33,7 @@ def stream_thinking_step(state: State, step: str, detail: str, streaming_callbac
     """
     Stream the current thinking step to frontend with AI-generated sub-steps.
     """
-    llm = get_openai_llm()
+    llm = get_openai_llm("thinking_steps")
     
     # Generate thinking steps based on the current function
     step_prompt = f"""
@@ -56,41 +73,103 @@ def stream_thinking_step(state: State, step: str, detail: str, streaming_callbac
     if streaming_callback:
         streaming_callback(thinking_data)
 
+# --- Gather-stage memoization ---
+
+# Bump when the extraction prompts change so stale extractions are not reused
+STAGE_CACHE_VERSION = 1
+STAGE_CACHE_TTL = env_ttl("PRFAQ_STAGE_CACHE_TTL", 7 * 24 * 3600)
+STAGE_CACHE_ENABLED = os.getenv("PRFAQ_STAGE_CACHE", "true").lower() == "true" and STAGE_CACHE_TTL != 0
+stage_cache = SQLiteCache(
+    namespace="gather_stages",
+    ttl=STAGE_CACHE_TTL,
+    max_entries=int(os.getenv("PRFAQ_STAGE_CACHE_MAX_ENTRIES", 5000)),
+) if STAGE_CACHE_ENABLED else None
+
+
+def kb_stage_settings() -> tuple:
+    """What the KB stage's output depends on besides its inputs: the KB searched and how results are reranked."""
+    return (kb_qdrant_tool.fingerprint(), os.getenv("RERANK", "true"), os.getenv("KB_RERANK_TOP_N", "6"))
+
+
+def memoize_stage(step: str, output_key: str, input_keys: tuple, settings: Callable = None, ttl: Callable = None):
+    """
+    Persist a gather node's output keyed by a hash of exactly the state keys it reads
+    (plus `settings()`, for configuration the output depends on), so regenerations only
+    re-run stages whose inputs changed. `ttl()` can shorten the stage's lifetime below
+    PRFAQ_STAGE_CACHE_TTL. A node can return `stage_cacheable: False` (e.g. after a tool
+    error) to keep its output out of the cache.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def node(state: State, streaming_callback) -> State:
+            lifetime = ttl() if ttl else STAGE_CACHE_TTL
+            if stage_cache is None or lifetime == 0:
+                result = fn(state, streaming_callback)
+                result.pop("stage_cacheable", None)
+                return result
+            key = hash_key(step, STAGE_CACHE_VERSION, {k: state.get(k) for k in input_keys}, settings() if settings else None)
+            cached = stage_cache.get(key)
+            if cached is not None:
+                logger.info(f"Reusing cached {output_key} for stage {step}")
+                thinking_data = {"step": step, "detail": "Reusing information extracted earlier for the same inputs."}
+                state.setdefault("thinking_steps", []).append(thinking_data)
+                if streaming_callback:
+                    streaming_callback(thinking_data)
+                return {**state, output_key: cached}
+            result = fn(state, streaming_callback)
+            if result.pop("stage_cacheable", True):
+                stage_cache.set(key, result.get(output_key), ttl=lifetime)
+            return result
+        return node
+    return decorator
+
 # --- Node Functions (Tasks) ---
 
+# KB results are only trusted for KB_CACHE_TTL, so the extraction from them is not kept longer
+@memoize_stage(
+    "kb_retrieval", "kb_content", ("topic", "problem", "solution"),
+    settings=kb_stage_settings,
+    ttl=lambda: min(STAGE_CACHE_TTL, kb_qdrant_tool.cache_ttl),
+)
 def kb_retrieval_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "kb_retrieval", "Retrieving relevant knowledge base information...", streaming_callback)
 
-    llm = get_openai_llm()
+    llm = get_openai_llm("kb_extraction")
     topic = state.get("topic", "Default Topic")
     problem = state.get("problem", "Default Problem")
     solution = state.get("solution", "Default Solution")
 
     query = f"Retrieve all information about {topic}. The problem is: {problem}. The proposed solution is: {solution}."
-    logging.info(f"KB Query: {query}")
+    logger.info(f"KB Query: {query}")
     kb_content = kb_qdrant_tool.run(question=query, top_k=10)
+    kb_failed = isinstance(kb_content, dict) and "error" in kb_content
+    kb_content = rerank(query, kb_content, top_n=int(os.getenv("KB_RERANK_TOP_N", 6)))
     stream_thinking_step(state, "kb_retrieval", "Parsing and extracting key info from KB content...", streaming_callback)
 
     prompt = f"Extract key info from the following knowledge base content on '{topic}', problem statement '{problem}' and solution '{solution}':\n{kb_content}"
     extracted = llm.invoke(prompt)
-    print(f"\n\nExtracted KB Content: {extracted.content}")
-    return {**state, "kb_content": extracted.content}
+    logger.debug(f"Extracted KB Content: {extracted.content}")
+    return {**state, "kb_content": extracted.content, "stage_cacheable": not kb_failed}
 
 
+@memoize_stage("web_scrape", "web_scrape_content", ("web_scraping_links", "topic", "problem", "solution"))
 def web_scrape_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "web_scrape", "Scraping provided web links and extracting key info...", streaming_callback)
-    llm = get_openai_llm()
+    llm = get_openai_llm("web_scrape_extraction")
     web_scraping_links = state.get("web_scraping_links", [])
     if not web_scraping_links:
         return {**state, "web_scrape_content": "No web link provided"}
     
     scrape_results = {}
+    scrape_failed = False
     for link in web_scraping_links:
         try:
             scraper = ScrapeWebsiteTool()
-            result = remove_links(scraper.run(website_url=link))
-            scrape_results[link] = result
+            result = scraper.run(website_url=link)
+            scrape_failed = scrape_failed or result.startswith("Error calling website scrape API")
+            scrape_results[link] = remove_links(result)
         except Exception:
+            scrape_failed = True
             scrape_results[link] = "Error occurred during scraping"
     topic = state.get("topic", "Default Topic")
     problem = state.get("problem", "Default Problem")
@@ -98,26 +177,27 @@ def web_scrape_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "web_scrape", f"Extracting info from scraped content...", streaming_callback)
     prompt = f"Extract key info from the following scraped web content on '{topic}', problem statement '{problem}' and solution '{solution}':\n{scrape_results}"
     extracted = llm.invoke(prompt)
-    print(f"\n\nExtracted Web Scrape Content: {extracted.content}")
-    return {**state, "web_scrape_content": extracted.content}
+    logger.debug(f"Extracted Web Scrape Content: {extracted.content}")
+    return {**state, "web_scrape_content": extracted.content, "stage_cacheable": not scrape_failed}
 
 
+@memoize_stage("extract_info", "extracted_reference_doc_content", ("reference_doc_content", "topic", "problem", "solution"))
 def extract_info_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "extract_info", "Extracting info from reference document...", streaming_callback)
-    llm = get_openai_llm()
+    llm = get_openai_llm("reference_doc_extraction")
     reference_doc = state.get("reference_doc_content", "")
     topic = state.get("topic", "Default Topic")
     problem = state.get("problem", "Default Problem")
     solution = state.get("solution", "Default Solution")
     prompt = f"Extract key info from the following scraped web content on '{topic}', problem statement '{problem}' and solution '{solution}':\n{reference_doc}"
     extracted = llm.invoke(prompt)
-    print(f"\n\nExtracted Reference Document Content: {extracted.content}")
+    logger.debug(f"Extracted Reference Document Content: {extracted.content}")
     return {**state, "extracted_reference_doc_content": extracted.content}
 
 
 def generate_content_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "generate_content", "Generating PR/FAQ content leveraging all available information...", streaming_callback)
-    llm = get_openai_llm()
+    llm = get_openai_llm("content_generation")
     topic = state.get("topic")
     problem = state.get("problem")
     solution = state.get("solution")
@@ -126,62 +206,34 @@ def generate_content_node(state: State, streaming_callback) -> State:
     kb_content = state.get("kb_content", "")
     web_scrape_content = state.get("web_scrape_content", "")
     reference_doc_content = state.get("extracted_reference_doc_content", "")
-    query=llm.invoke(f"""Provided you with the topic {topic}, problem statement {problem} and a solution {solution}.
-                        Your task is to generate a single, concise, and keyword-rich search query that can be used by a web search tool to discover similar or competing products or services in the market.
-                        The query must:
-                        - Understand the topic, problem, and solution.
-                        - Reflect the real functionality described in the solution.
-                        - Use practical, discoverable keywords people would actually search.
-                        - Form a focused, real-world query like one a user would type into Google to find competitors or alternatives.
-                        - Be specific enough to surface tools or services addressing the same use case.
-                        Return only the search query string. Do not include explanations, extra formatting, or labels.
-                     
-                        ### Just an example, the input can vary:
-
-                        **Input:**
-                        Topic: Doculocker  
-                        Problem Statement: To implement a document moderation system to ensure uploaded documents are free from adult, illegal, or inappropriate content. The system will analyze both images and embedded text to maintain compliance and uphold a safe, trustworthy platform for financial document handling.  
-                        Solution: Develop a solution that automatically verifies whether an uploaded document — Word (doc/docx) and Excel (csv/xlsx) — is free from unsafe content, including but not limited to adult, illegal, violent, hateful, discriminatory, or offensive material. The system will analyze both images and embedded text to accurately classify documents as safe or flag them for further review, ensuring compliance and maintaining a standard of trust and safety on the platform.
-
-                        **EXPECTED QUERY OUTPUT:**
-                        Products/Services for detecting adult or violent content from images in Word and Excel documents using text and image moderation
-
-                        **Why this query works:**
-                        It leads to relevant services like:
-                        - **Amazon Rekognition**
-                        - **Google Cloud Vision API**
-                        - **Microsoft Azure Content Moderator**
-                        """)
-    
-    print(f"query for competitor-----------------{query.content}")
     web_tool = WebTrustedSearchTool()
-    competitor_results = web_tool.run(query=query.content, trust=False,read_content=False, top_k=20, onef_search=False)
+    research = CompetitorResearch(web_tool=web_tool, llm=get_openai_llm("competitor_query"))
+    competitors = research.run(topic, problem, solution, space_id=state.get("space_id"))
+    competitor_results = format_competitors(competitors)
 
     prompt = CONTENT_GENERATION_PROMPT(topic, problem, solution, chat_history, reference_doc_content, web_scrape_content, kb_content, competitor_results)
-    result = llm.invoke(prompt)
-    result = convert_to_json(result.content)
-    print(f"\n\nGenerated PR/FAQ Content: {result}")
+    result = invoke_json(llm, prompt, PRFAQIntro)
+    logger.debug(f"Generated PR/FAQ Content: {result}")
     stream_thinking_step(state, "generate_content", "PR/FAQ introduction generated.", streaming_callback)
     return {**state, "generated_content": result}
 
 
 def generate_questions_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "generate_questions", "Generating exhaustive internal and external FAQ questions...", streaming_callback)
-    llm = get_openai_llm()
+    llm = get_openai_llm("question_generation")
     topic = state.get("topic")
     problem = state.get("problem")
     solution = state.get("solution")
     chat_history = state.get("chat_history", ["Generate this PR/FAQ for me"])
     prompt =   QUESTION_GENERATION_PROMPT(topic, problem, solution, chat_history)
-    result = llm.invoke(prompt)
-    result = convert_to_json(result.content)
+    result = invoke_json(llm, prompt, FAQQuestions)
     stream_thinking_step(state, "generate_questions", "Questions generated.", streaming_callback)
     return {**state, "faq_questions": result}
 
 
 def answer_faq_node(state: State, streaming_callback) -> State:
     stream_thinking_step(state, "answer_faqs", "Answering all generated FAQs using all available information...", streaming_callback)
-    llm = get_openai_llm()
+    llm = get_openai_llm("answer_generation")
     questions = state.get("faq_questions", {})
     #print(f"---------------question list:{questions}")    
     generated_content = state.get("generated_content", {})
@@ -199,45 +251,63 @@ def answer_faq_node(state: State, streaming_callback) -> State:
 
     max_workers = int(os.getenv('THREAD_POOL_WORKERS', 12))
 
-    def process_question(question, topic, use_websearch):
-        full_question = question + f" in the context of {topic}"
-        kb_result = kb_tool.run(full_question)
-        web_result = None
-        if use_websearch:
-            web_result = web_tool.run(
-                query=full_question,
-                trust=True,
-                read_content=False,
-                top_k=5,
-                onef_search=False
-            )
-        return {
-            "question": question,
-            "kb_result": kb_result,
-            "web_result": web_result
-        }
+    def web_search(full_question):
+        return web_tool.run(
+            query=full_question,
+            trust=True,
+            read_content=False,
+            top_k=5,
+            onef_search=False
+        )
     
-    # Process internal_questions preserving order
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        internal_futures = [
-            executor.submit(process_question, q, topic, state.get("use_websearch", False))
-            for q in internal_q
-        ]
-        internal_results = [future.result() for future in internal_futures]
-        
-    # Process external_questions preserving order
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        external_futures = [
-            executor.submit(process_question, q, topic, state.get("use_websearch", False))
-            for q in external_q
-        ]
-        external_results = [future.result() for future in external_futures]
-
-    # Debug printing for processed questions
-    for result in internal_results + external_results:
-        print(f"\n\nProcessed Question: {result['question']}")
-        print(f"-----------Knowledge Base Results:-----------\n {result['kb_result']}")
-        print(f"-----------Web Search Results:-----------\n {result['web_result']}")
+    # Near-duplicate questions (across both sections) share a single retrieval
+    all_questions = internal_q + external_q
+    clusters = cluster_questions(all_questions, threshold=float(os.getenv("FAQ_DEDUP_THRESHOLD", 0.7)))
+    logger.info(f"Retrieving evidence for {len(all_questions)} questions in {len(clusters)} clusters")
+    full_questions = [all_questions[cluster[0]] + f" in the context of {topic}" for cluster in clusters]
+
+    # Web searches run in the pool alongside the batched KB lookup. Evidence that has not arrived
+    # by the deadline is left out and the answers are written from what is there
+    with deadline_scope(seconds=EVIDENCE_TIMEOUT):
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            web_futures = [
+                executor.submit(propagate(web_search), q) if state.get("use_websearch", False) else None
+                for q in full_questions
+            ]
+            # run_batch returns the KB lookups that finished by the deadline and MISSING_EVIDENCE for the rest
+            kb_future = executor.submit(propagate(kb_tool.run_batch), full_questions, default=MISSING_EVIDENCE)
+            kb_results = result_by_deadline(kb_future) or [MISSING_EVIDENCE] * len(full_questions)
+            # Only the best unique passages of each lookup go into the prompt
+            cluster_results = [
+                {
+                    "kb_result": rerank(question, kb_result),
+                    "web_result": rerank(question, result_by_deadline(future, MISSING_EVIDENCE)) if future else None
+                }
+                for question, kb_result, future in zip(full_questions, kb_results, web_futures)
+            ]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    missing = sum(MISSING_EVIDENCE in (r["kb_result"], r["web_result"]) for r in cluster_results)
+    if missing:
+        logger.warning(f"Answering with partial evidence: {missing} of {len(cluster_results)} lookups missed the deadline")
+
+    # Fan each cluster's evidence back out to its members, preserving order
+    results = [None] * len(all_questions)
+    for cluster, result in zip(clusters, cluster_results):
+        for idx in cluster:
+            results[idx] = {"question": all_questions[idx], **result}
+    internal_results = results[:len(internal_q)]
+    external_results = results[len(internal_q):]
+
+    # Full evidence payloads are large, only format them when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        for result in internal_results + external_results:
+            logger.debug(
+                f"Processed Question: {result['question']}\n"
+                f"-----------Knowledge Base Results:-----------\n {result['kb_result']}\n"
+                f"-----------Web Search Results:-----------\n {result['web_result']}"
+            )
 
     # Pass the processed FAQs separated into internal and external sections to the prompt
     prompt = ANSWER_GENERATION_PROMPT(
@@ -246,8 +316,16 @@ def answer_faq_node(state: State, streaming_callback) -> State:
         web_scrape_content, reference_doc_content
     )
 
-    response = llm.invoke(prompt)
-    response = convert_to_json(response.content)
+    # FAQs are long, so stream the answer and report progress as each one completes
+    answered = [0]
+
+    def report_progress(partial):
+        count = len(partial.get("InternalFAQs") or []) + len(partial.get("ExternalFAQs") or [])
+        if count > answered[0]:
+            answered[0] = count
+            streaming_callback({"step": "answer_faqs", "detail": f"Answering FAQ {count} of {len(all_questions)}..."})
+
+    response = invoke_json(llm, prompt, FAQAnswers, on_partial=report_progress if streaming_callback else None)
     stream_thinking_step(state, "answer_faqs", "PRFAQ generated!", streaming_callback)
     
     prfaq = {
@@ -258,18 +336,74 @@ def answer_faq_node(state: State, streaming_callback) -> State:
         "ProblemStatement": generated_content.get("ProblemStatement", ""),
         "Solution": generated_content.get("Solution", ""),
         "Competitors": generated_content.get("Competitors", []),
-        "InternalFAQs": response.get("InternalFAQs", ""),
-        "ExternalFAQs": response.get("ExternalFAQs", ""),
-        "UserResponse": response.get("UserResponse", "Here is the generated PR/FAQ document on topic and your provided inputs. Please review and let me know if any changes are needed")
+        "InternalFAQs": response.get("InternalFAQs", []),
+        "ExternalFAQs": response.get("ExternalFAQs", []),
+        "UserResponse": response.get("UserResponse", DEFAULT_USER_RESPONSE)
     }
     return prfaq
 
 # --- LangGraph Workflow ---
-def start_langgraph(inputs, streaming_callback):
+@functools.lru_cache(maxsize=None)
+def sqlite_checkpointer_available() -> bool:
+    try:
+        return importlib.util.find_spec("langgraph.checkpoint.sqlite") is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def require_shared_checkpointer():
+    """
+    With PRFAQ_CHECKPOINTER=sqlite but langgraph-checkpoint-sqlite missing, checkpoints fall back
+    to memory, where other workers cannot see them and a restart loses them: refuse to run with
+    several workers, and log an error otherwise.
+    """
+    if os.getenv("PRFAQ_CHECKPOINTER", "sqlite").lower() != "sqlite" or sqlite_checkpointer_available():
+        return
+    if int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+        raise RuntimeError("langgraph-checkpoint-sqlite is not installed; it is required with WEB_CONCURRENCY > 1")
+    logger.error("langgraph-checkpoint-sqlite is not installed, keeping checkpoints in memory: runs cannot resume after a restart")
+
+
+def get_checkpointer():
+    """
+    Checkpointer shared by every graph run in this process (PRFAQ_CHECKPOINTER: sqlite, memory or none).
+    The SQLite saver needs langgraph-checkpoint-sqlite and keeps checkpoints across restarts and workers.
+    """
+    kind = os.getenv("PRFAQ_CHECKPOINTER", "sqlite").lower()
+    if kind == "none":
+        return None
+    if kind == "sqlite":
+        require_shared_checkpointer()
+        if sqlite_checkpointer_available():
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            conn = sqlite3.connect(cache_path("prfaq_checkpoints.sqlite3"), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            return SqliteSaver(conn)
+    from langgraph.checkpoint.memory import MemorySaver
+
+    return MemorySaver()
+
+def checkpoint_thread(thread_id, inputs) -> str:
+    """Checkpoint thread for a run: the caller's thread ID plus the inputs, so changed inputs start over."""
+    return f"{thread_id}:{hash_key(inputs)[:16]}"
+
+def start_langgraph(inputs, streaming_callback, on_node_complete=None, thread_id=None, deadline=None):
+    """
+    Build and run the PR FAQ graph for `inputs`. `on_node_complete(node, state)` is called
+    with the full state after each node finishes, e.g. to checkpoint a background job.
+    With a `thread_id` the graph is checkpointed after every node, and a run retried on the
+    same thread with the same inputs resumes after the last node that completed.
+    `deadline` (epoch seconds) bounds every tool call made by the run.
+    """
     builder = StateGraph(State)
-    # Wrapper for injecting streaming callback into nodes
+    # Wrapper for injecting streaming callback into nodes and tracing each one as a span
     def wrap(fn):
-        return lambda state: fn(state, streaming_callback)
+        def node(state):
+            with span(f"node.{fn.__name__}"):
+                return fn(state, streaming_callback)
+        return node
 
     builder.add_node("kb_retrieval", wrap(kb_retrieval_node))
 
@@ -297,8 +431,36 @@ def start_langgraph(inputs, streaming_callback):
     builder.set_entry_point("kb_retrieval")
     builder.add_edge("answer_faqs", END)
 
-    workflow = builder.compile()
-    final_output = workflow.invoke(inputs, config={"streaming_callback": None})
+    checkpointer = get_checkpointer() if thread_id else None
+    workflow = builder.compile(checkpointer=checkpointer)
+    config = {"streaming_callback": None}
+    # Nodes update the state in place, keep the caller's inputs (and their checkpoint key) intact
+    graph_input = dict(inputs)
+    final_output = inputs
+    if checkpointer is not None:
+        config["configurable"] = {"thread_id": checkpoint_thread(thread_id, inputs)}
+        snapshot = workflow.get_state(config)
+        if snapshot.next:
+            # A previous run on this thread stopped part-way, continue from its last checkpoint
+            logger.info(f"Resuming thread {thread_id} at {', '.join(snapshot.next)}")
+            graph_input = None
+            final_output = snapshot.values
+    try:
+        with deadline_scope(at=deadline), span("prfaq.start_langgraph", topic=inputs.get("topic"),
+                                                 use_websearch=inputs.get("use_websearch", False), resumed=graph_input is None):
+            # Nodes return the full state, so each update is the state after that node
+            for update in workflow.stream(graph_input, config=config, stream_mode="updates"):
+                for node, state in update.items():
+                    final_output = state
+                    if on_node_complete:
+                        on_node_complete(node, state)
+        if checkpointer is not None:
+            # Only unfinished runs need their checkpoints
+            checkpointer.delete_thread(config["configurable"]["thread_id"])
+    finally:
+        flush_traces()
+        log_llm_cache_report()
+        log_prompt_cache_report()
     return final_output
 
 def print_streaming_callback(data):
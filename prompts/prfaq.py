@@ -1,16 +1,10 @@
 from prompts.constants import onefinance_guidelines, onefinance_info, role_info
+from prompts.template import PromptTemplate
 
-def CONTENT_GENERATION_PROMPT(topic, problem, solution, chat_history, reference_doc_content, web_scrape_content, kb_content, competitor_results):
-    return f"""{role_info}
-        Generate a detailed PR FAQ introduction in JSON format for the topic ```{topic}```, leveraging the following provided information and enhancing them if necessary :
-        1. The topic on which FAQ is to be generated: ``{topic}```
-        2. The problem we are trying to tackle: ```{problem}```
-        3. The solution to the problem or the features of the offering: ```{solution}```
-        4. The chat history: ```{chat_history}```
-        5. The extracted information from reference document (if available): {reference_doc_content}
-        6. The web-scraped information (if available) and how it is relevant to 1 Finance's new offering: {web_scrape_content}
-        7. Any relevant information extracted from the knowledge base: {kb_content}
-        8. The competitors and their URLs: {competitor_results}
+CONTENT_GENERATION = PromptTemplate(
+    "content_generation",
+    prefix=f"""{role_info}
+        Generate a detailed PR FAQ introduction in JSON format for the topic given in the inputs at the end, leveraging the provided information and enhancing it if necessary.
 
         ONLY USE INFORMATION PRESENT IN THE KNOWLEDGE BASE DO NOT MAKE UP INFORMATION.
         Use the web search tool to search for competitors and market research for popular products solving the same problem and their urls. Set trust to false, read_content to false and top_k as 20.
@@ -29,20 +23,32 @@ def CONTENT_GENERATION_PROMPT(topic, problem, solution, chat_history, reference_
             "Solution": "3-5 sentences describing how the new product/feature addresses these problems. For more complex products/features, you may need more than one paragraph. This section tests your assumptions about how you are solving the pain-points.",
             "Competitors": [{{"name": "Company name or Product name", "url":"URL of the product website"}}] [LIST OF GENUINE COMPANIES/PRODUCTS JSON (don't make up names or URLs or use blogs)],
         }}
-    """
-
-def QUESTION_GENERATION_PROMPT(topic, problem, solution, chat_history):
-    return f"""{role_info}
+""",
+    suffix="""
+        INPUTS:
+        1. The topic on which FAQ is to be generated: ```{topic}```
+        2. The problem we are trying to tackle: ```{problem}```
+        3. The solution to the problem or the features of the offering: ```{solution}```
+        4. The chat history: ```{chat_history}```
+        5. The extracted information from reference document (if available): {reference_doc_content}
+        6. The web-scraped information (if available) and how it is relevant to 1 Finance's new offering: {web_scrape_content}
+        7. Any relevant information extracted from the knowledge base: {kb_content}
+        8. The competitors and their URLs: {competitor_results}
+    """,
+)
 
-    You are tasked with generating clear, structured, and **non-redundant Internal and External FAQs** for a PRFAQ document using the inputs below.
-    ---
+def CONTENT_GENERATION_PROMPT(topic, problem, solution, chat_history, reference_doc_content, web_scrape_content, kb_content, competitor_results):
+    return CONTENT_GENERATION.render(
+        topic=topic, problem=problem, solution=solution, chat_history=chat_history,
+        reference_doc_content=reference_doc_content, web_scrape_content=web_scrape_content,
+        kb_content=kb_content, competitor_results=competitor_results,
+    )
 
-    ### Inputs
-    - **Topic**: {topic}
-    - **Problem**: {problem}
-    - **Solution**: {solution}
-    - **Chat History**: {chat_history}
+QUESTION_GENERATION = PromptTemplate(
+    "question_generation",
+    prefix=f"""{role_info}
 
+    You are tasked with generating clear, structured, and **non-redundant Internal and External FAQs** for a PRFAQ document using the inputs at the end.
     ---
 
     ### Step-by-Step Generation Process (MUST FOLLOW STRICTLY)
@@ -151,16 +157,25 @@ def QUESTION_GENERATION_PROMPT(topic, problem, solution, chat_history):
         "How will it impact/make the target audience's life better?"
     ]
     }}
-    """
 
-def ANSWER_GENERATION_PROMPT(topic, problem, solution, chat_history, response, web_scrape_content, reference_doc_content):
-    return f"""{role_info}
-    You are generating the PR/FAQ document for the topic `{topic}`, problem statement {problem} and solution {solution}.
-    You are supposed to generate proper markdown formatted answers for each question based on available information, the answers from KB and web search are as follows: 
-    ```{response}```
-    If a question does not have an answer in the knowledge base or web, use the output from the web scrape extraction task and the extract info task to answer the question.
-    Web scrape content: ```{web_scrape_content}```
-    Reference document content: ```{reference_doc_content}```
+""",
+    suffix="""    ### Inputs
+    - **Topic**: {topic}
+    - **Problem**: {problem}
+    - **Solution**: {solution}
+    - **Chat History**: {chat_history}
+    """,
+)
+
+def QUESTION_GENERATION_PROMPT(topic, problem, solution, chat_history):
+    return QUESTION_GENERATION.render(topic=topic, problem=problem, solution=solution, chat_history=chat_history)
+
+ANSWER_GENERATION = PromptTemplate(
+    "answer_generation",
+    prefix=f"""{role_info}
+    You are generating the PR/FAQ document for the topic, problem statement and solution given in the inputs at the end.
+    You are supposed to generate proper markdown formatted answers for each question based on available information: the answers from KB and web search for each question are given in the inputs.
+    If a question does not have an answer in the knowledge base or web, use the output from the web scrape extraction task and the extract info task (web scrape content and reference document content in the inputs) to answer the question.
     The last resort should be using the generated content to frame an answer that is consistent with the other content of the PR/FAQ.
     Answer each question on the basis of this information and priority, framing it properly with proper formatting.
     
@@ -174,7 +189,7 @@ def ANSWER_GENERATION_PROMPT(topic, problem, solution, chat_history, response, w
       
     UNDER NO CIRCUMSTANCES SHOULD FABRICATED OR ASSUMED CONTENT BE INTRODUCED. ALWAYS PRIORITISE VERIFIABLE, CREDIBLE INFORMATION FROM GIVEN CONTEXT OF KNOWLEDGE BASE, WEB SEARCH, WEB SCRAPING TASK AND EXTRACT INFO TASK.
     ANSWERS SHOULD BE EXTREMELY DETAILED, ALL-INFORMING AND WELL-FORMATTED.
-    Add a user response field as a reply to what the user requested for in terms of modifications or generation: ```{chat_history[-1]}```.
+    Add a user response field as a reply to what the user requested for in terms of modifications or generation, given as the user request in the inputs.
     So UserResponse should be the reply that will be shown to the user as a response to their request for generating the PR/FAQ document along with the document.
 
     While generating the FAQs and answers, follow these stylistic and tone guidelines:
@@ -210,4 +225,50 @@ def ANSWER_GENERATION_PROMPT(topic, problem, solution, chat_history, response, w
       ],
       "UserResponse": "Here is the generated PR/FAQ document on topic and your provided inputs. Please review and let me know if any changes are needed."
     }}
-    """
\ No newline at end of file
+
+""",
+    suffix="""    INPUTS:
+    Topic: `{topic}`
+    Problem statement: {problem}
+    Solution: {solution}
+    Answers from KB and web search: ```{response}```
+    Web scrape content: ```{web_scrape_content}```
+    Reference document content: ```{reference_doc_content}```
+    User request: ```{user_request}```
+    """,
+)
+
+def ANSWER_GENERATION_PROMPT(topic, problem, solution, chat_history, response, web_scrape_content, reference_doc_content):
+    return ANSWER_GENERATION.render(
+        topic=topic, problem=problem, solution=solution, response=response,
+        web_scrape_content=web_scrape_content, reference_doc_content=reference_doc_content,
+        user_request=chat_history[-1],
+    )
+
+def COMPETITOR_QUERY_PROMPT(topic, problem, solution):
+    return f"""Provided you with the topic {topic}, problem statement {problem} and a solution {solution}.
+        Your task is to generate a single, concise, and keyword-rich search query that can be used by a web search tool to discover similar or competing products or services in the market.
+        The query must:
+        - Understand the topic, problem, and solution.
+        - Reflect the real functionality described in the solution.
+        - Use practical, discoverable keywords people would actually search.
+        - Form a focused, real-world query like one a user would type into Google to find competitors or alternatives.
+        - Be specific enough to surface tools or services addressing the same use case.
+        Return only the search query string. Do not include explanations, extra formatting, or labels.
+                     
+        ### Just an example, the input can vary:
+
+        **Input:**
+        Topic: Doculocker  
+        Problem Statement: To implement a document moderation system to ensure uploaded documents are free from adult, illegal, or inappropriate content. The system will analyze both images and embedded text to maintain compliance and uphold a safe, trustworthy platform for financial document handling.  
+        Solution: Develop a solution that automatically verifies whether an uploaded document — Word (doc/docx) and Excel (csv/xlsx) — is free from unsafe content, including but not limited to adult, illegal, violent, hateful, discriminatory, or offensive material. The system will analyze both images and embedded text to accurately classify documents as safe or flag them for further review, ensuring compliance and maintaining a standard of trust and safety on the platform.
+
+        **EXPECTED QUERY OUTPUT:**
+        Products/Services for detecting adult or violent content from images in Word and Excel documents using text and image moderation
+
+        **Why this query works:**
+        It leads to relevant services like:
+        - **Amazon Rekognition**
+        - **Google Cloud Vision API**
+        - **Microsoft Azure Content Moderator**
+    """
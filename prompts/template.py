@@ -0,0 +1,24 @@
+import hashlib
+
+
+class PromptTemplate:
+    """
+    A prompt split into a static prefix and a dynamic suffix.
+
+    The prefix (instructions, guidelines, output format) is identical for every call, so the
+    provider can serve it from its prompt cache; everything that varies per request goes in
+    the suffix, which is filled with `str.format`. OpenAI caches prefixes of 1024+ tokens.
+    """
+
+    def __init__(self, name: str, prefix: str, suffix: str):
+        self.name = name
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def render(self, **values) -> str:
+        return self.prefix + self.suffix.format(**values)
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the static prefix, e.g. to tell prompt versions apart in traces."""
+        return hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:12]
@@ -2,9 +2,25 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi import APIRouter
+from contextlib import asynccontextmanager
 import secrets, os
+import logging
+import threading
 
-app = FastAPI(title="PRFAQ Generator API")
+# Bulky payload dumps (KB/web results, prompts) are logged at DEBUG
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy dependencies load in the background so the server is ready as soon as it binds
+    if os.getenv("PRFAQ_WARMUP", "true").lower() == "true":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    start_runner()
+    yield
+    # Runs after uvicorn has drained open connections: let running jobs finish, requeue the rest for other workers
+    stop_runner(timeout=float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 600)))
+
+app = FastAPI(title="PRFAQ Generator API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,14 +34,36 @@ app.add_middleware(
 api_router = APIRouter(prefix="/api/v1")
 
 # Register use case routers with sub-prefixes
-from api.prfaq_api import router as prfaq_router
+from api.prfaq_api import router as prfaq_router, warm_up
+from api.jobs import start_runner, stop_runner
 
 api_router.include_router(prfaq_router, prefix="/prfaq")
 
 # Register main API router with app
 app.include_router(api_router)
 
+@app.get("/metrics")
+def governor_metrics():
+    """
+    This worker's outbound call metrics: governor limits, queue depths and throttling counters,
+    and the share of prompt tokens served from the provider's prompt cache per call site.
+    """
+    from utils.governor import metrics
+    from utils.tracing import tracing_callback
+
+    return {"pid": os.getpid(), "governors": metrics(), "prompt_cache": tracing_callback.prompt_cache_report()}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8082))
-    uvicorn.run("mainapp:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    # Auto-reload is for local development and runs a single process
+    reload = os.getenv("UVICORN_RELOAD", "false").lower() == "true"
+    uvicorn.run(
+        "mainapp:app",
+        host="0.0.0.0",
+        port=port,
+        reload=reload,
+        workers=None if reload else int(os.getenv("WEB_CONCURRENCY", 1)),
+        # On SIGTERM stop accepting connections and let in-flight generations and SSE streams finish
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 600)),
+    )
\ No newline at end of file
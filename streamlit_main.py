@@ -10,7 +10,9 @@ import docx
 import json
 import time
 import openai
-from utils.utils import extract_text_from_pdf, render_text_or_table_to_str, convert_to_json
+from utils.utils import extract_text_from_pdf, invoke_json
+from utils.render import to_markdown, render_answer, markdown_to_docx, markdown_to_pdf
+from utils.schemas import PRFAQDocument
 from langchain_openai import ChatOpenAI  
 from tools.qdrant_tool import kb_qdrant_tool
 from tools.web_search.web_search import WebTrustedSearchTool
@@ -25,39 +27,11 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 
 def display_output(output):
     """Function to display PR FAQ sections."""
-    pr_faq_str = ""
-    pr_faq_str += f"*{output.get('UserResponse', '')}*\n\n"
-    pr_faq_str += f"**Title:** {output.get('Title', '')}\n\n"
-    pr_faq_str += f"**Subtitle:** {output.get('Subtitle', '')}\n\n"
-    pr_faq_str += f"**Introduction Paragraph:** {output.get('IntroParagraph', '')}\n\n"
-    pr_faq_str += f"**Problem Statement:** {output.get('ProblemStatement', '')}\n\n"
-    pr_faq_str += f"**Solution:** {output.get('Solution', '')}\n\n"
-    pr_faq_str += "**Leader's Quote:** \n\n"
-    pr_faq_str += "**Customer's Quote:** \n\n"
-
-    pr_faq_str += f"\n**Competitors:**\n"
-    for competitor in output.get("Competitors", []):
-        name = competitor.get("name", "")
-        url = competitor.get("url", "")
-        pr_faq_str += f"\n- [{name}]({url})\n"
-
-    pr_faq_str += f"\n**Internal FAQs:**\n"
-    for faq in output.get("InternalFAQs", []):
-        question = faq.get('Question', faq.get('question', 'Unknown Question'))
-        answer = faq.get('Answer', faq.get('answer', 'No answer provided'))
-
-        pr_faq_str += f"\n**Q: {question}**\n"
-        pr_faq_str += f"\nA:\n{render_text_or_table_to_str(answer)}\n"
-
-    pr_faq_str += f"\n**External FAQs:**\n"
-    for faq in output.get("ExternalFAQs", []):
-        question = faq.get('Question', faq.get('question', 'Unknown Question'))
-        answer = faq.get('Answer', faq.get('answer', 'No answer provided'))
-
-        pr_faq_str += f"\n**Q: {question}**\n"
-        pr_faq_str += f"\nA:\n{render_text_or_table_to_str(answer)}\n"
-
-    return pr_faq_str
+    return to_markdown(output, include_user_response=True)
+
+@st.cache_data(show_spinner=False)
+def export_prfaq(markdown, file_format):
+    return markdown_to_pdf(markdown) if file_format == "pdf" else markdown_to_docx(markdown)
 
 def chat_with_llm(existing_faq, user_feedback, topic, problem, solution, chat_history):
     """
@@ -281,9 +255,7 @@ def modify_faq(existing_faq, user_feedback, topic, problem, solution, chat_histo
         Here is the existing PR FAQ:
         ```{existing_faq}```
     """
-    response = llm.invoke(prompt)
-
-    updated_faq = convert_to_json(response.content)
+    updated_faq = invoke_json(llm, prompt, PRFAQDocument)
     return updated_faq
     
 MAX_FILES = 5
@@ -397,12 +369,10 @@ def main():
 
                     cleaned_json = start_langgraph(inputs, streaming_callback=None)
                     # print(f"Generated PR FAQ: {cleaned_json}")
-                    try:
-                        st.session_state.pr_faq = cleaned_json  # Store in session
-                        st.success("PR FAQ generated successfully!")
-                        st.session_state.chat_history.append({"role": "assistant", "content": display_output(cleaned_json)})
-                    except json.JSONDecodeError as e:
-                        st.session_state.pr_faq = modify_faq(cleaned_json, "Solve this in my JSON, I got this error: " + str(e), topic, problem, solution)
+                    # Node outputs are already repaired and validated, so no re-generation pass is needed here
+                    st.session_state.pr_faq = cleaned_json  # Store in session
+                    st.success("PR FAQ generated successfully!")
+                    st.session_state.chat_history.append({"role": "assistant", "content": display_output(cleaned_json)})
                         
                 end_time = time.perf_counter()
                 execution_time = end_time - start_time
@@ -410,6 +380,11 @@ def main():
                 # print(f"Token Usage: {crew_output.token_usage}")
     
     if st.session_state.pr_faq:
+        pr_faq_markdown = st.session_state.pr_faq if isinstance(st.session_state.pr_faq, str) else to_markdown(st.session_state.pr_faq)
+        docx_column, pdf_column = st.columns(2)
+        docx_column.download_button("Download DOCX", export_prfaq(pr_faq_markdown, "docx"), file_name="prfaq.docx")
+        pdf_column.download_button("Download PDF", export_prfaq(pr_faq_markdown, "pdf"), file_name="prfaq.pdf", mime="application/pdf")
+
         for message in st.session_state.chat_history:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
@@ -437,7 +412,7 @@ def main():
                     
                     # Display assistant response in chat message container
                     with st.chat_message("assistant"):
-                        st.markdown(render_text_or_table_to_str(new_output))
+                        st.markdown(render_answer(new_output))
                     # Add assistant response to chat history
                     st.session_state.chat_history.append({"role": "assistant", "content": new_output})
  
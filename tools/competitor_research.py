@@ -0,0 +1,120 @@
+import logging
+import os
+from urllib.parse import urlparse
+
+from prompts.prfaq import COMPETITOR_QUERY_PROMPT
+from utils.cache import SQLiteCache, hash_key
+
+logger = logging.getLogger(__name__)
+
+# Bump when COMPETITOR_QUERY_PROMPT or the compaction rules change
+COMPETITOR_CACHE_VERSION = 1
+
+_caches = {}
+
+
+def _cache(namespace, ttl):
+    """Lazily created persistent caches; a TTL of 0 disables caching."""
+    if not ttl:
+        return None
+    if namespace not in _caches:
+        _caches[namespace] = SQLiteCache(namespace=namespace, ttl=ttl, max_entries=2000)
+    return _caches[namespace]
+
+
+def _result_items(results):
+    """The hits of a WebTrustedSearchTool.call_web_search_api response, {"results": [{title, url, description}]}."""
+    if isinstance(results, dict):
+        results = results.get("results")
+    return results if isinstance(results, list) else []
+
+
+def _shape(results) -> str:
+    """Short description of an unexpected response for the log."""
+    if isinstance(results, dict):
+        return f"dict with keys {sorted(results)[:10]}"
+    return type(results).__name__
+
+
+def compact_results(results, max_competitors=8, snippet_chars=240):
+    """
+    Reduce raw web search results to at most `max_competitors` entries of name/url/snippet,
+    keeping only the first hit per domain.
+    """
+    competitors = []
+    seen_domains = set()
+    for item in _result_items(results):
+        if not isinstance(item, dict):
+            continue
+        url = item.get("url") or item.get("link") or ""
+        domain = urlparse(url).netloc.lower().removeprefix("www.")
+        if not domain or domain in seen_domains:
+            continue
+        seen_domains.add(domain)
+        snippet = item.get("description") or item.get("snippet") or item.get("content") or ""
+        competitors.append({
+            "name": (item.get("title") or item.get("name") or domain).strip(),
+            "url": url,
+            "snippet": " ".join(str(snippet).split())[:snippet_chars],
+        })
+        if len(competitors) >= max_competitors:
+            break
+    return competitors
+
+
+def format_competitors(competitors) -> str:
+    """Render compacted competitors as short prompt lines."""
+    if not competitors:
+        return "No competitor results found."
+    return "\n".join(f"- {c['name']} ({c['url']}): {c['snippet']}" for c in competitors)
+
+
+class CompetitorResearch:
+    """
+    Finds competing products for a topic: an LLM writes one search query, a bounded
+    web search runs it, and the hits are deduplicated by domain and compacted. Both
+    the query and the compacted competitors are cached (the latter per space with a TTL).
+    """
+
+    def __init__(self, web_tool, llm, top_k=None, max_competitors=None):
+        self.web_tool = web_tool
+        self.llm = llm
+        self.top_k = top_k or int(os.getenv("COMPETITOR_SEARCH_TOP_K", 10))
+        self.max_competitors = max_competitors or int(os.getenv("COMPETITOR_MAX_RESULTS", 8))
+        self.query_cache = _cache("competitor_queries", float(os.getenv("COMPETITOR_QUERY_CACHE_TTL", 30 * 24 * 3600)))
+        self.results_cache = _cache("competitor_results", float(os.getenv("COMPETITOR_CACHE_TTL", 24 * 3600)))
+
+    def generate_query(self, topic, problem, solution) -> str:
+        key = hash_key(COMPETITOR_CACHE_VERSION, topic, problem, solution)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return cached
+        query = self.llm.invoke(COMPETITOR_QUERY_PROMPT(topic, problem, solution)).content.strip()
+        if self.query_cache is not None and query:
+            self.query_cache.set(key, query)
+        return query
+
+    def run(self, topic, problem, solution, space_id=None) -> list:
+        """Return compacted competitors as a list of {name, url, snippet}."""
+        key = hash_key(COMPETITOR_CACHE_VERSION, space_id, topic, problem, solution, self.top_k, self.max_competitors)
+        if self.results_cache is not None:
+            cached = self.results_cache.get(key)
+            if cached is not None:
+                logger.info(f"Reusing cached competitor results for space {space_id}")
+                return cached
+
+        query = self.generate_query(topic, problem, solution)
+        logger.info(f"Competitor search query: {query}")
+        try:
+            results = self.web_tool.run(query=query, trust=False, read_content=False, top_k=self.top_k, onef_search=False)
+        except Exception as e:
+            logger.warning(f"Competitor search failed: {e}")
+            return []
+
+        competitors = compact_results(results, max_competitors=self.max_competitors)
+        if not competitors:
+            logger.warning(f"Competitor search for {query!r} gave no results with a URL (response: {_shape(results)})")
+        if self.results_cache is not None and competitors:
+            self.results_cache.set(key, competitors)
+        return competitors
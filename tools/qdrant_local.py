@@ -0,0 +1,121 @@
+import json
+import os
+
+from openai import OpenAI
+from qdrant_client import QdrantClient, models
+
+from utils.bm25 import SPARSE_VECTOR_NAME, query_vector
+from utils.cache import TTLCache
+from utils.governor import get_governor
+from utils.tracing import span
+from utils import vector_storage
+
+COLLECTION_NAME = "1F_KB_BASE_PF"
+# Candidates each retriever contributes to reciprocal-rank fusion, per result returned
+HYBRID_PREFETCH_FACTOR = int(os.getenv("KB_HYBRID_PREFETCH_FACTOR", 4))
+
+
+class LocalQdrantBackend:
+    """
+    Searches the KB collection directly with QdrantClient instead of going through
+    the remote tool API. Questions are embedded locally (with an embedding cache)
+    using the same model the ingestion script writes with.
+    """
+
+    def __init__(self, url=None, collection_name=None, prefer_grpc=None, embedding_model=None):
+        self.collection_name = collection_name or os.getenv("QDRANT_COLLECTION_NAME") or COLLECTION_NAME
+        self.embedding_model = embedding_model or vector_storage.embedding_model()
+        if prefer_grpc is None:
+            prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+        self.client = QdrantClient(
+            url=url or os.getenv("QDRANT_URL", "http://localhost:6333"),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            prefer_grpc=prefer_grpc,
+            grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+        )
+        # Retries are left to the governor
+        self.openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.embedding_cache = TTLCache(max_entries=int(os.getenv("KB_EMBEDDING_CACHE_SIZE", 2048)))
+        # "dense" searches the ada-002 vectors only; "hybrid" fuses them with BM25 sparse vectors
+        # (written by utils/qdrant_multiple_files.py) by reciprocal rank
+        self.search_mode = os.getenv("KB_SEARCH_MODE", "dense").lower()
+        self.search_params = vector_storage.search_params()
+
+    def embed(self, texts: list) -> list:
+        """Embed texts, sending only cache misses to the embeddings API in a single call."""
+        vectors = [self.embedding_cache.get((self.embedding_model, t)) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            response = get_governor(f"llm:{self.embedding_model}").call(
+                self.openai.embeddings.create,
+                input=[texts[i] for i in missing],
+                **vector_storage.embedding_kwargs(self.embedding_model),
+                tokens=sum(len(texts[i]) for i in missing) // 4,
+            )
+            for i, item in zip(missing, response.data):
+                vectors[i] = item.embedding
+                self.embedding_cache.set((self.embedding_model, texts[i]), item.embedding)
+        return vectors
+
+    @staticmethod
+    def build_filter(file_names=None, domains=None):
+        conditions = []
+        if file_names:
+            conditions.append(models.FieldCondition(key="file_name", match=models.MatchAny(any=list(file_names))))
+        if domains:
+            conditions.append(models.FieldCondition(key="domain", match=models.MatchAny(any=list(domains))))
+        return models.Filter(must=conditions) if conditions else None
+
+    def query_args(self, question: str, vector: list, top_k: int, query_filter) -> dict:
+        """Arguments of a dense or hybrid (dense + BM25, fused by reciprocal rank) query."""
+        if self.search_mode != "hybrid":
+            return {"query": vector, "limit": top_k, "filter": query_filter, "params": self.search_params}
+        candidates = top_k * HYBRID_PREFETCH_FACTOR
+        return {
+            "prefetch": [
+                models.Prefetch(query=vector, limit=candidates, filter=query_filter, params=self.search_params),
+                models.Prefetch(query=query_vector(question), using=SPARSE_VECTOR_NAME, limit=candidates, filter=query_filter),
+            ],
+            "query": models.FusionQuery(fusion=models.Fusion.RRF),
+            "limit": top_k,
+        }
+
+    @staticmethod
+    def format_points(points) -> str:
+        return json.dumps({
+            "results": [
+                {
+                    "text": point.payload.get("text", ""),
+                    "file_name": point.payload.get("file_name"),
+                    "chunk_index": point.payload.get("chunk_index"),
+                    "section": point.payload.get("section"),
+                    "score": point.score,
+                }
+                for point in points
+            ]
+        })
+
+    def search(self, question: str, top_k: int = 5, file_names=None, domains=None) -> str:
+        with span("tool.qdrant_local", collection=self.collection_name, top_k=top_k, mode=self.search_mode) as s:
+            s.set_attribute("cache_hit", self.embedding_cache.get_stale((self.embedding_model, question)) is not None)
+            vector = self.embed([question])[0]
+            args = self.query_args(question, vector, top_k, self.build_filter(file_names, domains))
+            args["query_filter"] = args.pop("filter", None)
+            args["search_params"] = args.pop("params", None)
+            response = self.client.query_points(collection_name=self.collection_name, with_payload=True, **args)
+            s.set_attribute("results", len(response.points))
+            return self.format_points(response.points)
+
+    def search_batch(self, questions: list, top_k: int = 5, file_names=None, domains=None) -> list:
+        """Embed all questions in one call and run them as a single Qdrant batch query."""
+        with span("tool.qdrant_local_batch", collection=self.collection_name, queries=len(questions), top_k=top_k, mode=self.search_mode):
+            vectors = self.embed(questions)
+            query_filter = self.build_filter(file_names, domains)
+            responses = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    models.QueryRequest(with_payload=True, **self.query_args(question, vector, top_k, query_filter))
+                    for question, vector in zip(questions, vectors)
+                ],
+            )
+            return [self.format_points(response.points) for response in responses]
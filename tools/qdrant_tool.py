@@ -1,24 +1,125 @@
+import logging
 import os
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tools.web_search.web_search import WebTrustedSearchTool
+from utils.cache import SQLiteCache, env_ttl, hash_key
+from utils.deadline import call_timeout, hedged, result_by_deadline
+from utils.governor import governed_post
+from utils.tracing import span, propagate
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "1F_KB_BASE_PF"
 
 class QdrantTool:
-    def __init__(self, api_url=None):
+    def __init__(self, api_url=None, backend=None):
         self.api_url = api_url or os.getenv("QDRANT_TOOL_API_URL") or "https://dev-aion.onefin.app/api/v1/tools/qdrant"
+        self.max_workers = int(os.getenv("THREAD_POOL_WORKERS", 12))
+        # "http" calls the remote tool API, "local" searches Qdrant directly (see tools/qdrant_local.py)
+        self.backend = backend or os.getenv("QDRANT_TOOL_BACKEND", "http")
+        # Only populated payloads can be filtered on domain, so the domain-selection call is opt-in for local search
+        self.filter_by_domain = os.getenv("KB_FILTER_BY_DOMAIN", "false").lower() == "true"
+        self._local = None
+        self._local_lock = threading.Lock()
+        # Results are cached in SQLite so every worker process shares them; a TTL of 0 disables caching
+        self.cache_ttl = env_ttl("KB_CACHE_TTL", 6 * 3600)
+        self.cache = SQLiteCache(namespace="kb_results", ttl=self.cache_ttl, max_entries=int(os.getenv("KB_CACHE_MAX_ENTRIES", 20000))) if self.cache_ttl else None
+
+    @property
+    def local(self):
+        with self._local_lock:
+            if self._local is None:
+                from tools.qdrant_local import LocalQdrantBackend
+                self._local = LocalQdrantBackend()
+            return self._local
+
+    def _local_domains(self, question: str):
+        if not self.filter_by_domain:
+            return None
+        return WebTrustedSearchTool().choose_onef_domains(question)
+
+    def _build_payload(self, question: str, top_k: int) -> dict:
+        web_tool = WebTrustedSearchTool()
+        return {"question": question, "selectedDomains": web_tool.choose_onef_domains(question), "topK": top_k, "collectionName": COLLECTION_NAME}
+
+    def fingerprint(self) -> tuple:
+        """
+        Settings that change what a search returns: the backend and collection, the local search
+        mode and KB_VERSION, which ingestion runs can bump so results cached downstream are not reused.
+        """
+        if self.backend == "local":
+            collection = os.getenv("QDRANT_COLLECTION_NAME") or COLLECTION_NAME
+            return (self.backend, collection, os.getenv("KB_SEARCH_MODE", "dense").lower(), os.getenv("KB_VERSION", ""))
+        return (self.backend, self.api_url, COLLECTION_NAME, os.getenv("KB_VERSION", ""))
 
-    def run(self, question: str, top_k: int = 5) -> dict:
-        
+    def _cache_key(self, question: str, top_k: int, file_names: list = None) -> str:
+        return hash_key(*self.fingerprint(), question, top_k, sorted(file_names or []))
+
+    def run(self, question: str, top_k: int = 5, file_names: list = None) -> dict:
+        key = self._cache_key(question, top_k, file_names)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with span("tool.qdrant", url=self.api_url, top_k=top_k, cache_hit=True):
+                    return cached
+        result = self._search(question, top_k, file_names)
+        # Only successful (string) results are cached, errors come back as dicts
+        if self.cache is not None and isinstance(result, str):
+            self.cache.set(key, result)
+        return result
+
+    def _search(self, question: str, top_k: int = 5, file_names: list = None) -> dict:
         try:
-            web_tool = WebTrustedSearchTool()
-            payload = {"question": question, "selectedDomains": web_tool.choose_onef_domains(question),"topK": top_k, "collectionName": "1F_KB_BASE_PF"}
+            if self.backend == "local":
+                return self.local.search(question, top_k=top_k, file_names=file_names, domains=self._local_domains(question))
+            payload = self._build_payload(question, top_k)
             # print(payload)
-            response = requests.post(self.api_url, json=payload, timeout=30)
-            response.raise_for_status()
-            return response.text
+            with span("tool.qdrant", url=self.api_url, top_k=top_k, cache_hit=False) as s:
+                response = hedged("tool:kb_search", governed_post, "tool:kb_search", self.api_url, json=payload, timeout=call_timeout())
+                s.set_attributes(status=response.status_code, bytes=len(response.content))
+                response.raise_for_status()
+                return response.text
         except Exception as e:
-            print(f"Error calling QdrantTool API: {e}")
+            logger.warning(f"Error calling QdrantTool API: {e}")
             return {"error": str(e)}
 
+    def run_batch(self, questions: list, top_k: int = 5, default=None) -> list:
+        """
+        Run several KB queries, returning one result per question in input order.
+        The local backend maps this onto a single Qdrant batch query, answering cached
+        questions from the shared cache. The remote tool API only takes one question per
+        request, so over HTTP the queries run concurrently and each result is cached as it
+        arrives; under a deadline (utils.deadline), questions still unanswered when it
+        passes come back as `default` instead of holding up the others.
+        """
+        if not questions:
+            return []
+        if self.backend == "local" and not self.filter_by_domain:
+            try:
+                return self._run_local_batch(questions, top_k)
+            except Exception as e:
+                logger.warning(f"Error running local Qdrant batch search, falling back to single queries: {e}")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(propagate(self.run), q, top_k) for q in questions]
+            return [result_by_deadline(future, default) for future in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_local_batch(self, questions: list, top_k: int) -> list:
+        keys = [self._cache_key(q, top_k) for q in questions]
+        results = [self.cache.get(key) for key in keys] if self.cache is not None else [None] * len(questions)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = self.local.search_batch([questions[i] for i in missing], top_k=top_k)
+            for i, result in zip(missing, fetched):
+                results[i] = result
+                if self.cache is not None and isinstance(result, str):
+                    self.cache.set(keys[i], result)
+        return results
+
 # Usage:
 kb_qdrant_tool = QdrantTool()
 
@@ -1,7 +1,21 @@
 import os
 from typing import Any
 
-import requests
+from utils.cache import SQLiteCache, hash_key
+from utils.deadline import call_timeout
+from utils.governor import governed_post
+from utils.tracing import span
+
+_cache = None
+
+
+def scrape_cache():
+    """Scrape results shared by all worker processes (SQLite); None when SCRAPE_CACHE_TTL is 0."""
+    global _cache
+    ttl = float(os.getenv("SCRAPE_CACHE_TTL", 24 * 3600))
+    if ttl and _cache is None:
+        _cache = SQLiteCache(namespace="scrape_results", ttl=ttl, max_entries=int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", 5000)))
+    return _cache if ttl else None
 
 class ScrapeWebsiteTool:
 
@@ -9,16 +23,31 @@ class ScrapeWebsiteTool:
         self.api_url = api_url or os.getenv("WEB_SCRAPE_TOOL_API_URL") or "https://dev-aion.onefin.app/api/v1/tools/web-scrape"
 
     def run(self, website_url: str) -> Any:
+        cache = scrape_cache()
+        key = hash_key(self.api_url, website_url)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                with span("tool.scrape", url=self.api_url, website_url=website_url, cache_hit=True):
+                    return cached
+        result = self._scrape(website_url)
+        if cache is not None and not result.startswith("Error calling website scrape API"):
+            cache.set(key, result)
+        return result
 
+    def _scrape(self, website_url: str) -> Any:
         try:
-            response = requests.post(
-                self.api_url,
-                json={"website_url": website_url},
-                timeout=30,
-            )
-            response.raise_for_status()
-            data = response.text
-            return data
+            with span("tool.scrape", url=self.api_url, website_url=website_url, cache_hit=False) as s:
+                response = governed_post(
+                    "tool:scrape",
+                    self.api_url,
+                    json={"website_url": website_url},
+                    timeout=call_timeout(),
+                )
+                s.set_attributes(status=response.status_code, bytes=len(response.content))
+                response.raise_for_status()
+                data = response.text
+                return data
         except Exception as e:
             return f"Error calling website scrape API: {e}"
 
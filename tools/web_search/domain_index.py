@@ -0,0 +1,153 @@
+"""
+Local query-to-domain index, used instead of an LLM call to pick the domains a web or KB
+search is restricted to.
+
+Each domain is described by its entry in whitelisted_sites.py (the same text the
+domain-selection prompt shows) plus the paths of its whitelisted URLs. Descriptions are
+turned into hashed word, word-pair and character 4-gram features, IDF-weighted and
+L2-normalised into one row per domain; a query is scored against every domain with a
+single matrix-vector product. The matrix is saved under PRFAQ_CACHE_DIR and rebuilt only
+when the descriptions change.
+"""
+import functools
+import logging
+import os
+import re
+import zlib
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import numpy as np
+
+from tools.web_search.whitelisted_sites import (
+    onefinance_site_descriptions, onefinance_whitelisted_sites, whitelisted_domain_descriptions,
+    whitelisted_domain_list, whitelisted_site_list,
+)
+from utils.cache import cache_path, hash_key
+
+logger = logging.getLogger(__name__)
+
+FEATURES = 2 ** 14
+# Below this cosine score the best domain is not a reliable match (on the eval queries, top picks
+# under ~0.1 are mostly wrong) and callers fall back to the LLM
+DOMAIN_INDEX_MIN_SCORE = float(os.getenv("DOMAIN_INDEX_MIN_SCORE", 0.15))
+INDEX_VERSION = 1
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from", "as",
+    "is", "are", "was", "were", "be", "do", "does", "what", "which", "who", "how", "when", "where",
+    "it", "its", "this", "that", "we", "our", "you", "your", "their", "all", "about", "into",
+    "www", "com", "org", "gov", "co", "nic", "html", "aspx", "asp", "php", "jsp", "https",
+}
+
+
+def features(text: str) -> List[str]:
+    """Words, adjacent word pairs and character 4-grams (which also match inside joined domain names)."""
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in _STOPWORDS]
+    grams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    chars = [f"#{w[i:i + 4]}" for w in words if len(w) > 4 for i in range(len(w) - 3)]
+    return words + grams + chars
+
+
+def _hashed(text: str):
+    """Feature columns of `text` and their sublinear term frequencies."""
+    columns = [zlib.crc32(feature.encode("utf-8")) % FEATURES for feature in features(text)]
+    columns, counts = np.unique(np.array(columns, dtype=np.int64), return_counts=True)
+    # log(1 + tf), so a description listing a word five times does not dominate
+    return columns, np.log1p(counts).astype(np.float32)
+
+
+def _counts(text: str) -> np.ndarray:
+    vector = np.zeros(FEATURES, dtype=np.float32)
+    columns, weights = _hashed(text)
+    vector[columns] = weights
+    return vector
+
+
+class DomainIndex:
+    """Scores queries against a fixed set of domains; `documents` maps each domain to its description."""
+
+    def __init__(self, name: str, documents: Dict[str, str]):
+        self.name = name
+        self.domains = list(documents)
+        self.fingerprint = hash_key(INDEX_VERSION, FEATURES, documents)[:16]
+        self.matrix, self.idf = self._load() or self._build(documents)
+
+    def _path(self):
+        return cache_path(f"domain_index_{self.name}.npz")
+
+    def _load(self):
+        try:
+            with np.load(self._path()) as saved:
+                if str(saved["fingerprint"]) == self.fingerprint:
+                    return saved["matrix"], saved["idf"]
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    def _build(self, documents):
+        counts = np.stack([_counts(text) for text in documents.values()])
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = (np.log((1 + len(counts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = counts * idf
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9)
+        try:
+            # Written to a temporary name first, so concurrent workers never load a partial file
+            temporary = f"{self._path()}.{os.getpid()}.tmp.npz"
+            np.savez(temporary, matrix=matrix, idf=idf, fingerprint=np.array(self.fingerprint))
+            os.replace(temporary, self._path())
+        except OSError as e:
+            logger.warning(f"Could not save the {self.name} domain index: {e}")
+        return matrix, idf
+
+    def scores(self, queries: List[str]) -> np.ndarray:
+        """Cosine similarity of each query (rows) to each domain (columns)."""
+        result = np.zeros((len(queries), len(self.domains)), dtype=np.float32)
+        for row, query in enumerate(queries):
+            # Queries are short, so only the matrix columns of their features are touched
+            columns, weights = _hashed(query)
+            weights = weights * self.idf[columns]
+            norm = np.linalg.norm(weights)
+            if norm:
+                result[row] = self.matrix[:, columns] @ (weights / norm)
+        return result
+
+    def top_k(self, query: str, k: int, min_score: float = DOMAIN_INDEX_MIN_SCORE) -> List[str]:
+        """Up to `k` best-matching domains, best first; empty if none scores `min_score`."""
+        scores = self.scores([query])[0]
+        best = np.argsort(-scores)[:k]
+        return [self.domains[i] for i in best if scores[i] >= min_score]
+
+
+def _domain_of(source: str):
+    match = re.search(r"\(([a-z0-9.-]+\.[a-z]+)\)", source)
+    return match.group(1) if match else None
+
+
+def _whitelisted_documents() -> Dict[str, str]:
+    documents = {domain: domain for domain in whitelisted_domain_list}
+    for domain in whitelisted_domain_list:
+        for source, items in whitelisted_domain_descriptions.items():
+            described = _domain_of(source)
+            # Descriptions of a parent domain (rbi.org.in) also describe its subdomains (data.rbi.org.in)
+            if described and (domain == described or domain.endswith("." + described)):
+                documents[domain] += "\n" + source + "\n" + "\n".join(items)
+    for url in whitelisted_site_list:
+        parsed = urlparse(url)
+        host = parsed.netloc.removeprefix("www.")
+        if host in documents:
+            documents[host] += "\n" + re.sub(r"[/_.?=&#-]+", " ", parsed.path)
+    return documents
+
+
+@functools.lru_cache(maxsize=None)
+def whitelisted_index() -> DomainIndex:
+    return DomainIndex("whitelisted", _whitelisted_documents())
+
+
+@functools.lru_cache(maxsize=None)
+def onefinance_index() -> DomainIndex:
+    return DomainIndex(
+        "onefinance",
+        {domain: f"{domain}\n{onefinance_site_descriptions.get(domain, '')}" for domain in onefinance_whitelisted_sites},
+    )
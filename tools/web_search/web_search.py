@@ -1,128 +1,67 @@
 from typing import List, Dict, Any
-import requests
 import os
-from langchain_openai import ChatOpenAI
-from tools.web_search.whitelisted_sites import whitelisted_domain_list, onefinance_whitelisted_sites
+import functools
+from prompts.template import PromptTemplate
+from tools.web_search.domain_index import onefinance_index, whitelisted_index
+from tools.web_search.whitelisted_sites import (
+    onefinance_site_descriptions, onefinance_whitelisted_sites, whitelisted_domain_descriptions, whitelisted_domain_list,
+)
+from utils.deadline import call_timeout, hedged
+from utils.governor import governed_post
+from utils.tracing import span
 from dotenv import load_dotenv
 
 load_dotenv() 
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY"))
+# "llm" always asks the LLM, "index" picks domains with the local index in domain_index.py and
+# asks the LLM only when nothing matches, "index-only" never asks the LLM. The LLM stays the default
+# until benchmarks/domain_index_eval.py --live shows the index agrees with it often enough
+DOMAIN_SELECTOR = os.getenv("DOMAIN_SELECTOR", "llm").lower()
+
+# The domain lists and descriptions are static, so they lead the prompt and the query comes last
+DOMAIN_SELECTION = PromptTemplate(
+    "domain_selection",
+    prefix=(
+        "You are helping a researcher identify the most relevant websites to search for the query given at the end.\n"
+        f"Here is a list of approved domains:\n{chr(10).join(whitelisted_domain_list)} and their information:\n\n"
+        "Below is a list of trusted, whitelisted sources and the types of data they provide:\n---\n"
+        + "\n\n".join(f"### {source}\n" + "\n".join(f"- {item}" for item in items) for source, items in whitelisted_domain_descriptions.items())
+        + "\nPick the top 3 most likely to contain helpful info for this context. "
+        "Return ONLY the domain names in a list like ['domain1.com', 'domain2.com', 'domain3.com'].\n"
+    ),
+    suffix="Query: {query}\n",
+)
+
+ONEF_DOMAIN_SELECTION = PromptTemplate(
+    "onef_domain_selection",
+    prefix=(
+        "You are helping a researcher identify the most relevant company websites to search for the query given at the end.\n"
+        f"Here is a list of approved domains:\n{chr(10).join(onefinance_whitelisted_sites)} and their information:\n\n"
+        "Below is a list of trusted, whitelisted sources and the types of data they provide:\n---\n"
+        + "".join(f"# {description} ({domain})\n" for domain, description in onefinance_site_descriptions.items())
+        + "Pick the top 2 most likely to contain helpful info for this context. "
+        "Return ONLY the domain names in a list like ['domain1.com', 'domain2.com'].\n"
+    ),
+    suffix="Query: {query}\n",
+)
+
+@functools.lru_cache(maxsize=None)
+def get_domain_llm():
+    """Domain-selection LLM, created on first use so importing this module stays cheap."""
+    from utils.utils import get_openai_llm
+
+    return get_openai_llm("domain_selection")
 
 class WebTrustedSearchTool:
     def __init__(self, api_url=None):
         self.api_url = api_url or os.getenv("WEB_TRUSTED_SEARCH_API_URL", "https://dev-aion.onefin.app/api/v1/tools/web-search")
 
     def _choose_relevant_domains(self, query: str) -> List[str]:
-        prompt = (
-            f"You are helping a researcher identify the most relevant websites to search.\n"
-            f"Query: {query}\n"
-            f"Here is a list of approved domains:\n{chr(10).join(whitelisted_domain_list)} and their information:\n\n"
-            """Below is a list of trusted, whitelisted sources and the types of data they provide:
-            ---
-            ### SEBI (sebi.gov.in)
-            - Mutual Funds (MF): Schemes, Funds Mobilized, Net Assets, AMFI Data
-            - Portfolio Management Services (PMS): AUM, Clients, Performance
-            - Foreign Portfolio Investments (FPI): Sector-wise, Trade-wise, Custody
-            - Alternative Investment Funds (AIF): Fundraising, Investments
-            - Corporate Bonds: Trades, Repo, Private Placements
-            - Green Bonds & Municipal Bonds: Issuance, Tenure, Coupon
-            - IPO Data: Schedule, Red Herring Prospectus, Processing Status
-            - REIT/InvIT Fundraising
-            - Capital Market Overview & Policy Developments
-            - SEBI Circulars & Notifications
-            - Licensing & Offer Approvals
-
-            ### NSE (nseindia.com)
-            - Macro Factors, Forex Reserves, FII/DII Activity
-            - Active Clients, Broker Data
-            - IPO & Exchange Performance
-            - Mutual Funds: AMC/Scheme-wise, Passive MFs, ETFs
-            - Market Cap, Trading Symbols
-            - Volume Data
-
-            ### BSE (bseindia.com)
-            - Trading Volumes
-            - IPO Performance Tracker
-            - Market Capitalization & Symbols
-
-            ### RBI (rbi.org.in)
-            - CPI, Inflation, GDP, Interest Rates, CRR
-            - Bank Credit Data
-            - Forex Markets, Public Finance, Debt Markets
-            - Economic Ratios
-            - RBI Press Releases & Financial Bulletins
-
-            ### Income Tax Dept. (incometaxindia.gov.in)
-            - Income Tax Rules & Laws
-            - Tax Statistics
-            - Circulars and Notifications
-
-            ### GST Portal (gst.gov.in)
-            - GST Collections and Data
-            - Press Releases
-
-            ### PFRDA (pfrda.org.in)
-            - Pension Fund Circulars
-
-            ### AMFI (amfiindia.com)
-            - Mutual Fund AUM (Quarterly, Category-wise, Scheme-wise)
-            - SIP Contributions (Monthly, Yearly)
-            - Commission Data: MFD-wise AUM, Inflows
-            - Stock Exchange Mkt Cap, Trading Symbols
-            - Passive Funds, Index Funds, ETFs
-
-            ### CMIE (cmie.com)
-            - Indian Economic Indicators
-
-            ### IRDAI (irdai.gov.in)
-            - Indian Insurance Data
-
-            ### NBFC Registry
-            - List of NBFCs permitted/not permitted to accept public deposits
-
-            ### CEIC (ceicdata.com)
-            - Global Macro-Economic Indicators by Country
-
-            ### WFE (world-exchanges.org)
-            - Global Exchange Data: IPOs, Volume, Listings
-
-            ### FII/DII Daily Tracker
-            - Daily FII/DII Trading Activity
-
-            ### IBEF (ibef.org)
-            - Sectoral Economic Reports for India
-
-            ### Economic Adviser (eaindustry.nic.in)
-            - WPI, Commodities, 8 Core Industries Data
-
-            ### FADA (fada.in)
-            - Auto Sales, Market Share
-
-            ### SIAM (siam.in)
-            - Auto Industry: Production, Sales, Exports
-
-            ### Ministry of Statistics & Programme Implementation (mospi.gov.in)
-            - Statistical Reports, Consumption Data
-            - Emerging Industries, Global Comparisons
-            - Press Releases
-
-            ### Department of Commerce (commerce.gov.in)
-            - Export-Import Trade Data
-
-            ### Department for Promotion of Industry and Internal Trade (dpiit.gov.in)
-            - Emerging Industry Data
-
-            ### APMI (apmiindia.org)
-            - PMS Performance & Comparisons
-
-            ### US CPI (bls.gov)
-            - Consumer Price Index (USA)
-            """
-            f"Pick the top 3 most likely to contain helpful info for this context. "
-            f"Return ONLY the domain names in a list like ['domain1.com', 'domain2.com', 'domain3.com']."
-        )
-        response = llm.invoke(prompt)
+        if DOMAIN_SELECTOR.startswith("index"):
+            selected = whitelisted_index().top_k(query, 3)
+            if selected or DOMAIN_SELECTOR == "index-only":
+                return selected
+        response = get_domain_llm().invoke(DOMAIN_SELECTION.render(query=query))
         selected = []
         for domain in whitelisted_domain_list:
             if domain.lower() in response.content.lower():
@@ -130,25 +69,11 @@ class WebTrustedSearchTool:
         return selected
 
     def choose_onef_domains(self, query: str) -> List[str]:
-        prompt = (
-            f"You are helping a researcher identify the most relevant company websites to search.\n"
-            f"Query: {query}\n"
-            f"Here is a list of approved domains:\n{chr(10).join(onefinance_whitelisted_sites)} and their information:\n\n"
-            """Below is a list of trusted, whitelisted sources and the types of data they provide:
-            ---
-            # Research & education platform for all macro indicators of India (indiamacroindicators.co.in)
-            # Research and education platform for all cryptos with crypto scoring & ranking (indiacryptoresearch.co.in)
-            # AI driven tax education and advisory (planmytax.ai)
-            # Education and P2P as an asset offering (1financep2p.com)
-            # Physical only magazine which features primary research, interviews we do related to financial industry (1financemagazine.com)
-            # Community event to rasie awareness and bring together all personal finance related professionals (gfpsummit.com)
-            # Community to bring together advisor's through stories who have shown high integrity and client first approach (fintegritystories.com)
-            # Community to bring together HR's who care about employee wellness - mental and financial (indiahrconclave.com)
-            """
-            f"Pick the top 2 most likely to contain helpful info for this context. "
-            f"Return ONLY the domain names in a list like ['domain1.com', 'domain2.com']."
-        )
-        response = llm.invoke(prompt)
+        if DOMAIN_SELECTOR.startswith("index"):
+            selected = onefinance_index().top_k(query, 2)
+            if selected or DOMAIN_SELECTOR == "index-only":
+                return selected
+        response = get_domain_llm().invoke(ONEF_DOMAIN_SELECTION.render(query=query))
         selected = []
         for domain in onefinance_whitelisted_sites:
             if domain.lower() in response.content.lower():
@@ -164,9 +89,11 @@ class WebTrustedSearchTool:
         }
         headers = {"Content-Type": "application/json"}
         # print(f"Calling web search API with payload: {payload}")
-        resp = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
+        with span("tool.web_search", url=self.api_url, top_k=top_k, cache_hit=False) as s:
+            resp = hedged("tool:web_search", governed_post, "tool:web_search", self.api_url, headers=headers, json=payload, timeout=call_timeout())
+            s.set_attributes(status=resp.status_code, bytes=len(resp.content))
+            resp.raise_for_status()
+            return resp.json()
 
     def run(
         self,
@@ -36,6 +36,120 @@ onefinance_whitelisted_sites = [
     "indiahrconclave.com"
 ]
 
+# Source descriptions shown to the domain-selection LLM and indexed by domain_index.py
+whitelisted_domain_descriptions = {
+    "SEBI (sebi.gov.in)": [
+        "Mutual Funds (MF): Schemes, Funds Mobilized, Net Assets, AMFI Data",
+        "Portfolio Management Services (PMS): AUM, Clients, Performance",
+        "Foreign Portfolio Investments (FPI): Sector-wise, Trade-wise, Custody",
+        "Alternative Investment Funds (AIF): Fundraising, Investments",
+        "Corporate Bonds: Trades, Repo, Private Placements",
+        "Green Bonds & Municipal Bonds: Issuance, Tenure, Coupon",
+        "IPO Data: Schedule, Red Herring Prospectus, Processing Status",
+        "REIT/InvIT Fundraising",
+        "Capital Market Overview & Policy Developments",
+        "SEBI Circulars & Notifications",
+        "Licensing & Offer Approvals",
+    ],
+    "NSE (nseindia.com)": [
+        "Macro Factors, Forex Reserves, FII/DII Activity",
+        "Active Clients, Broker Data",
+        "IPO & Exchange Performance",
+        "Mutual Funds: AMC/Scheme-wise, Passive MFs, ETFs",
+        "Market Cap, Trading Symbols",
+        "Volume Data",
+    ],
+    "BSE (bseindia.com)": [
+        "Trading Volumes",
+        "IPO Performance Tracker",
+        "Market Capitalization & Symbols",
+    ],
+    "RBI (rbi.org.in)": [
+        "CPI, Inflation, GDP, Interest Rates, CRR",
+        "Bank Credit Data",
+        "Forex Markets, Public Finance, Debt Markets",
+        "Economic Ratios",
+        "RBI Press Releases & Financial Bulletins",
+    ],
+    "Income Tax Dept. (incometaxindia.gov.in)": [
+        "Income Tax Rules & Laws",
+        "Tax Statistics",
+        "Circulars and Notifications",
+    ],
+    "GST Portal (gst.gov.in)": [
+        "GST Collections and Data",
+        "Press Releases",
+    ],
+    "PFRDA (pfrda.org.in)": [
+        "Pension Fund Circulars",
+    ],
+    "AMFI (amfiindia.com)": [
+        "Mutual Fund AUM (Quarterly, Category-wise, Scheme-wise)",
+        "SIP Contributions (Monthly, Yearly)",
+        "Commission Data: MFD-wise AUM, Inflows",
+        "Stock Exchange Mkt Cap, Trading Symbols",
+        "Passive Funds, Index Funds, ETFs",
+    ],
+    "CMIE (cmie.com)": [
+        "Indian Economic Indicators",
+    ],
+    "IRDAI (irdai.gov.in)": [
+        "Indian Insurance Data",
+    ],
+    "NBFC Registry (rbi.org.in)": [
+        "List of NBFCs permitted/not permitted to accept public deposits",
+    ],
+    "CEIC (ceicdata.com)": [
+        "Global Macro-Economic Indicators by Country",
+    ],
+    "WFE (world-exchanges.org)": [
+        "Global Exchange Data: IPOs, Volume, Listings",
+    ],
+    "FII/DII Daily Tracker (nseindia.com)": [
+        "Daily FII/DII Trading Activity",
+    ],
+    "IBEF (ibef.org)": [
+        "Sectoral Economic Reports for India",
+    ],
+    "Economic Adviser (eaindustry.nic.in)": [
+        "WPI, Commodities, 8 Core Industries Data",
+    ],
+    "FADA (fada.in)": [
+        "Auto Sales, Market Share",
+    ],
+    "SIAM (siam.in)": [
+        "Auto Industry: Production, Sales, Exports",
+    ],
+    "Ministry of Statistics & Programme Implementation (mospi.gov.in)": [
+        "Statistical Reports, Consumption Data",
+        "Emerging Industries, Global Comparisons",
+        "Press Releases",
+    ],
+    "Department of Commerce (commerce.gov.in)": [
+        "Export-Import Trade Data",
+    ],
+    "Department for Promotion of Industry and Internal Trade (dpiit.gov.in)": [
+        "Emerging Industry Data",
+    ],
+    "APMI (apmiindia.org)": [
+        "PMS Performance & Comparisons",
+    ],
+    "US CPI (bls.gov)": [
+        "Consumer Price Index (USA)",
+    ],
+}
+
+onefinance_site_descriptions = {
+    "indiamacroindicators.co.in": "Research & education platform for all macro indicators of India",
+    "indiacryptoresearch.co.in": "Research and education platform for all cryptos with crypto scoring & ranking",
+    "planmytax.ai": "AI driven tax education and advisory",
+    "1financep2p.com": "Education and P2P as an asset offering",
+    "1financemagazine.com": "Physical only magazine which features primary research, interviews we do related to financial industry",
+    "gfpsummit.com": "Community event to rasie awareness and bring together all personal finance related professionals",
+    "fintegritystories.com": "Community to bring together advisor's through stories who have shown high integrity and client first approach",
+    "indiahrconclave.com": "Community to bring together HR's who care about employee wellness - mental and financial",
+}
+
 whitelisted_site_list = [
     "https://www.sebi.gov.in/sebiweb/other/OtherAction.do?doPmr=yes",
     "https://www.sebi.gov.in/statistics/fpi-investment.html",
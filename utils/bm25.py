@@ -0,0 +1,65 @@
+"""
+BM25 sparse vectors for the KB collection's hybrid search.
+
+Chunks are stored with the term-frequency half of BM25 as a sparse vector (terms are
+hashed to 32-bit indices); Qdrant applies the IDF half itself (Modifier.IDF on the sparse
+vector), so it stays correct as documents are added. Queries send each term once with weight 1.
+
+Terms are lower-cased words and numbers, unstemmed, minus a plain English stopword list:
+exact matches on names, figures and circular numbers are what the sparse side is for.
+"""
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client import models
+
+SPARSE_VECTOR_NAME = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Typical chunk length in terms; stands in for the collection average, which changes as files are added
+AVERAGE_LENGTH = 150
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "but", "nor", "of", "to", "in", "on", "for", "with", "by", "at", "from",
+    "as", "into", "about", "over", "under", "between", "through", "during", "before", "after",
+    "is", "are", "was", "were", "be", "been", "being", "am", "do", "does", "did", "doing",
+    "have", "has", "had", "having", "will", "would", "can", "could", "should", "shall", "may", "might", "must",
+    "it", "its", "this", "that", "these", "those", "i", "me", "my", "we", "us", "our", "you", "your",
+    "he", "him", "his", "she", "her", "they", "them", "their", "what", "which", "who", "whom", "whose",
+    "when", "where", "why", "how", "there", "here", "if", "then", "than", "so", "not", "no",
+    "all", "any", "some", "such", "each", "other", "own", "same", "too", "very", "just", "also",
+})
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased words and numbers of a text, stopwords removed, in order."""
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def _term_index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _sparse(weights: dict) -> models.SparseVector:
+    # Hash collisions merge into one index, as Qdrant requires unique indices
+    merged = Counter()
+    for term, weight in weights.items():
+        merged[_term_index(term)] += weight
+    indices = sorted(merged)
+    return models.SparseVector(indices=indices, values=[float(merged[i]) for i in indices])
+
+
+def document_vector(text: str) -> models.SparseVector:
+    counts = Counter(tokenize(text))
+    length = sum(counts.values())
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / AVERAGE_LENGTH)
+    return _sparse({term: tf * (BM25_K1 + 1) / (tf + norm) for term, tf in counts.items()})
+
+
+def query_vector(text: str) -> models.SparseVector:
+    return _sparse({term: 1.0 for term in set(tokenize(text))})
+
+
+def sparse_vectors_config() -> dict:
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
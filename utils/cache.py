@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache with optional per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the cached value, or `default` if the key is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and entry[1] < time.monotonic()):
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key, default=None):
+        """Return the cached value even if it has expired, without touching the counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def cache_path(filename="prfaq_cache.sqlite3"):
+    """Location of the on-disk cache database (PRFAQ_CACHE_DIR, default ./.cache)."""
+    directory = os.getenv("PRFAQ_CACHE_DIR", ".cache")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def env_ttl(name, default):
+    """Cache TTL in seconds from the environment: 0 disables the cache, unset uses `default` (None never expires)."""
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def hash_key(*parts):
+    """Stable SHA-256 key for JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Persistent key-value cache backed by SQLite. Values are stored as JSON, entries can
+    expire after a TTL and the least recently used entries are evicted past `max_entries`.
+    A TTL of None keeps entries until they are evicted; a TTL of 0 disables the cache.
+    Each operation opens its own connection, so one file can be shared by threads and processes.
+    """
+
+    def __init__(self, path=None, namespace="default", max_entries=None, ttl=None):
+        self.path = path or cache_path()
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        if self.ttl == 0:
+            return default
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                self._count(False)
+                return default
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+            )
+        self._count(True)
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if self.ttl == 0 or ttl == 0:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, default=str), now + ttl if ttl is not None else None, now),
+            )
+            if self.max_entries:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries),
+                )
+
+    def delete(self, key):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,190 @@
+"""
+Structure-aware chunking of KB PDFs for ingestion.
+
+Uses the layout PyMuPDF reports (text blocks, font sizes, bold spans) instead of flattened
+text: lines set in a larger font than the body, or short bold lines, are headings, and
+"Q1." / "Question:" / bold lines ending in "?" start a question whose answer runs until
+the next question or heading. Paragraphs and Q/A pairs are never split unless one alone
+exceeds the chunk size; consecutive ones of the same section are packed into chunks of up
+to `max_chars`. Every chunk starts with its heading path and carries it as metadata.
+"""
+import os
+import re
+from collections import Counter
+from typing import List
+
+import fitz
+
+KB_CHUNK_CHARS = int(os.getenv("KB_CHUNK_CHARS", 1800))
+# A line this much larger than the body text is a heading
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_CHARS = 120
+# Outer headings are dropped from longer paths, which every chunk repeats
+MAX_SECTION_CHARS = 3 * MAX_HEADING_CHARS
+
+QUESTION_RE = re.compile(r"^(?:Q(?:uestion)?\s*\d*\s*[:.)\-]|\d+\s*[.)]\s+.*\?$)", re.IGNORECASE)
+ANSWER_RE = re.compile(r"^A(?:ns(?:wer)?)?\s*\d*\s*[:.)\-]\s*", re.IGNORECASE)
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _lines(doc):
+    """Every non-empty text line with its largest font size, boldness, page and block."""
+    for page in doc:
+        for block in page.get_text("dict")["blocks"]:
+            if block.get("type") != 0:
+                continue
+            for line in block["lines"]:
+                spans = [span for span in line["spans"] if span["text"].strip()]
+                if not spans:
+                    continue
+                yield {
+                    "text": re.sub(r"\s+", " ", "".join(span["text"] for span in spans)).strip(),
+                    "size": round(max(span["size"] for span in spans) * 2) / 2,
+                    "bold": all(span["flags"] & 16 or "bold" in span["font"].lower() for span in spans),
+                    "page": page.number + 1,
+                    "block": (page.number, block["number"]),
+                }
+
+
+def _body_size(lines) -> float:
+    sizes = Counter()
+    for line in lines:
+        sizes[line["size"]] += len(line["text"])
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def _is_question(line) -> bool:
+    text = line["text"]
+    return bool(QUESTION_RE.match(text)) or (line["bold"] and text.endswith("?") and len(text) <= 300)
+
+
+def _heading_level(line, body_size, heading_sizes):
+    """1 for the largest heading font, higher for smaller ones; None for lines that are not headings."""
+    text = line["text"]
+    if len(text) > MAX_HEADING_CHARS or _is_question(line):
+        return None
+    if line["size"] >= body_size * HEADING_SIZE_RATIO:
+        return heading_sizes.index(line["size"]) + 1
+    if line["bold"] and not text.endswith((".", ",", ";", ":")):
+        return len(heading_sizes) + 1
+    return None
+
+
+def _section(path) -> str:
+    """The heading path, outermost first, without the outer headings that would take it past MAX_SECTION_CHARS."""
+    titles = [title for _, title in path]
+    while len(titles) > 1 and len(" > ".join(titles)) > MAX_SECTION_CHARS:
+        titles.pop(0)
+    return " > ".join(titles)
+
+
+def _units(lines) -> List[dict]:
+    """Paragraphs and Q/A pairs, each with the heading path it falls under."""
+    body_size = _body_size(lines)
+    heading_sizes = sorted({l["size"] for l in lines if l["size"] >= body_size * HEADING_SIZE_RATIO}, reverse=True)
+    path, units, current, previous, overflow_block = [], [], None, None, None
+
+    for line in lines:
+        level = _heading_level(line, body_size, heading_sizes)
+        # A heading wrapped over several lines continues the previous one
+        continues = level is not None and previous is not None and previous.get("level") == level and previous["block"] == line["block"]
+        if continues and len(path[-1][1]) + len(line["text"]) + 1 > MAX_HEADING_CHARS:
+            # Too long for a heading (e.g. a bold paragraph), so the rest of the block is body text
+            overflow_block = line["block"]
+        if line["block"] == overflow_block:
+            level = None
+        if level is not None:
+            if continues:
+                path[-1] = (level, f"{path[-1][1]} {line['text']}")
+            else:
+                path = [entry for entry in path if entry[0] < level] + [(level, line["text"])]
+            current, previous = None, {**line, "level": level}
+            continue
+
+        section = _section(path)
+        if _is_question(line):
+            current = {"kind": "qa", "question": line["text"], "text": line["text"], "section": section, "page": line["page"], "block": line["block"]}
+            units.append(current)
+        elif current is not None and (current["kind"] == "qa" or current["block"] == line["block"]):
+            # Answers run until the next question or heading; paragraphs until the block ends
+            text = ANSWER_RE.sub("", line["text"]) if current["kind"] == "qa" else line["text"]
+            if current["block"] != line["block"]:
+                current["text"] += "\n" + text
+            elif current["text"].endswith("-") and text[:1].islower():
+                # A word hyphenated across a line break
+                current["text"] = current["text"][:-1] + text
+            else:
+                current["text"] += " " + text
+            current["block"] = line["block"]
+        else:
+            current = {"kind": "text", "text": line["text"], "section": section, "page": line["page"], "block": line["block"]}
+            units.append(current)
+        previous = line
+    return units
+
+
+def _split(text: str, max_chars: int) -> List[str]:
+    """Split an oversized unit at sentence ends (or hard, for a sentence longer than `max_chars`)."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            pieces += [current] if current else []
+            current, pieces = "", pieces + [sentence[:max_chars]]
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    return pieces + ([current] if current else [])
+
+
+def chunk_units(units: List[dict], max_chars: int = KB_CHUNK_CHARS) -> List[dict]:
+    """Pack consecutive units of the same section into chunks of at most `max_chars` characters."""
+    chunks = []
+    for unit in units:
+        # A section path longer than the chunk still leaves room for some text, so splitting always progresses
+        room = max(max_chars - len(unit["section"]) - 1, max_chars // 2, 1)
+        if len(unit["text"]) <= room:
+            pieces = [unit["text"]]
+        elif unit["kind"] == "qa":
+            # Each part of a long answer keeps its question, so it is still retrievable on its own
+            answer = unit["text"][len(unit["question"]):].strip()
+            pieces = [f"{unit['question']}\n{part}" for part in _split(answer, max(room - len(unit["question"]) - 1, room // 2, 1))]
+        else:
+            pieces = _split(unit["text"], room)
+        for piece in pieces:
+            last = chunks[-1] if chunks else None
+            if last and last["section"] == unit["section"] and len(last["body"]) + len(piece) + 2 <= room:
+                last["body"] += "\n\n" + piece
+            else:
+                last = {"section": unit["section"], "page": unit["page"], "body": piece, "questions": []}
+                chunks.append(last)
+            if unit["kind"] == "qa" and unit["question"] not in last["questions"]:
+                last["questions"].append(unit["question"])
+
+    return [
+        {
+            "text": f"{chunk['section']}\n{chunk['body']}" if chunk["section"] else chunk["body"],
+            "section": chunk["section"],
+            "page": chunk["page"],
+            "questions": chunk["questions"],
+        }
+        for chunk in chunks
+    ]
+
+
+def _drop_page_furniture(lines, pages: int):
+    """Remove page numbers and running headers/footers (short lines repeated on most pages)."""
+    pages_with = Counter()
+    for text, page in {(l["text"], l["page"]) for l in lines}:
+        pages_with[text] += 1
+    repeated = {text for text, count in pages_with.items() if pages >= 3 and count > pages / 2 and len(text) <= MAX_HEADING_CHARS // 2}
+    return [l for l in lines if l["text"] not in repeated and not re.fullmatch(r"(page\s*)?\d+(\s*(of|/)\s*\d+)?", l["text"], re.IGNORECASE)]
+
+
+def chunk_pdf(pdf_path: str, max_chars: int = KB_CHUNK_CHARS) -> List[dict]:
+    """Chunks of a PDF as dicts with text (starting with the heading path), section, page and questions."""
+    with fitz.open(pdf_path) as doc:
+        lines = _drop_page_furniture(list(_lines(doc)), doc.page_count)
+    return chunk_units(_units(lines), max_chars)
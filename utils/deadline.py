@@ -0,0 +1,163 @@
+"""
+Deadlines that propagate from a request down to each outbound call.
+
+`deadline_scope` sets the deadline for the enclosed work (nested scopes can only shorten it)
+and travels to pool threads with `utils.tracing.propagate`. Tool calls size their timeouts
+with `call_timeout`, and `hedged` sends a duplicate of a slow idempotent call once it has
+taken longer than that endpoint's recent p95, returning whichever answer arrives first.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Optional
+
+from utils.tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", 30))
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "true").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+# At most this share of calls may be duplicated, so a slow backend is not hit twice as hard
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", 0.1))
+HEDGE_MIN_SAMPLES = 20
+MIN_CALL_TIMEOUT = 1.0
+
+# Wall-clock (epoch) deadline, so it stays meaningful when a job is handed to another process
+_deadline = contextvars.ContextVar("prfaq_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current deadline has passed before a call could complete."""
+
+
+@contextmanager
+def deadline_scope(at: float = None, seconds: float = None):
+    """Run the enclosed block under a deadline given as an epoch time `at` or `seconds` from now."""
+    candidates = [d for d in (at, time.time() + seconds if seconds else None, _deadline.get()) if d]
+    token = _deadline.set(min(candidates) if candidates else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def call_timeout(default: float = TOOL_TIMEOUT) -> float:
+    """Timeout for one outbound call: `default`, cut to what is left of the deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Deadline passed before the call was made")
+    return max(MIN_CALL_TIMEOUT, min(default, left))
+
+
+def result_by_deadline(future, default=None):
+    """The future's result, or `default` if the deadline passes (or the call fails) first."""
+    left = remaining()
+    try:
+        return future.result(timeout=None if left is None else max(0.0, left))
+    except TimeoutError:
+        return default
+    except Exception as e:
+        logger.warning(f"Continuing without a result: {type(e).__name__}: {e}")
+        return default
+
+
+class LatencyTracker:
+    """Recent latencies of one endpoint and the hedging budget spent on it."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """The p95 latency once enough samples exist, else None (no hedging yet)."""
+        with self._lock:
+            self.calls += 1
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+    def take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges >= HEDGE_BUDGET * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+_pool = None
+
+
+def latency_tracker(key: str) -> LatencyTracker:
+    with _trackers_lock:
+        return _trackers.setdefault(key, LatencyTracker())
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _trackers_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_POOL_WORKERS", 32)), thread_name_prefix="hedge")
+        return _pool
+
+
+def hedged(key: str, fn, *args, **kwargs):
+    """
+    Call `fn`, duplicating the call once it has run longer than the p95 latency for `key`;
+    the first successful result wins. Only for idempotent calls. Raises DeadlineExceeded
+    if neither finishes before the deadline.
+    """
+    tracker = latency_tracker(key)
+    delay = tracker.hedge_delay() if HEDGE_REQUESTS else None
+
+    def timed():
+        start = time.monotonic()
+        result = fn(*args, **kwargs)
+        tracker.record(time.monotonic() - start)
+        return result
+
+    if delay is None:
+        return timed()
+
+    pool = _hedge_pool()
+    pending = {pool.submit(propagate(timed))}
+    left = remaining()
+    done, pending = wait(pending, timeout=delay if left is None else max(0.0, min(delay, left)))
+    if not done and tracker.take_hedge():
+        logger.info(f"Hedging {key} call after {delay:.2f}s")
+        pending.add(pool.submit(propagate(timed)))
+
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"{key} call did not finish before the deadline")
+        done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
@@ -0,0 +1,340 @@
+"""
+Process-wide governor for outbound LLM and tool calls.
+
+Every model and tool endpoint gets its own `Governor`, which combines:
+  - a token bucket on requests per second (and, for models, on prompt tokens per minute),
+  - an AIMD concurrency limit: it grows by one slot per window of successful calls and is cut
+    when the endpoint throttles (429/503), times out or answers slower than its latency target,
+  - a pause honouring Retry-After (or exponential backoff) that every caller waits out,
+  - retries of throttled and transient failures, each after a jittered exponential backoff.
+
+Limits are per worker process. Defaults come from GOVERNOR_LLM_* / GOVERNOR_TOOL_* and can be
+overridden per key with GOVERNOR_LIMITS, e.g. '{"llm:o3-mini": {"rps": 5, "tpm": 150000}}'.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from utils.deadline import DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+GOVERNOR_MAX_RETRIES = int(os.getenv("GOVERNOR_MAX_RETRIES", 4))
+# Callers waiting longer than this for a slot fail instead of queueing forever
+GOVERNOR_QUEUE_TIMEOUT = float(os.getenv("GOVERNOR_QUEUE_TIMEOUT", 300))
+GOVERNOR_BACKOFF = float(os.getenv("GOVERNOR_BACKOFF", 1.0))
+GOVERNOR_MAX_BACKOFF = 60.0
+
+DEFAULTS = {
+    "llm": {
+        "rps": float(os.getenv("GOVERNOR_LLM_RPS", 8)),
+        "tpm": float(os.getenv("GOVERNOR_LLM_TPM", 0)),
+        "max_concurrency": int(os.getenv("GOVERNOR_LLM_CONCURRENCY", 32)),
+        "latency_target": float(os.getenv("GOVERNOR_LLM_LATENCY_TARGET", 90)),
+        # Generation is not cut short by request deadlines, only evidence lookups are
+        "honour_deadline": False,
+    },
+    "tool": {
+        "rps": float(os.getenv("GOVERNOR_TOOL_RPS", 20)),
+        "tpm": 0,
+        "max_concurrency": int(os.getenv("GOVERNOR_TOOL_CONCURRENCY", 16)),
+        "latency_target": float(os.getenv("GOVERNOR_TOOL_LATENCY_TARGET", 10)),
+        "honour_deadline": True,
+    },
+}
+
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+
+class GovernorTimeout(RuntimeError):
+    """Raised when a call waited GOVERNOR_QUEUE_TIMEOUT for a slot."""
+
+
+class Throttled(Exception):
+    """Raised for a throttled HTTP response so the governor backs off and retries it."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class TokenBucket:
+    """Reservation-style token bucket: callers take tokens up front and sleep off any deficit."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take `amount` tokens and return how long to wait before using them; amounts above the burst go into debt."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+def status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def retry_after(error):
+    """Seconds from a Retry-After / retry-after-ms header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_timeout(error) -> bool:
+    import requests
+
+    openai = sys.modules.get("openai")
+    return isinstance(error, (requests.Timeout, TimeoutError)) or (openai is not None and isinstance(error, openai.APITimeoutError))
+
+
+def is_transient(error) -> bool:
+    """Throttling, server errors and connection failures are worth retrying."""
+    import requests
+
+    if status_code(error) in RETRY_STATUSES:
+        return True
+    openai = sys.modules.get("openai")
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)) or (
+        openai is not None and isinstance(error, openai.APIConnectionError)
+    )
+
+
+class Governor:
+    """Rate limits, adaptive concurrency and retries for one model or tool endpoint."""
+
+    def __init__(self, name: str, rps: float, max_concurrency: int, tpm: float = 0,
+                 latency_target: float = None, min_concurrency: int = 1, honour_deadline: bool = True):
+        self.name = name
+        self.honour_deadline = honour_deadline
+        self.requests = TokenBucket(rps, max(1.0, rps)) if rps > 0 else None
+        self.tokens = TokenBucket(tpm / 60, tpm / 6) if tpm > 0 else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        # Start at half the ceiling and let successful calls open it up
+        self.limit = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self.queued = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.consecutive_throttles = 0
+        self.latency_ewma = None
+        self.counts = {"calls": 0, "throttled": 0, "timeouts": 0, "errors": 0, "retries": 0}
+        self._cond = threading.Condition()
+
+    def _acquire(self, tokens: float = 0) -> float:
+        # Never queue past the caller's own deadline
+        left = remaining() if self.honour_deadline else None
+        wait_limit = GOVERNOR_QUEUE_TIMEOUT if left is None else min(GOVERNOR_QUEUE_TIMEOUT, max(0.0, left))
+        deadline = time.monotonic() + wait_limit
+        with self._cond:
+            self.queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        if wait_limit < GOVERNOR_QUEUE_TIMEOUT:
+                            raise DeadlineExceeded(f"{self.name}: deadline passed while waiting for a slot")
+                        raise GovernorTimeout(f"{self.name}: no slot after {GOVERNOR_QUEUE_TIMEOUT:.0f}s")
+                    if now < self.paused_until:
+                        self._cond.wait(min(self.paused_until, deadline) - now)
+                    elif self.in_flight >= int(self.limit):
+                        self._cond.wait(deadline - now)
+                    else:
+                        break
+                self.in_flight += 1
+            finally:
+                self.queued -= 1
+        wait = max(self.requests.reserve() if self.requests else 0.0,
+                   self.tokens.reserve(tokens) if self.tokens and tokens else 0.0)
+        if wait:
+            time.sleep(wait)
+        return time.monotonic()
+
+    def _decrease(self, started: float, factor: float):
+        # Calls admitted before the last cut were already counted against it: one cut per window
+        if started >= self.last_decrease:
+            self.limit = max(float(self.min_concurrency), self.limit * factor)
+            self.last_decrease = time.monotonic()
+
+    def _release(self, started: float, error: BaseException = None):
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            self.counts["calls"] += 1
+            if error is not None and (isinstance(error, Throttled) or status_code(error) in THROTTLE_STATUSES):
+                self.counts["throttled"] += 1
+                self.consecutive_throttles += 1
+                self._decrease(started, 0.5)
+                delay = retry_after(error)
+                if delay is None:
+                    delay = min(GOVERNOR_MAX_BACKOFF, GOVERNOR_BACKOFF * 2 ** (self.consecutive_throttles - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                self.paused_until = max(self.paused_until, now + delay)
+                logger.info(f"{self.name} throttled, pausing {delay:.1f}s with concurrency limit {int(self.limit)}")
+            elif error is not None and is_timeout(error):
+                self.counts["timeouts"] += 1
+                self._decrease(started, 0.75)
+            elif isinstance(error, Exception):
+                self.counts["errors"] += 1
+            elif error is None:
+                self.consecutive_throttles = 0
+                self.latency_ewma = latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+                if self.latency_target and latency > self.latency_target:
+                    self._decrease(started, 0.9)
+                elif self.in_flight + 1 >= int(self.limit):
+                    # Only grow while the limit is actually the bottleneck
+                    self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: float = 0):
+        """Hold one concurrency slot (after the rate limits allow it) for the enclosed call."""
+        started = self._acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self._release(started, e)
+            raise
+        self._release(started)
+
+    def call(self, fn, *args, tokens: float = 0, **kwargs):
+        """Run `fn` in a slot, retrying throttled and transient failures."""
+        for attempt in range(GOVERNOR_MAX_RETRIES + 1):
+            try:
+                with self.slot(tokens):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == GOVERNOR_MAX_RETRIES or isinstance(e, DeadlineExceeded) or not is_transient(e):
+                    raise
+                self._before_retry(e, attempt)
+
+    def stream(self, fn, *args, tokens: float = 0, **kwargs):
+        """Like `call` for a generator; a failure is only retried before the first item was yielded."""
+        for attempt in range(GOVERNOR_MAX_RETRIES + 1):
+            started = False
+            try:
+                with self.slot(tokens):
+                    for item in fn(*args, **kwargs):
+                        started = True
+                        yield item
+                return
+            except Exception as e:
+                if started or attempt == GOVERNOR_MAX_RETRIES or isinstance(e, DeadlineExceeded) or not is_transient(e):
+                    raise
+                self._before_retry(e, attempt)
+
+    def _before_retry(self, error, attempt):
+        """Count the retry and back off; throttled calls already wait out the shared pause in `_acquire`."""
+        with self._cond:
+            self.counts["retries"] += 1
+            throttled = isinstance(error, Throttled) or status_code(error) in THROTTLE_STATUSES
+        delay = 0.0 if throttled else min(GOVERNOR_MAX_BACKOFF, GOVERNOR_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+        left = remaining() if self.honour_deadline else None
+        if left is not None:
+            delay = min(delay, max(0.0, left))
+        logger.info(f"Retrying {self.name} call (attempt {attempt + 2}) in {delay:.1f}s after {type(error).__name__}: {error}")
+        if delay:
+            time.sleep(delay)
+
+    def post(self, url: str, **kwargs):
+        """requests.post through the governor; a response still throttled after all retries is returned as is."""
+        import requests
+
+        def send():
+            response = requests.post(url, **kwargs)
+            if response.status_code in THROTTLE_STATUSES:
+                raise Throttled(response)
+            return response
+
+        try:
+            return self.call(send)
+        except Throttled as e:
+            return e.response
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency_limit": int(self.limit),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+                "rps": self.requests.rate if self.requests else None,
+                "request_tokens": round(self.requests.available(), 3) if self.requests else None,
+                "tpm": self.tokens.rate * 60 if self.tokens else None,
+                "prompt_tokens": round(self.tokens.available()) if self.tokens else None,
+                "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                **self.counts,
+            }
+
+
+_governors = {}
+_lock = threading.Lock()
+
+
+def _overrides() -> dict:
+    try:
+        return json.loads(os.getenv("GOVERNOR_LIMITS", "") or "{}")
+    except json.JSONDecodeError:
+        logger.warning("Ignoring GOVERNOR_LIMITS, it is not valid JSON")
+        return {}
+
+
+def get_governor(key: str) -> Governor:
+    """The process-wide governor for `key`, "llm:<model>" or "tool:<endpoint>"."""
+    with _lock:
+        governor = _governors.get(key)
+        if governor is None:
+            kind = key.split(":", 1)[0]
+            settings = {**DEFAULTS.get(kind, DEFAULTS["tool"]), **_overrides().get(key, {})}
+            governor = _governors[key] = Governor(key, **settings)
+        return governor
+
+
+def governed_post(key: str, url: str, **kwargs):
+    return get_governor(key).post(url, **kwargs)
+
+
+def metrics() -> dict:
+    """Current limits, queue depths and counters of every governor in this process."""
+    with _lock:
+        governors = list(_governors.values())
+    return {governor.name: governor.metrics() for governor in governors}
@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+JSON_REPAIR_MAX_ATTEMPTS = int(os.getenv("JSON_REPAIR_MAX_ATTEMPTS", 2))
+# Fragments larger than this are never sent for LLM repair, a regeneration is cheaper
+JSON_REPAIR_MAX_FRAGMENT_CHARS = int(os.getenv("JSON_REPAIR_MAX_FRAGMENT_CHARS", 6000))
+
+_CLOSERS = {"{": "}", "[": "]"}
+_STRING_QUOTES = {'"': '"', "“": "”", "‘": "’", "'": "'"}
+_LITERALS = {"True": "true", "False": "false", "None": "null", "NaN": "null", "Infinity": "null"}
+
+JSON_REPAIR_PROMPT = """The following fragment was cut out of a larger JSON document and is malformed.
+Return only the corrected fragment: keep every key and all text unchanged, fix only the JSON syntax.
+Do not add commentary or code fences, and do not wrap the fragment in extra brackets.
+
+Fragment:
+{fragment}"""
+
+
+def extract_json_text(text: str) -> str:
+    """Strip code fences and any prose around the outermost JSON object or array."""
+    text = re.sub(r"```(?:json)?", "", text).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    end = text.rfind(_CLOSERS[text[start]])
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _next_significant(text, i):
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return (text[i], i) if i < len(text) else ("", i)
+
+
+# A complete "key": on the same line, or a complete array item, right after a string
+_KEY_AHEAD = re.compile(r'"[^"\n]*"\s*:')
+_ITEM_AHEAD = re.compile(r'"[^"\n]*"\s*[,\]]')
+# A bare word that can follow a comma: a literal, a number or an unquoted key
+_VALUE_WORD = re.compile(r"(?:true|false|null|True|False|None|NaN|Infinity|-?\d[\d.eE+-]*)\b|[A-Za-z_]\w*\s*:")
+
+
+def _closes_string(text, i, in_array):
+    """Whether the double quote at `i` ends its string or is an unescaped quote inside it, judged by what follows."""
+    nxt, j = _next_significant(text, i + 1)
+    if nxt in ("", ":", "}", "]"):
+        return True
+    if nxt == '"':
+        # The next item on a new line, or on the same line with its comma missing
+        return "\n" in text[i:j] or bool(_KEY_AHEAD.match(text, j) or (in_array and _ITEM_AHEAD.match(text, j)))
+    if nxt == ",":
+        # `"yes", then left"` keeps going as prose; a real comma is followed by another key or value
+        after, k = _next_significant(text, j + 1)
+        return after in ("", "}", "]", "{", "[") or after in _STRING_QUOTES or bool(_VALUE_WORD.match(text, k))
+    return False
+
+
+def repair_json(text: str) -> str:
+    """
+    Single-pass local repair of common LLM JSON defects: trailing and missing commas,
+    raw newlines and unescaped quotes inside strings, smart and single quotes,
+    Python literals, // comments, mismatched closers and truncated output.
+    """
+    out = []
+    stack = []
+    quote = None  # closing quote of the string being read, if any
+    expect_comma = False
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < n:
+                out.append("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                if quote != '"' or _closes_string(text, i, bool(stack) and stack[-1] == "["):
+                    out.append('"')
+                    quote = None
+                    expect_comma = True
+                else:
+                    out.append('\\"')
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\r":
+                out.append("\\r")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch.isspace():
+            out.append(ch)
+        elif ch in _STRING_QUOTES:
+            if expect_comma:
+                out.append(",")
+            out.append('"')
+            quote = _STRING_QUOTES[ch]
+        elif ch in _CLOSERS:
+            if expect_comma:
+                out.append(",")
+            out.append(ch)
+            stack.append(ch)
+            expect_comma = False
+        elif ch in "}]":
+            # Stray closers are dropped, mismatched ones replaced by the expected closer
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+                expect_comma = True
+        elif ch == ",":
+            nxt, _ = _next_significant(text, i + 1)
+            if nxt not in ("}", "]", ",", ""):
+                out.append(",")
+            expect_comma = False
+        elif ch == ":":
+            out.append(":")
+            expect_comma = False
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        elif ch.isalnum() or ch in "-+.":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "-+._"):
+                j += 1
+            token = text[i:j]
+            if expect_comma:
+                out.append(",")
+            if token in _LITERALS:
+                token = _LITERALS[token]
+            elif _next_significant(text, j)[0] == ":":
+                token = json.dumps(token)  # unquoted key
+            out.append(token)
+            expect_comma = True
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Truncated output: close the open string, drop a dangling comma or key, close containers
+    if quote:
+        out.append('"')
+    result = "".join(out).rstrip()
+    if result.endswith(","):
+        result = result[:-1]
+    if result.endswith(":"):
+        result += " null"
+    return result + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _object_spans(text):
+    """(start, end) of every {...} object in `text`, end exclusive, skipping string contents."""
+    spans = []
+    stack = []
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append((ch, i))
+        elif ch in "}]" and stack:
+            opener, start = stack.pop()
+            if opener == "{":
+                spans.append((start, i + 1))
+    return spans
+
+
+def broken_fragment(text: str, pos: int, context_lines: int = 3):
+    """
+    Locate the smallest region around a parse error worth sending for repair: the innermost
+    nested object containing `pos`, or a few lines either side of it.
+    """
+    candidates = [(s, e) for s, e in _object_spans(text) if s < pos <= e and (s, e) != (0, len(text))]
+    if candidates:
+        return min(candidates, key=lambda span: span[1] - span[0])
+    line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+    line = sum(1 for s in line_starts if s <= pos) - 1
+    start = line_starts[max(0, line - context_lines)]
+    end_line = line + context_lines + 1
+    end = line_starts[end_line] if end_line < len(line_starts) else len(text)
+    return start, end
+
+
+def llm_repair(text: str, pos: int, llm):
+    """Ask the LLM to fix only the fragment around `pos`, splice it back and return the new text."""
+    start, end = broken_fragment(text, pos)
+    fragment = text[start:end]
+    if len(fragment) > JSON_REPAIR_MAX_FRAGMENT_CHARS:
+        logger.warning(f"Broken JSON fragment is {len(fragment)} chars, skipping LLM repair")
+        return None
+    logger.info(f"Repairing {len(fragment)} chars of malformed JSON with the LLM")
+    fixed = llm.invoke(JSON_REPAIR_PROMPT.format(fragment=fragment)).content
+    fixed = re.sub(r"```(?:json)?", "", fixed).strip()
+    return text[:start] + fixed + text[end:]
+
+
+def parse_json(response: str, repair_llm=None):
+    """
+    Parse LLM output as JSON: a strict parse, then a local repair pass, then up to
+    JSON_REPAIR_MAX_ATTEMPTS LLM repairs of the broken fragment when `repair_llm` is given.
+    Returns None if the output cannot be recovered.
+    """
+    text = extract_json_text(response)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    text = repair_json(text)
+    for attempt in range(JSON_REPAIR_MAX_ATTEMPTS + 1):
+        try:
+            data = json.loads(text)
+            logger.info(f"Recovered malformed JSON output ({attempt} LLM repairs)")
+            return data
+        except json.JSONDecodeError as e:
+            error = e
+        if repair_llm is None or attempt == JSON_REPAIR_MAX_ATTEMPTS:
+            break
+        try:
+            repaired = llm_repair(text, error.pos, repair_llm)
+        except Exception as e:
+            logger.warning(f"LLM JSON repair failed: {e}")
+            break
+        if repaired is None:
+            break
+        text = repair_json(repaired)
+    logger.warning(f"Could not parse JSON output: {error}")
+    return None
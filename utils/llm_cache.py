@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from utils.cache import SQLiteCache, env_ttl, hash_key
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated call sites whose responses may be served from cache, or "*" for all
+ENABLED_CALL_SITES = {s.strip() for s in os.getenv("LLM_CACHE_CALL_SITES", "").split(",") if s.strip()}
+
+
+def _dump_generation(generation) -> dict:
+    if isinstance(generation, ChatGeneration):
+        return {"message": message_to_dict(generation.message)}
+    return {"text": generation.text}
+
+
+def _load_generation(data: dict):
+    if "message" in data:
+        return ChatGeneration(message=messages_from_dict([data["message"]])[0])
+    return Generation(text=data["text"])
+
+
+class CallSiteLLMCache(BaseCache):
+    """
+    LangChain LLM cache for one call site, backed by a shared SQLite store.
+    Entries are content-addressed by the serialised model parameters (model, temperature, ...)
+    and the prompt, so identical prompts hit regardless of which call site stored them.
+    """
+
+    def __init__(self, call_site: str, store: SQLiteCache):
+        self.call_site = call_site
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str):
+        cached = self.store.get(hash_key(llm_string, prompt))
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cached is None:
+            return None
+        return [_load_generation(generation) for generation in cached]
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        self.store.set(hash_key(llm_string, prompt), [_dump_generation(generation) for generation in return_val])
+
+    def clear(self, **kwargs) -> None:
+        self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_store = None
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def llm_cache_for(call_site: Optional[str]) -> Optional[CallSiteLLMCache]:
+    """Return the cache for a call site if caching is enabled for it (LLM_CACHE_CALL_SITES), else None."""
+    global _store
+    if not call_site or not (call_site in ENABLED_CALL_SITES or "*" in ENABLED_CALL_SITES):
+        return None
+    with _caches_lock:
+        if _store is None:
+            _store = SQLiteCache(
+                namespace="llm_responses",
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000)),
+                # Unset keeps responses until evicted, 0 disables the cache like the other TTLs
+                ttl=env_ttl("LLM_CACHE_TTL", None),
+            )
+        if call_site not in _caches:
+            _caches[call_site] = CallSiteLLMCache(call_site, _store)
+        return _caches[call_site]
+
+
+def llm_cache_report() -> dict:
+    """Hit/miss counts and hit rate per call site since process start."""
+    with _caches_lock:
+        return {call_site: cache.stats() for call_site, cache in _caches.items()}
+
+
+def log_llm_cache_report():
+    report = llm_cache_report()
+    if report:
+        logger.info(
+            "LLM cache hit rates: "
+            + ", ".join(f"{site}={stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})" for site, stats in report.items())
+        )
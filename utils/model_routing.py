@@ -0,0 +1,72 @@
+"""
+Model routing: which model, timeout and reasoning effort each LLM call site uses.
+
+Call sites are grouped into tiers so that auxiliary steps (thinking blurbs, extraction,
+search-query writing, JSON repair) run on a small fast model and only the steps that write
+the PR/FAQ pay for a reasoning model. Override tiers with MODEL_TIERS and the mapping with
+MODEL_ROUTES, both JSON, e.g. MODEL_ROUTES='{"question_generation": "reasoning"}'.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+TIERS = {
+    # Short, low-stakes text: summaries, search queries, status blurbs, JSON fixes
+    "fast": {"model": "gpt-4o-mini", "temperature": 0, "timeout": 30, "reasoning_effort": None},
+    # Structured planning that benefits from some reasoning but not a long chain of thought
+    "balanced": {"model": "o3-mini", "temperature": 1, "timeout": 60, "reasoning_effort": "low"},
+    # The PR/FAQ itself
+    "reasoning": {"model": "o3-mini", "temperature": 1, "timeout": 120, "reasoning_effort": "medium"},
+}
+
+ROUTES = {
+    # graph.py
+    "thinking_steps": "fast",
+    "kb_extraction": "fast",
+    "web_scrape_extraction": "fast",
+    "reference_doc_extraction": "fast",
+    "competitor_query": "fast",
+    "question_generation": "balanced",
+    "content_generation": "reasoning",
+    "answer_generation": "reasoning",
+    # tools/web_search/web_search.py
+    "domain_selection": "fast",
+    # api/prfaq_api.py
+    "modify_query": "fast",
+    "modify_prfaq": "reasoning",
+    # utils/utils.py
+    "json_repair": "fast",
+}
+DEFAULT_TIER = "reasoning"
+
+
+def _load_json(name: str) -> dict:
+    try:
+        return json.loads(os.getenv(name, "") or "{}")
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring {name}, it is not valid JSON")
+        return {}
+
+
+def tiers() -> dict:
+    overrides = _load_json("MODEL_TIERS")
+    return {name: {**TIERS.get(name, {}), **overrides.get(name, {})} for name in {**TIERS, **overrides}}
+
+
+def tier_for(call_site) -> str:
+    return {**ROUTES, **_load_json("MODEL_ROUTES")}.get(call_site, DEFAULT_TIER)
+
+
+def route(call_site, tier: str = None) -> dict:
+    """
+    Model settings for a call site (or an explicit `tier`): model, temperature, timeout and
+    reasoning_effort (None for models without one).
+    """
+    tier = tier or tier_for(call_site)
+    available = tiers()
+    if tier not in available:
+        logger.warning(f"Ignoring unknown model tier {tier!r} for {call_site}, using {DEFAULT_TIER!r}")
+        tier = DEFAULT_TIER
+    return {"tier": tier, **available[tier]}
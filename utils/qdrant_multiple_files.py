@@ -1,6 +1,7 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from qdrant_client import QdrantClient, models
 from qdrant_client.http.models import PointStruct
+import argparse
 import os
 from openai import OpenAI, OpenAIError
 import uuid
@@ -8,29 +9,64 @@ import fitz
 import re
 from dotenv import load_dotenv
 import time
+from utils.chunking import chunk_pdf
+from utils.bm25 import SPARSE_VECTOR_NAME, document_vector, sparse_vectors_config
+from utils.vector_storage import HNSW_PRESETS, collection_params, embedding_kwargs, hnsw_config, on_disk, quantization_config
 
 load_dotenv()
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
-# Initialize Qdrant
-qdrant_url = os.getenv("QDRANT_URL")
-connection = QdrantClient(url=qdrant_url)
-collection_name = "1F_KB_BASE_PF"
+collection_name = os.getenv("QDRANT_COLLECTION_NAME") or "1F_KB_BASE_PF"
+# "structured" chunks along headings and Q/A pairs (utils/chunking.py), "recursive" by character count
+KB_CHUNKER = os.getenv("KB_CHUNKER", "structured").lower()
+BATCH_SIZE = 100
 
-# Ensure the collection exists
-connection.create_collection(
-    collection_name=collection_name,
-    vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE),
-)
-print(f"Collection '{collection_name}' initialized.")
+
+def get_connection():
+    return QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+
+
+def ensure_collection(connection, name=collection_name):
+    """
+    Create the collection (dense vectors stored as configured in utils/vector_storage.py,
+    plus BM25 sparse vectors) if it does not exist. Returns whether it has the sparse vector:
+    collections created before hybrid search do not, and Qdrant cannot add one, so
+    --copy-to copies them into a new collection.
+    """
+    if not connection.collection_exists(name):
+        connection.create_collection(
+            collection_name=name,
+            sparse_vectors_config=sparse_vectors_config(),
+            **collection_params(),
+        )
+        print(f"Collection '{name}' created.")
+        return True
+    info = connection.get_collection(name)
+    sparse = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+    if not sparse:
+        print(f"Collection '{name}' has no '{SPARSE_VECTOR_NAME}' sparse vector, hybrid search needs a copy made with --copy-to.")
+    print(f"Collection '{name}' initialized.")
+    return sparse
+
+def update_storage(connection, name=collection_name):
+    """Apply the configured quantization, on-disk and HNSW settings to an existing collection."""
+    connection.update_collection(
+        collection_name=name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=on_disk())},
+        hnsw_config=hnsw_config(),
+        quantization_config=quantization_config() or models.Disabled.DISABLED,
+    )
+    print(f"Updated the vector storage settings of '{name}'; Qdrant rebuilds the affected segments in the background.")
 
 def extract_text_from_pdf(pdf_path):
     text = ""
     with fitz.open(pdf_path) as doc:
         for page in doc:
             text += page.get_text()
-    text = re.sub(r'\s+', ' ', text)
-    return text
+    # Keep line and paragraph breaks, the splitter's separators depend on them
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n\s*', '\n\n', text)
+    return text.strip()
 
 def get_text_chunks(text):
     text_splitter = RecursiveCharacterTextSplitter(
@@ -41,63 +77,118 @@ def get_text_chunks(text):
     )
     return text_splitter.split_text(text)
 
-def get_embedding(text, model_id="text-embedding-ada-002", retries=3):
+def get_embedding(text, model_id=None, retries=3):
     for attempt in range(retries):
         try:
-            response = client.embeddings.create(input=text, model=model_id)
+            response = client.embeddings.create(input=text, **embedding_kwargs(model_id))
             return response.data[0].embedding
         except OpenAIError as e:
             print(f"OpenAI Error: {e}, retrying ({attempt + 1}/{retries})...")
             time.sleep(2 * (attempt + 1))
     raise Exception(f"Failed to get embedding after {retries} retries.")
 
-def process_and_upload_pdf(pdf_path):
+def process_and_upload_pdf(pdf_path, connection, name=collection_name, sparse=True):
     print(f"\n Processing: {pdf_path}")
     try:
-        raw_text = extract_text_from_pdf(pdf_path)
-        chunks = get_text_chunks(raw_text)
+        if KB_CHUNKER == "recursive":
+            chunks = [{"text": chunk} for chunk in get_text_chunks(extract_text_from_pdf(pdf_path))]
+        else:
+            chunks = chunk_pdf(pdf_path)
 
         file_name = os.path.basename(pdf_path)
 
         points = []
         for i, chunk in enumerate(chunks):
             print(f"Embedding chunk {i+1}/{len(chunks)}")
-            embedding = get_embedding(chunk)
+            embedding = get_embedding(chunk["text"])
             point_id = str(uuid.uuid4())
 
-            # Add metadata as payload
+            # Add metadata as payload (section, page and questions come from the structured chunker)
             payload = {
-                "text": chunk,
+                **chunk,
                 "chunk_index": i,
                 "file_name": file_name,
             }
 
-            points.append(PointStruct(id=point_id, vector=embedding, payload=payload))
+            # "" is the collection's unnamed dense vector
+            vector = {"": embedding, SPARSE_VECTOR_NAME: document_vector(chunk["text"])} if sparse else embedding
+            points.append(PointStruct(id=point_id, vector=vector, payload=payload))
 
         # Batch insert to Qdrant (in 100s)
-        BATCH_SIZE = 100
         for i in range(0, len(points), BATCH_SIZE):
             batch = points[i:i + BATCH_SIZE]
-            connection.upsert(collection_name=collection_name, wait=True, points=batch)
+            connection.upsert(collection_name=name, wait=True, points=batch)
             print(f"Inserted {len(batch)} points into Qdrant")
 
         print(f"Uploaded document: {pdf_path}")
     except Exception as e:
-        print(f"Error processing '{pdf_path}': {str(e)}")      
-          
-def process_multiple_pdfs_in_folder(folder_path):
+        print(f"Error processing '{pdf_path}': {str(e)}")
+
+def process_multiple_pdfs_in_folder(folder_path, connection, name=collection_name, sparse=True):
     # Get a list of all PDF files in the folder
     pdf_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.lower().endswith('.pdf')]
-    
+
     if not pdf_files:
         print("No PDF files found in the provided folder.")
         return
-    
+
     for i, pdf_path in enumerate(pdf_files):
         print(f"\n========== File {i+1}/{len(pdf_files)} ==========")
-        process_and_upload_pdf(pdf_path)
+        process_and_upload_pdf(pdf_path, connection, name, sparse)
+
+def copy_with_sparse_vectors(connection, source, target):
+    """Copy every point of `source` into a new hybrid collection, adding BM25 vectors from the chunk text."""
+    ensure_collection(connection, target)
+    offset, copied = None, 0
+    while True:
+        points, offset = connection.scroll(collection_name=source, limit=BATCH_SIZE, offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            connection.upsert(
+                collection_name=target,
+                wait=True,
+                points=[
+                    PointStruct(
+                        id=point.id,
+                        vector={
+                            "": point.vector.get("") if isinstance(point.vector, dict) else point.vector,
+                            SPARSE_VECTOR_NAME: document_vector(point.payload.get("text", "")),
+                        },
+                        payload=point.payload,
+                    )
+                    for point in points
+                ],
+            )
+            copied += len(points)
+            print(f"Copied {copied} points into '{target}'")
+        if offset is None:
+            return copied
 
 # Example usage
 if __name__ == "__main__":
-    folder_path = "new_transformed_QA"  
-    process_multiple_pdfs_in_folder(folder_path)
+    parser = argparse.ArgumentParser(description="Ingest PDFs into the KB collection")
+    parser.add_argument("folder", nargs="?", default="new_transformed_QA", help="Folder of PDFs to ingest")
+    parser.add_argument("--collection", default=collection_name)
+    parser.add_argument("--copy-to", metavar="COLLECTION", help="Copy the collection into a new one with BM25 sparse vectors instead of ingesting")
+    # Storage options override the KB_* variables read by utils/vector_storage.py
+    parser.add_argument("--embedding-model", help="KB_EMBEDDING_MODEL, e.g. text-embedding-3-small")
+    parser.add_argument("--dimensions", type=int, help="KB_EMBEDDING_DIMENSIONS, shortened text-embedding-3 vectors")
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], help="KB_QUANTIZATION")
+    parser.add_argument("--on-disk", action="store_true", default=None, help="KB_ON_DISK=true")
+    parser.add_argument("--hnsw", choices=list(HNSW_PRESETS), help="KB_HNSW_PRESET")
+    parser.add_argument("--update-storage", action="store_true", help="Apply the quantization, on-disk and HNSW settings to the existing collection")
+    parser.add_argument("--chunker", choices=["structured", "recursive"], default=KB_CHUNKER, help="KB_CHUNKER")
+    args = parser.parse_args()
+    KB_CHUNKER = args.chunker
+    for env, value in (("KB_EMBEDDING_MODEL", args.embedding_model), ("KB_EMBEDDING_DIMENSIONS", args.dimensions),
+                       ("KB_QUANTIZATION", args.quantization), ("KB_ON_DISK", args.on_disk and "true"), ("KB_HNSW_PRESET", args.hnsw)):
+        if value:
+            os.environ[env] = str(value)
+
+    connection = get_connection()
+    if args.copy_to:
+        copy_with_sparse_vectors(connection, args.collection, args.copy_to)
+    elif args.update_storage:
+        update_storage(connection, args.collection)
+    else:
+        sparse = ensure_collection(connection, args.collection)
+        process_multiple_pdfs_in_folder(args.folder, connection, args.collection, sparse)
@@ -0,0 +1,67 @@
+import re
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from", "as",
+    "is", "are", "was", "were", "be", "been", "being", "do", "does", "did", "will", "would", "can",
+    "could", "should", "shall", "may", "might", "must", "have", "has", "had",
+    "what", "which", "who", "whom", "whose", "when", "where", "why", "how",
+    "it", "its", "this", "that", "these", "those", "we", "our", "us", "you", "your", "they", "their",
+    "i", "my", "me", "there", "any", "some", "all", "about", "into", "if", "so", "than", "then",
+}
+
+# Words nearly every generated FAQ question mentions; they say nothing about what a question asks
+_QUESTION_STOPWORDS = _STOPWORDS | {"context", "product", "offering", "1", "finance", "1finance"}
+
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ed", "es", "ly", "s")
+
+
+def _stem(token):
+    """Crude suffix stripping so that 'secured', 'securing' and 'secure' become the same term."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[: -len(suffix)]
+            break
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+def content_words(text, stopwords=_STOPWORDS):
+    """Return the normalised (lower-cased, stemmed, stopword-free) words of a text, in order."""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return [_stem(t) for t in tokens if t not in stopwords]
+
+
+def question_terms(question):
+    """Return the set of stemmed content words of a question, without the FAQ domain words."""
+    return set(content_words(question, _QUESTION_STOPWORDS))
+
+
+def jaccard(a, b):
+    # An empty set (a question made only of stopwords) says nothing about what it asks, so it matches nothing
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_questions(questions, threshold=0.7):
+    """
+    Group near-duplicate questions together.
+    Each question joins the first cluster whose leader has a term Jaccard
+    similarity >= threshold, otherwise it starts a new cluster. Leader-based
+    assignment avoids chaining loosely related questions into one cluster.
+    Returns:
+      list of clusters, each a list of indices into `questions`; the first index is the leader.
+    """
+    clusters = []
+    leader_terms = []
+    for idx, question in enumerate(questions):
+        terms = question_terms(question)
+        for cluster, leader in zip(clusters, leader_terms):
+            if jaccard(terms, leader) >= threshold:
+                cluster.append(idx)
+                break
+        else:
+            clusters.append([idx])
+            leader_terms.append(terms)
+    return clusters
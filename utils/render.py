@@ -0,0 +1,251 @@
+"""
+Rendering of PRFAQ output to markdown, DOCX and PDF.
+
+Markdown is written in a single pass and can be consumed section by section with
+`iter_markdown`; DOCX (python-docx) and PDF (PyMuPDF Story) are produced from the same
+markdown, so every format shows identical content. Both libraries are imported lazily.
+"""
+import html
+import io
+import re
+from typing import Iterator, List
+
+INTRO_SECTIONS = [
+    ("Title", "Title"),
+    ("Subtitle", "Subtitle"),
+    ("IntroParagraph", "Introduction Paragraph"),
+    ("ProblemStatement", "Problem Statement"),
+    ("Solution", "Solution"),
+]
+FAQ_SECTIONS = [("InternalFAQs", "Internal FAQs"), ("ExternalFAQs", "External FAQs")]
+
+_INLINE = re.compile(r"(\*\*[^*]+\*\*|\[[^\]]+\]\([^)\s]+\)|\*[^*\s][^*]*\*)")
+_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_BULLET = re.compile(r"^\s*[-*•]\s+(.*)")
+_NUMBERED = re.compile(r"^\s*\d+[.)]\s+(.*)")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)")
+_TABLE_RULE = re.compile(r"^\|?\s*:?-{2,}")
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value).replace("|", "\\|").replace("\n", "<br>")
+
+
+def markdown_table(rows: List[dict]) -> str:
+    """Markdown table for a list of row dicts; columns are keys in order of first appearance."""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    lines = [
+        "| " + " | ".join(_cell(c) for c in columns) + " |",
+        "| " + " | ".join("---" for _ in columns) + " |",
+    ]
+    lines.extend("| " + " | ".join(_cell(row.get(c)) for c in columns) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def render_answer(answer) -> str:
+    """Markdown for an FAQ answer: text as-is, a JSON table as a markdown table, other lists as bullets."""
+    if isinstance(answer, list):
+        if answer and all(isinstance(row, dict) for row in answer):
+            return markdown_table(answer)
+        return "\n".join(f"- {item}" for item in answer)
+    return "" if answer is None else str(answer)
+
+
+def iter_markdown(output: dict, include_user_response: bool = False) -> Iterator[str]:
+    """Yield the PRFAQ markdown one section at a time."""
+    if include_user_response:
+        yield f"*{output.get('UserResponse', '')}*\n\n"
+    yield "".join(f"**{label}:** {output.get(key, '')}\n\n" for key, label in INTRO_SECTIONS)
+    yield "**Leader's Quote:** \n\n**Customer's Quote:** \n\n"
+
+    parts = ["\n**Competitors:**\n"]
+    for competitor in output.get("Competitors") or []:
+        parts.append(f"\n- [{competitor.get('name', '')}]({competitor.get('url', '')})\n")
+    yield "".join(parts)
+
+    for key, label in FAQ_SECTIONS:
+        parts = [f"\n**{label}:**\n"]
+        for faq in output.get(key) or []:
+            question = faq.get("Question", faq.get("question", "Unknown Question"))
+            answer = faq.get("Answer", faq.get("answer", "No answer provided"))
+            parts.append(f"\n**Q: {question}**\n\nA:\n{render_answer(answer)}\n")
+        yield "".join(parts)
+
+
+def to_markdown(output: dict, include_user_response: bool = False) -> str:
+    return "".join(iter_markdown(output, include_user_response))
+
+
+# --- Markdown -> DOCX / PDF ---
+
+def markdown_blocks(text: str):
+    """
+    Split markdown into ("heading", level, text), ("table", rows), ("bullet", text),
+    ("numbered", text) and ("paragraph", text) blocks. Only the subset the PRFAQ output uses.
+    """
+    lines = text.splitlines()
+    i = 0
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            yield ("paragraph", "\n".join(paragraph))
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith("|"):
+            yield from flush()
+            rows = []
+            while i < len(lines) and lines[i].strip().startswith("|"):
+                row = lines[i].strip()
+                if not _TABLE_RULE.match(row):
+                    cells = re.split(r"(?<!\\)\|", row.strip("|"))
+                    rows.append([c.strip().replace("\\|", "|").replace("<br>", "\n") for c in cells])
+                i += 1
+            # A separator line on its own has no rows to render
+            if rows:
+                yield ("table", rows)
+            continue
+        if not stripped:
+            yield from flush()
+        elif match := _HEADING.match(stripped):
+            yield from flush()
+            yield ("heading", len(match.group(1)), match.group(2))
+        elif match := _BULLET.match(line):
+            yield from flush()
+            yield ("bullet", match.group(1))
+        elif match := _NUMBERED.match(line):
+            yield from flush()
+            yield ("numbered", match.group(1))
+        else:
+            paragraph.append(stripped)
+        i += 1
+    yield from flush()
+
+
+def _inline_runs(text: str):
+    """Split inline markdown into (text, bold, italic) runs; links become "name (url)"."""
+    for token in _INLINE.split(text):
+        if not token:
+            continue
+        if token.startswith("**") and token.endswith("**"):
+            yield token[2:-2], True, False
+        elif token.startswith("[") and (link := _LINK.fullmatch(token)):
+            yield f"{link.group(1)} ({link.group(2)})", False, False
+        elif token.startswith("*") and token.endswith("*") and len(token) > 2:
+            yield token[1:-1], False, True
+        else:
+            yield token, False, False
+
+
+def _add_runs(paragraph, text):
+    for run_text, bold, italic in _inline_runs(text):
+        run = paragraph.add_run(run_text)
+        run.bold = bold or None
+        run.italic = italic or None
+
+
+def markdown_to_docx(text: str) -> bytes:
+    """Render markdown to a .docx document."""
+    import docx
+
+    document = docx.Document()
+    # python-docx resolves style names by scanning the whole style sheet on every use,
+    # so look the styles up once and pass the style objects
+    styles = {name: document.styles[name] for name in ("List Bullet", "List Number", "Table Grid")}
+
+    def add_paragraph(text, style=None):
+        paragraph = document.add_paragraph(style=styles[style] if style else None)
+        _add_runs(paragraph, text)
+
+    for block in markdown_blocks(text):
+        kind = block[0]
+        if kind == "heading":
+            _add_runs(document.add_heading(level=min(block[1], 9)), block[2])
+        elif kind == "table":
+            rows = block[1]
+            width = max(len(row) for row in rows)
+            table = document.add_table(rows=len(rows), cols=width, style=styles["Table Grid"])
+            for r, (row, cells) in enumerate(zip(rows, table.rows)):
+                for value, cell in zip(row, cells.cells):
+                    _add_runs(cell.paragraphs[0], f"**{value}**" if r == 0 and value else value)
+        elif kind == "bullet":
+            add_paragraph(block[1], "List Bullet")
+        elif kind == "numbered":
+            add_paragraph(block[1], "List Number")
+        else:
+            add_paragraph(block[1])
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _inline_html(text: str) -> str:
+    parts = []
+    for run_text, bold, italic in _inline_runs(text):
+        run_html = html.escape(run_text).replace("\n", "<br/>")
+        if bold:
+            run_html = f"<b>{run_html}</b>"
+        if italic:
+            run_html = f"<i>{run_html}</i>"
+        parts.append(run_html)
+    return "".join(parts)
+
+
+def markdown_to_html(text: str) -> str:
+    """Render markdown to the simple HTML subset understood by PyMuPDF's Story."""
+    parts = []
+    list_tag = None
+    for block in markdown_blocks(text):
+        kind = block[0]
+        tag = {"bullet": "ul", "numbered": "ol"}.get(kind)
+        if tag != list_tag:
+            if list_tag:
+                parts.append(f"</{list_tag}>")
+            if tag:
+                parts.append(f"<{tag}>")
+            list_tag = tag
+        if kind == "heading":
+            parts.append(f"<h{block[1]}>{_inline_html(block[2])}</h{block[1]}>")
+        elif kind == "table":
+            rows = block[1]
+            parts.append("<table>")
+            parts.append("<tr>" + "".join(f"<th>{_inline_html(c)}</th>" for c in rows[0]) + "</tr>")
+            parts.extend("<tr>" + "".join(f"<td>{_inline_html(c)}</td>" for c in row) + "</tr>" for row in rows[1:])
+            parts.append("</table>")
+        elif tag:
+            parts.append(f"<li>{_inline_html(block[1])}</li>")
+        else:
+            parts.append(f"<p>{_inline_html(block[1])}</p>")
+    if list_tag:
+        parts.append(f"</{list_tag}>")
+    return "".join(parts)
+
+
+PDF_CSS = """
+* {font-family: sans-serif; font-size: 10pt;}
+p {margin-bottom: 6pt;}
+table {border-collapse: collapse; margin-bottom: 6pt;}
+th, td {border: 0.5pt solid #888; padding: 3pt;}
+"""
+
+
+def markdown_to_pdf(text: str, paper: str = "a4") -> bytes:
+    """Render markdown to PDF with PyMuPDF's Story layout engine."""
+    import fitz
+
+    story = fitz.Story(html=markdown_to_html(text), user_css=PDF_CSS)
+    buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(buffer)
+    mediabox = fitz.paper_rect(paper)
+    where = mediabox + (48, 48, -48, -48)
+    more = True
+    while more:
+        device = writer.begin_page(mediabox)
+        more, _ = story.place(where)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+    return buffer.getvalue()
@@ -0,0 +1,160 @@
+"""
+Post-retrieval cleanup of KB and web search results before they go into a prompt.
+
+Results are parsed into passages, the text adjacent chunks share (the recursive chunker
+overlaps chunks by 200 characters) is cut from the later chunk, near-duplicate passages are dropped
+and the rest are reranked by BM25 against the query, blended with the retriever's own score
+when it has one. Only the top passages are kept, formatted as compact numbered text
+instead of the raw JSON. Results that cannot be parsed (errors, plain text) pass through.
+"""
+import json
+import logging
+import math
+import os
+from collections import Counter
+from typing import List, Optional
+
+from utils.question_dedup import content_words, jaccard
+
+logger = logging.getLogger(__name__)
+
+RERANK = os.getenv("RERANK", "true").lower() == "true"
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 5))
+# Content-word Jaccard at or above which two passages count as the same text
+RERANK_DEDUP_THRESHOLD = float(os.getenv("RERANK_DEDUP_THRESHOLD", 0.8))
+# Weight of the retriever's score against BM25, both scaled to 0..1 within one result set
+RERANK_RETRIEVAL_WEIGHT = float(os.getenv("RERANK_RETRIEVAL_WEIGHT", 0.3))
+MIN_OVERLAP = 40
+MAX_OVERLAP = 400
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def parse_passages(result) -> Optional[List[dict]]:
+    """
+    Passages of a KB or web search result as {text, source, chunk_index, score} dicts, or None
+    if it is not parseable, including a non-empty result list none of whose items has text.
+    """
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    if isinstance(result, dict):
+        if "error" in result:
+            return None
+        result = result.get("results")
+    if not isinstance(result, list):
+        return None
+
+    passages = []
+    for item in result:
+        if isinstance(item, str):
+            passages.append({"text": item, "source": None, "chunk_index": None, "score": None})
+        elif isinstance(item, dict):
+            # KB chunks carry text/file_name, web results title/url with a description or page content
+            body = item.get("text") or item.get("content") or item.get("description") or item.get("snippet") or ""
+            title = item.get("title")
+            passages.append({
+                "text": f"{title}: {body}" if title and body else title or body,
+                "source": item.get("file_name") or item.get("url"),
+                "chunk_index": item.get("chunk_index"),
+                "score": item.get("score"),
+            })
+    passages = [p for p in passages if p["text"] and p["text"].strip()]
+    if result and not passages:
+        logger.warning(f"No passages found in {len(result)} search results, passing them through unchanged")
+        return None
+    return passages
+
+
+def _shared_overlap(earlier: str, later: str) -> int:
+    """Length of the longest suffix of `earlier` that starts `later` (the chunk overlap)."""
+    for size in range(min(len(earlier), len(later), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if earlier.endswith(later[:size]):
+            return size
+    return 0
+
+
+def trim_overlaps(passages: List[dict]) -> List[dict]:
+    """Cut text a passage repeats from the end of the preceding chunk of the same source."""
+    by_chunk = {(p["source"], p["chunk_index"]): p for p in passages if p["source"] and p["chunk_index"] is not None}
+    trimmed = []
+    for passage in passages:
+        previous = by_chunk.get((passage["source"], (passage["chunk_index"] or 0) - 1)) if passage["chunk_index"] else None
+        size = _shared_overlap(previous["text"], passage["text"]) if previous else 0
+        trimmed.append({**passage, "text": passage["text"][size:].lstrip()} if size else passage)
+    return [p for p in trimmed if p["text"]]
+
+
+def deduplicate(passages: List[dict], threshold: float = RERANK_DEDUP_THRESHOLD) -> List[dict]:
+    """Drop passages whose content words match an earlier (higher-ranked) passage's, keeping the first."""
+    kept, kept_terms = [], []
+    for passage in passages:
+        terms = set(content_words(passage["text"]))
+        if any(jaccard(terms, other) >= threshold for other in kept_terms):
+            continue
+        kept.append(passage)
+        kept_terms.append(terms)
+    return kept
+
+
+def bm25_scores(query: str, passages: List[dict]) -> List[float]:
+    """BM25 of each passage for the query, with document frequencies taken from the passages themselves."""
+    documents = [content_words(p["text"]) for p in passages]
+    if not documents:
+        return []
+    average_length = sum(len(d) for d in documents) / len(documents) or 1.0
+    frequency = Counter(term for d in documents for term in set(d))
+    query_terms = set(content_words(query))
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if tf:
+                idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def _scaled(values):
+    top = max(values, default=0.0)
+    return [v / top if top > 0 else 0.0 for v in values]
+
+
+def rank(query: str, passages: List[dict]) -> List[dict]:
+    """Passages ordered by BM25 blended with the retriever's score; ties keep the retrieval order."""
+    lexical = _scaled(bm25_scores(query, passages))
+    retrieval = [p["score"] for p in passages]
+    if all(isinstance(s, (int, float)) for s in retrieval) and retrieval:
+        combined = [(1 - RERANK_RETRIEVAL_WEIGHT) * l + RERANK_RETRIEVAL_WEIGHT * r for l, r in zip(lexical, _scaled(retrieval))]
+    else:
+        combined = lexical
+    order = sorted(range(len(passages)), key=lambda i: -combined[i])
+    return [passages[i] for i in order]
+
+
+def format_passages(passages: List[dict]) -> str:
+    return "\n\n".join(
+        f"[{i}] ({p['source']}) {p['text'].strip()}" if p["source"] else f"[{i}] {p['text'].strip()}"
+        for i, p in enumerate(passages, 1)
+    )
+
+
+def rerank(query: str, result, top_n: int = RERANK_TOP_N):
+    """
+    The `top_n` best unique passages of a search result for `query`, as prompt text.
+    Anything that is not a list of results (errors, plain text, None), or whose results have
+    no recognisable text, is returned unchanged.
+    """
+    if not RERANK:
+        return result
+    passages = parse_passages(result)
+    if passages is None:
+        return result
+    passages = deduplicate(rank(query, trim_overlaps(passages)))[:top_n]
+    return format_passages(passages) if passages else "No results found."
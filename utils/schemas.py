@@ -0,0 +1,79 @@
+from typing import Any, Dict, List, Union
+
+from pydantic import AliasChoices, BaseModel, Field, ValidationError
+
+DEFAULT_USER_RESPONSE = "Here is the generated PR/FAQ document on topic and your provided inputs. Please review and let me know if any changes are needed"
+
+
+class Competitor(BaseModel):
+    name: str = ""
+    url: str = ""
+
+
+class FAQ(BaseModel):
+    Question: str = Field(validation_alias=AliasChoices("Question", "question"))
+    # Markdown text, a bullet list, or a JSON table (list of row dicts)
+    Answer: Union[str, List[Dict[str, Any]], List[str]] = Field(default="", validation_alias=AliasChoices("Answer", "answer"))
+
+
+class PRFAQIntro(BaseModel):
+    Title: str = ""
+    Subtitle: str = ""
+    IntroParagraph: str = ""
+    ProblemStatement: str = ""
+    Solution: str = ""
+    Competitors: List[Competitor] = []
+
+
+class FAQQuestions(BaseModel):
+    internal_questions: List[str] = []
+    external_questions: List[str] = []
+
+
+class FAQAnswers(BaseModel):
+    InternalFAQs: List[FAQ] = []
+    ExternalFAQs: List[FAQ] = []
+    UserResponse: str = DEFAULT_USER_RESPONSE
+
+
+class PRFAQDocument(PRFAQIntro, FAQAnswers):
+    pass
+
+
+def validate_output(schema, data: dict, max_fixes: int = 50):
+    """
+    Validate parsed LLM output against a schema, salvaging what is valid:
+    invalid list items are dropped and invalid scalar fields fall back to their defaults.
+    Returns:
+      (dict, list) — the validated data and a list of human-readable problems that were fixed.
+    """
+    problems = []
+    data = dict(data) if isinstance(data, dict) else {}
+    for _ in range(max_fixes):
+        try:
+            return schema.model_validate(data).model_dump(), problems
+        except ValidationError as e:
+            error = e.errors()[0]
+            loc = error["loc"]
+            problems.append(f"{'.'.join(map(str, loc))}: {error['msg']}")
+            _drop(data, loc)
+    return schema().model_dump(), problems
+
+
+def _drop(data, loc):
+    """Remove the innermost list item (or, failing that, the top-level field) on an error path."""
+    container = data
+    parents = []
+    for part in loc:
+        parents.append((container, part))
+        try:
+            container = container[part]
+        except (KeyError, IndexError, TypeError):
+            break
+    for parent, part in reversed(parents):
+        if isinstance(parent, list) and isinstance(part, int) and part < len(parent):
+            del parent[part]
+            return
+    parent, part = parents[0]
+    if isinstance(parent, dict):
+        parent.pop(part, None)
@@ -0,0 +1,338 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "prfaq-generator")
+
+_current_span = contextvars.ContextVar("prfaq_current_span", default=None)
+
+
+class Span:
+    """A single timed operation; serialises to an OpenTelemetry-compatible dict."""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "ERROR"
+            self.error = repr(error)
+        for exporter in _exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                logger.warning(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "service": SERVICE_NAME,
+        }
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def flush(self):
+        pass
+
+
+class OtlpHttpExporter:
+    """
+    Buffers finished spans and posts them to an OTLP/HTTP collector (JSON encoding)
+    at `<endpoint>/v1/traces`. Posting happens on a background thread, woken when a root span
+    ends or the buffer fills (and every `interval` seconds), so traced calls never wait on
+    the collector. If the collector falls behind, spans beyond `max_pending` are dropped.
+    """
+
+    def __init__(self, endpoint, max_buffer=100, interval=5.0, max_pending=10000):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.max_buffer = max_buffer
+        self.interval = interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+        # The thread is a daemon, so send what is left when the process exits
+        atexit.register(self.send)
+
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _otlp_span(self, span):
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items() if v is not None],
+            "status": {"code": 2, "message": span.error} if span.status == "ERROR" else {"code": 1},
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    def export(self, span):
+        with self._lock:
+            if len(self._buffer) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._buffer.append(self._otlp_span(span))
+            should_flush = span.parent_id is None or len(self._buffer) >= self.max_buffer
+        if should_flush:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.send()
+            except Exception as e:
+                logger.warning(f"Could not export spans to {self.url}: {e}")
+
+    def flush(self):
+        """Have the exporter thread post the buffered spans without waiting for it."""
+        self._wake.set()
+
+    def send(self):
+        """Post the buffered spans now, from the calling thread."""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning(f"Dropped {dropped} spans, the collector at {self.url} is not keeping up")
+        if not spans:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "prfaq.tracing"}, "spans": spans}],
+            }]
+        }
+        requests.post(self.url, json=payload, timeout=5)
+
+
+def _configure_exporters():
+    exporters = []
+    if os.getenv("PRFAQ_TRACE_FILE"):
+        exporters.append(JsonLinesExporter(os.getenv("PRFAQ_TRACE_FILE")))
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        exporters.append(OtlpHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")))
+    return exporters
+
+
+_exporters = _configure_exporters()
+
+
+def tracing_enabled():
+    return bool(_exporters)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name, parent=None, **attributes):
+    """Start a span without making it current; the caller must call `end()`."""
+    return Span(name, parent=parent or current_span(), attributes=attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Trace the enclosed block as a span, nested under the current span.
+    Yields a no-op object when no exporter is configured so call sites stay cheap.
+    """
+    if not _exporters:
+        yield _NoopSpan()
+        return
+    s = start_span(name, **attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        _current_span.reset(token)
+        s.end(error=e)
+        raise
+    _current_span.reset(token)
+    s.end()
+
+
+def propagate(fn):
+    """
+    Bind the current context (span, deadline) to `fn` so work submitted to a thread pool
+    nests under the current span and runs under the same deadline.
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so every call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def flush():
+    for exporter in _exporters:
+        try:
+            exporter.flush()
+        except Exception as e:
+            logger.warning(f"Span exporter {type(exporter).__name__} flush failed: {e}")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that records every LLM invoke as an `llm.invoke` span and keeps
+    per-call-site prompt token totals, including how many were served from the provider's
+    prompt cache.
+    """
+
+    def __init__(self):
+        self._spans = {}
+        self._call_sites = {}
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, serialized, invocation_params, metadata):
+        call_site = (metadata or {}).get("call_site")
+        with self._lock:
+            self._call_sites[run_id] = call_site
+        if not _exporters:
+            return
+        params = invocation_params or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("kwargs", {}).get("model_name")
+        s = start_span("llm.invoke", model=model, temperature=params.get("temperature"), call_site=call_site)
+        with self._lock:
+            self._spans[run_id] = s
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs.get("invocation_params"), kwargs.get("metadata"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs.get("invocation_params"), kwargs.get("metadata"))
+
+    @staticmethod
+    def _token_usage(response):
+        """(prompt, cached, completion) tokens; streamed responses only carry usage on the message."""
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            return usage.get("input_tokens"), (usage.get("input_token_details") or {}).get("cache_read"), usage.get("output_tokens")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        return usage.get("prompt_tokens"), cached, usage.get("completion_tokens")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, cached_tokens, completion_tokens = self._token_usage(response)
+        with self._lock:
+            s = self._spans.pop(run_id, None)
+            call_site = self._call_sites.pop(run_id, None)
+            if prompt_tokens:
+                totals = self._usage.setdefault(call_site or "unknown", {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+                totals["calls"] += 1
+                totals["prompt_tokens"] += prompt_tokens
+                totals["cached_tokens"] += cached_tokens or 0
+        if s is None:
+            return
+        s.set_attributes(
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=s.duration_ms,
+        )
+        s.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            s = self._spans.pop(run_id, None)
+            self._call_sites.pop(run_id, None)
+        if s is not None:
+            s.end(error=error)
+
+    def prompt_cache_report(self) -> dict:
+        """Per call site: calls, prompt tokens, cached prompt tokens and the cached share."""
+        with self._lock:
+            return {
+                site: {**totals, "cached_ratio": totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0}
+                for site, totals in self._usage.items()
+            }
+
+
+tracing_callback = TracingCallbackHandler()
+
+
+def log_prompt_cache_report():
+    report = tracing_callback.prompt_cache_report()
+    if report:
+        logger.info(
+            "Provider prompt cache: "
+            + ", ".join(f"{site}={stats['cached_ratio']:.0%} of {stats['prompt_tokens']} tokens" for site, stats in sorted(report.items()))
+        )
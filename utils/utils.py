@@ -1,8 +1,21 @@
 import fitz  # PyMuPDF
-import json
+import logging
+import os
 import re
-import pandas as pd
+from langchain_core.exceptions import OutputParserException
 from langchain_openai import ChatOpenAI
+from openai import BadRequestError
+from utils.governor import get_governor
+from utils.tracing import tracing_callback
+from utils.llm_cache import llm_cache_for
+from utils.model_routing import route
+from utils.json_repair import parse_json
+from utils.schemas import validate_output
+
+logger = logging.getLogger(__name__)
+
+# Ask the model for JSON-schema structured output instead of free-text JSON
+STRUCTURED_OUTPUT = os.getenv("PRFAQ_STRUCTURED_OUTPUT", "true").lower() == "true"
 
 def extract_text_from_pdf(pdf_file) -> str:
     """Extract text from a PDF file using PyMuPDF (fitz)."""
@@ -20,30 +33,90 @@ def remove_links(text):
     pattern = r'https?://\S+'
     return re.sub(pattern, '', text)
 
-def get_openai_llm():
-    return ChatOpenAI(
-        model="o3-mini", 
-        temperature=1, 
-        timeout=120
+def _prompt_tokens(messages) -> int:
+    """Rough prompt size for the tokens-per-minute budget (about 4 characters per token)."""
+    return sum(len(str(getattr(m, "content", m))) for m in messages or []) // 4
+
+class GovernedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI whose requests go through the model's governor (utils/governor.py), which
+    rate-limits them process-wide and owns the retries instead of the OpenAI client.
+    """
+    max_retries: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return get_governor(f"llm:{self.model_name}").call(
+            super()._generate, messages, stop=stop, run_manager=run_manager, tokens=_prompt_tokens(messages), **kwargs
+        )
+
+    def _stream(self, *args, **kwargs):
+        messages = args[0] if args else kwargs.get("messages")
+        yield from get_governor(f"llm:{self.model_name}").stream(super()._stream, *args, tokens=_prompt_tokens(messages), **kwargs)
+
+def get_openai_llm(call_site=None, tier=None):
+    """
+    Shared LLM client. `call_site` names the prompt it will be used for, which picks its
+    model tier (see utils/model_routing.py; `tier` overrides it) and lets responses be
+    cached per call site (see utils/llm_cache.py).
+    """
+    settings = route(call_site, tier)
+    return GovernedChatOpenAI(
+        model=settings["model"],
+        temperature=settings["temperature"],
+        timeout=settings["timeout"],
+        model_kwargs={"reasoning_effort": settings["reasoning_effort"]} if settings.get("reasoning_effort") else {},
+        # Streamed calls report token usage (and cached prompt tokens) too
+        stream_usage=True,
+        metadata={"call_site": call_site},
+        callbacks=[tracing_callback],
+        cache=llm_cache_for(call_site)
     )
 
-def render_text_or_table_to_str(text_or_data):
+def convert_to_json(response, schema=None, repair_llm=None):
     """
-    Converts structured table data or markdown strings to markdown-compatible string.
-    Used for string-based rendering (not direct Streamlit display).
+    Parse LLM output into a dict, repairing malformed JSON locally and, if `repair_llm`
+    is given, by asking it to fix only the broken fragment (see utils/json_repair.py).
+    With a `schema` (utils/schemas.py) invalid entries are dropped rather than failing the whole output.
+    Returns {} if nothing could be recovered.
     """
-    if isinstance(text_or_data, list):
-        if all(isinstance(row, dict) for row in text_or_data):
-            return pd.DataFrame(text_or_data).to_markdown(index=False)
-        else:
-            return '\n'.join(f"- {item}" for item in text_or_data)
-    return text_or_data
+    data = parse_json(response, repair_llm=repair_llm)
+    if not data:
+        return {}
+    if schema is not None:
+        data, problems = validate_output(schema, data)
+        if problems:
+            logger.warning(f"Dropped invalid {schema.__name__} fields: {'; '.join(problems)}")
+    return data
 
-def convert_to_json(response):
-    response_text = response.replace("```json","").replace("```","").strip()
+def invoke_json(llm, prompt, schema, on_partial=None, repair_llm=None):
+    """
+    Invoke `llm` for output matching a Pydantic `schema` (utils/schemas.py) through the model's
+    JSON-schema structured-output mode. With `on_partial` the response is streamed and each
+    partially parsed dict is passed to it as it grows.
+    Falls back to free-text JSON via convert_to_json if the model rejects the schema or the
+    structured output does not parse.
+    Returns {} if nothing could be recovered.
+    """
+    if STRUCTURED_OUTPUT:
+        structured = llm.with_structured_output(schema.model_json_schema(), method="json_schema", strict=False)
+        try:
+            if on_partial:
+                data = None
+                for data in structured.stream(prompt):
+                    on_partial(data)
+            else:
+                data = structured.invoke(prompt)
+            if not data:
+                return {}
+            data, problems = validate_output(schema, data)
+            if problems:
+                logger.warning(f"Dropped invalid {schema.__name__} fields: {'; '.join(problems)}")
+            return data
+        except OutputParserException as e:
+            logger.warning(f"Structured {schema.__name__} output did not parse, repairing it: {e}")
+            return convert_to_json(e.llm_output or "", schema=schema, repair_llm=repair_llm or get_openai_llm("json_repair"))
+        except BadRequestError as e:
+            logger.warning(f"Structured output rejected for {schema.__name__}, falling back to text: {e}")
 
-    try:
-        updated_faq = json.loads(response_text)
-        return updated_faq
-    except json.JSONDecodeError as e:
-        return {}
\ No newline at end of file
+    response = llm.invoke(prompt)
+    return convert_to_json(response.content, schema=schema, repair_llm=repair_llm or get_openai_llm("json_repair"))
@@ -0,0 +1,114 @@
+"""
+Storage and search settings of the KB collection's dense vectors, shared by ingestion
+(utils/qdrant_multiple_files.py) and the local search backend (tools/qdrant_local.py) so
+both sides agree on the embedding model, its dimensions and how vectors are stored.
+
+    KB_EMBEDDING_MODEL       embedding model (text-embedding-ada-002)
+    KB_EMBEDDING_DIMENSIONS  shortened embeddings, text-embedding-3-* only (model default)
+    KB_QUANTIZATION          none, scalar (int8, 4x smaller) or binary (32x smaller, 1536+ dims)
+    KB_ON_DISK               keep the original vectors on disk; with quantization only the
+                             quantized copy stays in RAM and top candidates are rescored
+    KB_HNSW_PRESET           default, fast, accurate or compact (see HNSW_PRESETS)
+    KB_OVERSAMPLING          candidates fetched per result before rescoring (scalar 2, binary 3)
+"""
+import os
+from typing import Optional
+
+from qdrant_client import models
+
+MODEL_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+# Graph build (m, ef_construct) and search (hnsw_ef) settings; None keeps Qdrant's default
+HNSW_PRESETS = {
+    "default": {},
+    # Smaller graph, quicker build and search, some recall lost
+    "fast": {"m": 8, "ef_construct": 64, "hnsw_ef": 32},
+    # Denser graph and wider search for the best recall
+    "accurate": {"m": 32, "ef_construct": 256, "hnsw_ef": 128},
+    # Small graph stored on disk next to on-disk vectors, for the least RAM
+    "compact": {"m": 8, "ef_construct": 100, "hnsw_ef": 64, "on_disk": True},
+}
+
+DEFAULT_OVERSAMPLING = {"scalar": 2.0, "binary": 3.0}
+
+
+def embedding_model() -> str:
+    return os.getenv("KB_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+
+def embedding_dimensions(model: str = None) -> int:
+    dimensions = os.getenv("KB_EMBEDDING_DIMENSIONS")
+    return int(dimensions) if dimensions else MODEL_DIMENSIONS.get(model or embedding_model(), 1536)
+
+
+def embedding_kwargs(model: str = None) -> dict:
+    """Arguments of `embeddings.create`; `dimensions` is only sent when shortened embeddings are asked for."""
+    model = model or embedding_model()
+    kwargs = {"model": model}
+    if os.getenv("KB_EMBEDDING_DIMENSIONS"):
+        if model == "text-embedding-ada-002":
+            raise ValueError("text-embedding-ada-002 does not support KB_EMBEDDING_DIMENSIONS, use a text-embedding-3 model")
+        kwargs["dimensions"] = embedding_dimensions(model)
+    return kwargs
+
+
+def quantization() -> str:
+    return os.getenv("KB_QUANTIZATION", "none").lower()
+
+
+def on_disk() -> bool:
+    return os.getenv("KB_ON_DISK", "false").lower() == "true"
+
+
+def hnsw_preset() -> dict:
+    name = os.getenv("KB_HNSW_PRESET", "default").lower()
+    if name not in HNSW_PRESETS:
+        raise ValueError(f"Unknown KB_HNSW_PRESET {name!r}, expected one of {', '.join(HNSW_PRESETS)}")
+    return HNSW_PRESETS[name]
+
+
+def quantization_config(kind: str = None):
+    kind = kind or quantization()
+    if kind == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown KB_QUANTIZATION {kind!r}, expected none, scalar or binary")
+
+
+def hnsw_config(preset: dict = None) -> Optional[models.HnswConfigDiff]:
+    preset = hnsw_preset() if preset is None else preset
+    build = {key: preset[key] for key in ("m", "ef_construct", "on_disk") if key in preset}
+    return models.HnswConfigDiff(**build) if build else None
+
+
+def collection_params(dimensions: int = None, kind: str = None, vectors_on_disk: bool = None, preset: dict = None) -> dict:
+    """`create_collection` arguments for the dense vectors; each setting defaults to its env variable."""
+    return {
+        "vectors_config": models.VectorParams(
+            size=dimensions or embedding_dimensions(),
+            distance=models.Distance.COSINE,
+            on_disk=on_disk() if vectors_on_disk is None else vectors_on_disk,
+        ),
+        "hnsw_config": hnsw_config(preset),
+        "quantization_config": quantization_config(kind),
+    }
+
+
+def search_params(kind: str = None, preset: dict = None) -> Optional[models.SearchParams]:
+    """Query-time HNSW width and, for quantized collections, rescoring with the original vectors."""
+    kind = kind or quantization()
+    preset = hnsw_preset() if preset is None else preset
+    params = {}
+    if preset.get("hnsw_ef"):
+        params["hnsw_ef"] = preset["hnsw_ef"]
+    if kind in DEFAULT_OVERSAMPLING:
+        oversampling = float(os.getenv("KB_OVERSAMPLING", DEFAULT_OVERSAMPLING[kind]))
+        params["quantization"] = models.QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    return models.SearchParams(**params) if params else None